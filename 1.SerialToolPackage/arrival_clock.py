@@ -0,0 +1,54 @@
+"""到达时间戳：接收线程读到数据时用perf_counter_ns打点，整个会话只换算一次墙上时间"""
+import time
+from datetime import datetime
+
+# 程序启动时记录一次单调时钟与墙上时钟的对应关系，所有串口共用同一基准，
+# 之后不受系统对时跳变影响，不同串口之间的时间先后可以精确比较
+_PERF_BASE_NS = time.perf_counter_ns()
+_WALL_BASE_NS = time.time_ns()
+
+
+def now_ns():
+    """当前时刻的到达时间戳（单调时钟，纳秒）"""
+    return time.perf_counter_ns()
+
+
+def to_wall_ns(stamp_ns):
+    """到达时间戳换算为墙上时间（纳秒，与time.time_ns()同量纲）"""
+    return _WALL_BASE_NS + stamp_ns - _PERF_BASE_NS
+
+
+def to_wall(stamp_ns):
+    """到达时间戳换算为墙上时间（秒，与time.time()同量纲）"""
+    return to_wall_ns(stamp_ns) / 1e9
+
+
+class TimestampFormatter:
+    """把到达时间戳格式化为"日期时间.毫秒"文本
+
+    同一毫秒内的行直接复用上一次的结果，同一秒内只拼接毫秒部分，
+    strftime每秒最多调用一次。
+    """
+
+    def __init__(self, fmt='%Y-%m-%d %H:%M:%S'):
+        self.fmt = fmt
+        self._second = None
+        self._second_text = ''
+        self._ms = None
+        self._text = ''
+
+    def format(self, stamp_ns):
+        """格式化到达时间戳（perf_counter_ns）"""
+        return self.format_wall(to_wall_ns(stamp_ns))
+
+    def format_wall(self, wall_ns):
+        """格式化墙上时间（纳秒），如录制文件中保存的时间戳"""
+        ms = wall_ns // 1000000
+        if ms != self._ms:
+            second, milli = divmod(ms, 1000)
+            if second != self._second:
+                self._second = second
+                self._second_text = datetime.fromtimestamp(second).strftime(self.fmt)
+            self._ms = ms
+            self._text = f'{self._second_text}.{milli:03d}'
+        return self._text
@@ -0,0 +1,78 @@
+"""接收线程与界面之间的有界队列：界面跟不上时按所选策略阻塞或丢弃，内存不再无限增长"""
+import threading
+from collections import deque
+
+# 队列满时的处理策略：键 -> 显示名称
+POLICIES = {
+    'block': '阻塞接收线程',
+    'drop_oldest': '丢弃最旧的行',
+    'coalesce': '丢弃并显示跳过行数',
+}
+
+
+class BatchQueue:
+    """按批存放 (行列表, 到达时间戳列表, 原始字节列表)，容量按行数计
+
+    队列满时：
+    block       接收线程等待界面取走数据，由串口驱动缓冲承受积压
+    drop_oldest 丢弃最旧的批次，只计数
+    coalesce    同drop_oldest，界面取数据时额外得到被跳过的行数，显示为一行提示
+    接收线程和界面线程各自只调用put和take，所有状态在锁内修改。
+    """
+
+    def __init__(self, max_lines=100000, policy='drop_oldest'):
+        self.max_lines = max_lines
+        self.policy = policy
+        self.batches = deque()
+        self.lines = 0  # 队列中的行数
+        self.dropped_lines = 0  # 累计丢弃的行数
+        self.skipped = 0  # coalesce策略下，上次take之后丢弃的行数
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def __len__(self):
+        return self.lines
+
+    def put(self, lines, stamps, raws):
+        """接收线程放入一批，返回(放入前队列是否为空, 本次丢弃的行数)
+
+        放入前为空说明界面没有待处理的通知，调用者需要通知界面来取。
+        """
+        count = len(lines)
+        dropped = 0
+        with self._cond:
+            if self.policy == 'block':
+                while self.lines and self.lines + count > self.max_lines and not self._closed:
+                    self._cond.wait(0.1)
+            was_empty = not self.batches
+            if self.policy != 'block':
+                while self.batches and self.lines + count > self.max_lines:
+                    old_lines = self.batches.popleft()[0]
+                    self.lines -= len(old_lines)
+                    dropped += len(old_lines)
+                self.dropped_lines += dropped
+                if self.policy == 'coalesce':
+                    self.skipped += dropped
+            self.batches.append((lines, stamps, raws))
+            self.lines += count
+        return was_empty, dropped
+
+    def take(self, max_lines=None):
+        """界面取出最多约max_lines行（至少一批），返回(批次列表, 跳过的行数, 剩余行数)"""
+        taken = []
+        with self._cond:
+            total = 0
+            while self.batches and (max_lines is None or not taken or total < max_lines):
+                batch = self.batches.popleft()
+                taken.append(batch)
+                total += len(batch[0])
+            self.lines -= total
+            skipped, self.skipped = self.skipped, 0
+            self._cond.notify_all()
+            return taken, skipped, self.lines
+
+    def close(self):
+        """唤醒正在阻塞等待的接收线程"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
@@ -0,0 +1,75 @@
+"""接收切行微基准：旧的str拼接+split方式 vs LineBuffer
+
+用法: python bench_line_buffer.py [总行数] [行长度]
+"""
+import sys
+import time
+
+from line_buffer import LineBuffer
+
+
+def split_str(chunks):
+    """旧实现：先整块解码，再 buffer += data 并逐行 split('\\n', 1)"""
+    buffer = ""
+    count = 0
+    for data in chunks:
+        try:
+            data_str = data.decode('utf-8')
+        except UnicodeDecodeError:
+            data_str = data.decode('gbk', errors='replace')
+        buffer += data_str
+        while '\n' in buffer:
+            line, buffer = buffer.split('\n', 1)
+            if line.strip():
+                count += 1
+    return count
+
+
+def split_line_buffer(chunks, encoding='auto'):
+    """新实现：原始字节写入LineBuffer，只解码完整的行"""
+    line_buffer = LineBuffer(encoding=encoding)
+    count = 0
+    for data in chunks:
+        line_buffer.feed(data)
+        for line in line_buffer.read_lines():
+            if line.strip():
+                count += 1
+    return count
+
+
+def make_chunks(total_lines, line_len, chunk_size, text='x', encoding='utf-8'):
+    line = (text * ((line_len - 12) // len(text.encode(encoding)))).encode(encoding)
+    payload = b''.join(b'%010d ' % i + line + b'\n' for i in range(total_lines))
+    return [payload[i:i + chunk_size] for i in range(0, len(payload), chunk_size)]
+
+
+def run(func, chunks, total_lines, *args):
+    start = time.perf_counter()
+    count = func(chunks, *args)
+    elapsed = time.perf_counter() - start
+    assert count == total_lines, (func.__name__, count)
+    return total_lines / elapsed
+
+
+def main():
+    total_lines = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    line_len = int(sys.argv[2]) if len(sys.argv) > 2 else 80
+    print(f"{'块大小':>10} {'旧实现 行/s':>16} {'LineBuffer 行/s':>18} {'加速比':>8}")
+    # 4KB为默认读取块；64KB/1MB模拟设备一次倾泻大量数据、读线程来不及时的突发
+    for chunk_size in (4096, 64 * 1024, 1024 * 1024):
+        chunks = make_chunks(total_lines, line_len, chunk_size)
+        before = run(split_str, chunks, total_lines)
+        after = run(split_line_buffer, chunks, total_lines)
+        print(f"{chunk_size:>10} {before:>16,.0f} {after:>18,.0f} {after / before:>7.1f}x")
+    # GBK数据：旧实现和自动模式都要先试UTF-8再回退，指定GBK编码时只解码一次
+    print(f"\nGBK数据 {'块大小':>6} {'旧实现 行/s':>16} {'自动 行/s':>14} {'GBK 行/s':>14}")
+    for chunk_size in (4096, 64 * 1024):
+        chunks = make_chunks(total_lines, line_len, chunk_size, text='温度', encoding='gbk')
+        before = run(split_str, chunks, total_lines)
+        auto = run(split_line_buffer, chunks, total_lines, 'auto')
+        gbk = run(split_line_buffer, chunks, total_lines, 'gbk')
+        print(f"{chunk_size:>14} {before:>16,.0f} {auto:>14,.0f} {gbk:>14,.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,360 @@
+"""接收链路基准测试：不需要硬件，在offscreen Qt下测量各阶段的吞吐、延迟、CPU和内存
+
+数据源（--port）：
+    pty            伪终端对，走真实的tty驱动（Linux/macOS上的默认值）
+    loop://        pyserial内存回环（Windows上的默认值）
+    socket://      本机TCP服务端写、pyserial socket://读
+注意：pyserial的loop://逐字节放入队列，socket://的in_waiting最多返回1，
+两者的吞吐主要受pyserial模拟实现限制，只适合测功能和延迟，测吞吐请用pty。
+
+阶段（--stages）：
+    reader         PortReader切行、批量，经有界队列送到GUI线程
+    gui            再经过SerialWidget.drain_queue/handle_data（过滤、索引、LogView显示）
+
+读取方式（--driver）：
+    loop           共用的SerialIOLoop（selectors），端口没有文件描述符时自动改用独立线程
+    thread         每个串口一个阻塞读取的SerialThread
+
+显示队列满时按--queue-policy处理，丢弃的行数单独统计。
+
+每行内容为"序号 发送时间戳(ns) 填充"，到达GUI线程时用当前时间减去发送时间戳得到
+端到端延迟。结果保存为JSON，可用--compare与之前的结果对比。
+
+用法示例:
+    python bench_pipeline.py --lines 200000 --line-len 80
+    python bench_pipeline.py --port pty --baud 1500000 --pattern burst:500:20
+    python bench_pipeline.py --json new.json --compare old.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+from array import array
+from datetime import datetime
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import serial  # noqa: E402
+from PyQt5.QtCore import QEventLoop, QTimer, QT_VERSION_STR  # noqa: E402
+from PyQt5.QtWidgets import QApplication  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import serial_tool  # noqa: E402
+from batch_queue import POLICIES  # noqa: E402
+from port_reader import PortReader  # noqa: E402
+from io_loop import SerialIOLoop  # noqa: E402
+
+
+def cpu_seconds():
+    """本进程累计CPU时间（用户态+内核态）"""
+    if resource is not None:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        return usage.ru_utime + usage.ru_stime
+    return time.process_time()
+
+
+def rss_mb():
+    """当前常驻内存（MB），取不到时返回None"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except (OSError, ValueError, AttributeError):
+        pass
+    if resource is not None:
+        # macOS上ru_maxrss单位为字节，Linux为KB；这里只能取到峰值
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+    return None
+
+
+def parse_pattern(text):
+    """steady：逐行匀速；burst:N:MS：连续写N行后停MS毫秒"""
+    if text == 'steady':
+        return 1, 0.0
+    kind, lines, pause_ms = text.split(':')
+    if kind != 'burst':
+        raise ValueError(f'未知的发送模式: {text}')
+    return int(lines), int(pause_ms) / 1000.0
+
+
+class Source:
+    """测试数据源：reader_port给PortReader读，write()写入数据"""
+
+    def __init__(self, kind, timeout):
+        self.kind = kind
+        self._server = self._conn = None
+        self._master = None
+        if kind == 'loop://':
+            self.reader_port = serial.serial_for_url('loop://', timeout=timeout)
+            self.write = self.reader_port.write
+        elif kind == 'socket://':
+            self._server = socket.socket()
+            self._server.bind(('127.0.0.1', 0))
+            self._server.listen(1)
+            port = self._server.getsockname()[1]
+            accepted = []
+            acceptor = threading.Thread(target=lambda: accepted.append(self._server.accept()[0]))
+            acceptor.start()
+            self.reader_port = serial.serial_for_url(f'socket://127.0.0.1:{port}', timeout=timeout)
+            acceptor.join()
+            self._conn = accepted[0]
+            self.write = self._conn.sendall
+        elif kind == 'pty':
+            import pty
+            self._master, slave = pty.openpty()
+            self.reader_port = serial.Serial(os.ttyname(slave), timeout=timeout)
+            os.close(slave)
+            master = self._master
+
+            def write(data):
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(master, view):]
+            self.write = write
+        else:
+            raise ValueError(f'不支持的数据源: {kind}')
+
+    def close(self):
+        with contextlib.suppress(Exception):
+            self.reader_port.close()
+        for closer in (self._conn, self._server):
+            if closer is not None:
+                with contextlib.suppress(Exception):
+                    closer.close()
+        if self._master is not None:
+            with contextlib.suppress(OSError):
+                os.close(self._master)
+
+
+def writer_loop(source, total_lines, line_len, baud, pattern, stats):
+    """按波特率和发送模式写入带发送时间戳的行"""
+    group, pause = parse_pattern(pattern)
+    bytes_per_second = baud / 10 if baud else 0  # 8N1每字节10位
+    filler_len = max(0, line_len - 30)
+    filler = ('x' * filler_len).encode()
+    sent_bytes = 0
+    started = time.perf_counter()
+    seq = 0
+    while seq < total_lines:
+        count = min(group, total_lines - seq)
+        stamp = time.perf_counter_ns()
+        chunk = b''.join(b'%08d %d %s\n' % (seq + i, stamp, filler) for i in range(count))
+        source.write(chunk)
+        seq += count
+        sent_bytes += len(chunk)
+        if bytes_per_second:
+            # 按波特率限速：提前写完的部分睡到对应时刻
+            delay = started + sent_bytes / bytes_per_second - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        if pause:
+            time.sleep(pause)
+    stats['bytes'] = sent_bytes
+    stats['end'] = time.perf_counter()
+
+
+class Collector:
+    """在GUI线程统计到达的行数和端到端延迟"""
+
+    def __init__(self):
+        self.count = 0
+        self.latencies = array('q')  # 纳秒
+        self.last_arrival = 0.0
+
+    def drain(self, queue):
+        """reader阶段：直接从接收线程的队列取数据"""
+        batches, skipped, remaining = queue.take()
+        for lines, stamps, raws in batches:
+            self.on_lines(lines, stamps, raws, 1)
+
+    def on_lines(self, lines, stamps, raws, port_index):
+        now = time.perf_counter_ns()
+        for line in lines:
+            parts = line.split(' ', 2)
+            if len(parts) >= 2 and parts[1].isdigit():
+                self.latencies.append(now - int(parts[1]))
+        self.count += len(lines)
+        self.last_arrival = time.perf_counter()
+
+
+def percentiles(values, points=(50, 90, 99, 99.9)):
+    if not values:
+        return {}
+    ordered = sorted(values)
+    result = {f'p{p:g}': ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] / 1e6 for p in points}
+    result['max'] = ordered[-1] / 1e6
+    return result
+
+
+def run_stage(app, stage, args):
+    source = Source(args.port, args.flush_ms / 1000.0)
+    reader = PortReader(source.reader_port, 1,
+                        read_size=args.read_size,
+                        batch_lines=args.batch_lines,
+                        flush_interval=args.flush_ms / 1000.0,
+                        queue_lines=args.queue_lines,
+                        queue_policy=args.queue_policy)
+    io_loop = SerialIOLoop() if args.driver == 'loop' else None
+    collector = Collector()
+    widget = None
+    devnull = open(os.devnull, 'w')
+    config_dir = tempfile.mkdtemp(prefix='bench_pipeline_')
+    if stage == 'gui':
+        config = serial_tool.ConfigManager(os.path.join(config_dir, 'config.json'))
+        widget = serial_tool.SerialWidget(1, config)
+        widget.resize(800, 600)
+        widget.show()
+        widget.port_reader = reader
+        # 统计在handle_data之后执行，延迟包含显示处理的耗时
+        handle_data = widget.handle_data
+
+        def handle_and_count(lines, stamps, raws, port_index):
+            handle_data(lines, stamps, raws, port_index)
+            collector.on_lines(lines, stamps, raws, port_index)
+
+        widget.handle_data = handle_and_count
+        reader.data_ready.connect(widget.on_data_ready)
+    else:
+        reader.data_ready.connect(lambda port_index: collector.drain(reader.queue))
+
+    write_stats = {}
+    writer = threading.Thread(target=writer_loop, args=(source, args.lines, args.line_len, args.baud,
+                                                        args.pattern, write_stats))
+    loop = QEventLoop()
+
+    def check_done():
+        # 全部到达，或写完后超过idle秒没有新数据（有丢行）时结束
+        if collector.count >= args.lines:
+            loop.quit()
+        elif not writer.is_alive():
+            last_activity = max(collector.last_arrival, write_stats.get('end', 0.0))
+            if time.perf_counter() - last_activity > args.idle:
+                loop.quit()
+
+    poll = QTimer()
+    poll.timeout.connect(check_done)
+    poll.start(20)
+
+    rss_before = rss_mb()
+    cpu_before = cpu_seconds()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(devnull):
+        reader.start(io_loop)
+        writer.start()
+        loop.exec_()
+        elapsed = (collector.last_arrival or time.perf_counter()) - started
+        cpu_used = cpu_seconds() - cpu_before
+        rss_after = rss_mb()
+        poll.stop()
+        reader.stop()
+        if io_loop is not None:
+            io_loop.close()
+        writer.join()
+        if widget is not None:
+            widget.port_reader = None
+            widget.stop_search_index()
+            widget.close()
+    source.close()
+    devnull.close()
+    shutil.rmtree(config_dir, ignore_errors=True)
+    app.processEvents()
+
+    elapsed = max(elapsed, 1e-9)
+    return {
+        'lines_sent': args.lines,
+        'lines_received': collector.count,
+        'lines_lost': args.lines - collector.count,
+        'lines_dropped': reader.queue.dropped_lines,
+        'bytes_sent': write_stats.get('bytes', 0),
+        'seconds': round(elapsed, 4),
+        'lines_per_second': round(collector.count / elapsed),
+        'mb_per_second': round(write_stats.get('bytes', 0) / elapsed / 1024 / 1024, 3),
+        'latency_ms': {k: round(v, 3) for k, v in percentiles(collector.latencies).items()},
+        'cpu_seconds': round(cpu_used, 3),
+        'cpu_percent': round(cpu_used / elapsed * 100, 1),
+        'rss_mb_before': rss_before and round(rss_before, 1),
+        'rss_mb_after': rss_after and round(rss_after, 1),
+    }
+
+
+def compare(old, new):
+    """打印与之前结果相比的变化"""
+    print(f"\n与 {old['meta']['time']} 的结果对比:")
+    for stage, result in new['stages'].items():
+        before = old['stages'].get(stage)
+        if not before:
+            continue
+        rate = result['lines_per_second'] / max(before['lines_per_second'], 1)
+        p99_old = before['latency_ms'].get('p99')
+        p99_new = result['latency_ms'].get('p99')
+        p99 = f'{p99_old:.2f} -> {p99_new:.2f}ms' if p99_old is not None and p99_new is not None else '-'
+        print(f"  {stage:<8} 行/s x{rate:.2f}  p99延迟 {p99}  "
+              f"CPU {before['cpu_percent']}% -> {result['cpu_percent']}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='串口接收链路基准测试')
+    default_port = 'loop://' if os.name == 'nt' else 'pty'
+    parser.add_argument('--port', default=default_port, choices=['loop://', 'socket://', 'pty'], help='数据源')
+    parser.add_argument('--stages', default='reader,gui', help='要测试的阶段，逗号分隔')
+    parser.add_argument('--lines', type=int, default=100000, help='发送总行数')
+    parser.add_argument('--line-len', type=int, default=80, help='每行字节数（含序号和时间戳）')
+    parser.add_argument('--baud', type=int, default=0, help='模拟波特率，0表示不限速')
+    parser.add_argument('--pattern', default='burst:100:0', help='发送模式：steady 或 burst:行数:间隔毫秒')
+    parser.add_argument('--read-size', type=int, default=4096, help='接收线程单次读取字节数')
+    parser.add_argument('--batch-lines', type=int, default=200, help='每批最大行数')
+    parser.add_argument('--flush-ms', type=int, default=50, help='批量刷新间隔（毫秒）')
+    parser.add_argument('--driver', default='loop', choices=['loop', 'thread'], help='读取方式')
+    parser.add_argument('--queue-lines', type=int, default=100000, help='显示队列上限（行）')
+    parser.add_argument('--queue-policy', default='drop_oldest', choices=list(POLICIES), help='显示队列满时的策略')
+    parser.add_argument('--idle', type=float, default=2.0, help='写完后多久没有新数据就结束（秒）')
+    parser.add_argument('--json', help='结果保存路径，默认bench_pipeline_时间.json')
+    parser.add_argument('--compare', help='与之前保存的JSON结果对比')
+    args = parser.parse_args()
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    results = {
+        'meta': {
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'qt': QT_VERSION_STR,
+            'pyserial': serial.__version__,
+            'args': vars(args),
+        },
+        'stages': {},
+    }
+    print(f"{'阶段':<8} {'行/s':>12} {'MB/s':>8} {'p50':>8} {'p99':>8} {'max':>8} {'CPU%':>7} {'RSS MB':>8} {'丢失':>6}")
+    for stage in args.stages.split(','):
+        stage = stage.strip()
+        if stage not in ('reader', 'gui'):
+            parser.error(f'未知的阶段: {stage}')
+        result = run_stage(app, stage, args)
+        results['stages'][stage] = result
+        latency = result['latency_ms']
+        print(f"{stage:<8} {result['lines_per_second']:>12,} {result['mb_per_second']:>8.2f} "
+              f"{latency.get('p50', 0):>8.2f} {latency.get('p99', 0):>8.2f} {latency.get('max', 0):>8.2f} "
+              f"{result['cpu_percent']:>7.1f} {result['rss_mb_after'] or 0:>8.1f} {result['lines_lost']:>6}")
+
+    path = args.json or f"bench_pipeline_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f'结果已保存: {path}')
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(json.load(f), results)
+
+
+if __name__ == '__main__':
+    main()
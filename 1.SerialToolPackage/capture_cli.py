@@ -0,0 +1,356 @@
+"""无界面采集：不启动界面，用与接收窗口相同的接收链路把多个串口同时保存到轮转日志文件
+
+串口参数、关键字过滤、自动保存的格式和轮转都与接收窗口一致，也可以直接读取接收窗口
+保存的serial_monitor_config.json中各串口的设置。所有支持文件描述符的串口共用一个
+SerialIOLoop读取线程，每个串口一个RotatingLogWriter写入线程，过滤和格式化都在写入线程中完成。
+串口断开后按--reopen间隔自动重新打开；收到SIGTERM或Ctrl+C时写完已接收的数据再退出。
+
+用法示例:
+    python capture_cli.py /dev/ttyUSB0 /dev/ttyUSB1:3000000 -b 3000000
+    python capture_cli.py --config serial_monitor_config.json --logs-dir /data/logs
+    python capture_cli.py COM3 --filter "ERROR|WARN" --limit-kb 102400 --rotate-minutes 60
+"""
+import argparse
+import json
+import os
+import signal
+import sys
+import time
+
+from PyQt5.QtCore import QCoreApplication, QTimer
+
+from framers import FRAMERS, make_framer
+from io_loop import SerialIOLoop
+from line_buffer import ENCODINGS, TERMINATORS
+from line_filter import compile_filter
+from log_writer import RotatingLogWriter
+from pipeline_metrics import MetricsExporter, PortMetrics
+from port_reader import PortReader
+from serial_core import BYTESIZES, PARITIES, STOPBITS, open_serial_port
+
+# 与接收窗口get_config()相同的键和默认值
+DEFAULT_PORT_CONFIG = {
+    'baudrate': '1500000',
+    'custom_baudrate': None,
+    'data_bits': 8,
+    'stop_bits': 1,
+    'parity': 'None',
+    'flow_control': 'None',
+    'read_size': 4096,
+    'inter_byte_timeout_ms': 0,
+    'encoding': 'auto',
+    'batch_lines': 200,
+    'flush_interval_ms': 50,
+    'framing': 'newline',
+    'line_terminator': '0A',
+    'idle_flush_ms': 0,
+    'filter_text': '',
+    'filter_case': True,
+    'filter_regex': False,
+    'filter_whole_word': False,
+    'show_hex': False,
+    'show_timestamp': True,
+}
+
+
+def default_logs_dir():
+    """与接收窗口自动保存相同的logs目录（兼容开发环境和打包后环境）"""
+    if getattr(sys, 'frozen', False):
+        base_dir = os.path.dirname(os.path.abspath(sys.executable))
+    else:
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(base_dir, 'logs')
+
+
+def load_config_ports(path, only=None):
+    """读取接收窗口的配置文件，返回(全局配置, [(串口序号, 串口配置)])，跳过没有选择串口的窗口"""
+    with open(path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    ports = []
+    for index in range(1, config.get('port_count', 2) + 1):
+        if only and index not in only:
+            continue
+        port_config = dict(DEFAULT_PORT_CONFIG, **config.get(f'port{index}', {}))
+        # 与open_serial()相同：下拉框文本为"设备 - 描述"
+        port_config['port'] = port_config.get('port', '').split('-')[0].strip()
+        if port_config['port'] and port_config['port'] != '未检测到可用串口':
+            ports.append((index, port_config))
+    return config, ports
+
+
+def parse_port_spec(spec):
+    """命令行的"设备[:波特率]"，如 /dev/ttyUSB0:3000000、COM3、loop://
+
+    pyserial的URL（socket://host:1234、rfc2217://host:2217）本身以":端口"结尾，
+    只有URL在自己的host:port之后再跟":波特率"时才当作波特率，否则整个URL都是设备，
+    波特率取-b/--baudrate。
+    """
+    device, sep, baudrate = spec.rpartition(':')
+    if not (sep and device and baudrate.isdigit()):
+        return spec, None
+    scheme, url_sep, address = device.partition('://')
+    if url_sep and ':' not in address:
+        return spec, None
+    return device, int(baudrate)
+
+
+class HeadlessReader(PortReader):
+    """不经过显示队列的PortReader：每批只交给自动保存"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.error = None  # 导致接收停止的错误
+
+    def emit_lines(self, lines, stamps, raws):
+        self.log_writer.write_batch(lines, stamps, raws)
+        self.metrics.lines_queued += len(lines)
+        self.metrics.lines_handled += len(lines)
+
+    def report_error(self, error):
+        if self.running:
+            self.error = error
+        super().report_error(error)
+
+
+class CapturePort:
+    """一个串口的采集：打开串口、接收并保存，断开后定时重新打开
+
+    日志写入线程在整个采集期间只有一个，重新打开串口后继续写入同一组轮转文件。
+    """
+
+    def __init__(self, index, port_config, io_loop, logs_dir, max_bytes, rotate_seconds):
+        self.index = index
+        self.config = port_config
+        self.io_loop = io_loop
+        self.serial_port = None
+        self.reader = None
+        self.reopen_at = 0.0  # 下次尝试打开串口的时间（time.monotonic）
+        self.metrics = PortMetrics(index)
+        self.log_writer = RotatingLogWriter(logs_dir, f"串口{index}_autosave", max_bytes, rotate_seconds)
+        self.log_writer.metrics = self.metrics
+        self.log_writer.show_hex = port_config['show_hex']
+        self.log_writer.show_timestamp = port_config['show_timestamp']
+        filter_text = port_config['filter_text'].strip()
+        if filter_text:
+            line_filter = compile_filter(filter_text, port_config['filter_case'],
+                                         port_config['filter_regex'], port_config['filter_whole_word'])
+            self.log_writer.line_filter = line_filter if line_filter.active else None
+        self.log_writer.file_rotated.connect(lambda path: log(f"串口{index}: 保存到 {path}"))
+        self.log_writer.write_failed.connect(lambda err: log(f"串口{index}: 保存失败: {err}"))
+
+    @property
+    def baudrate(self):
+        custom = self.config['custom_baudrate']
+        return custom if custom is not None else int(self.config['baudrate'])
+
+    def start(self):
+        self.log_writer.start()
+        self.open()
+
+    def open(self):
+        """打开串口并开始接收，失败时记录错误，稍后由poll()重试"""
+        config = self.config
+        try:
+            self.serial_port = open_serial_port(config['port'], self.baudrate,
+                                                data_bits=config['data_bits'],
+                                                stop_bits=config['stop_bits'],
+                                                parity=config['parity'],
+                                                flow_control=config['flow_control'])
+        except Exception as e:
+            log(f"串口{self.index}: 打开{config['port']}失败: {e}")
+            self.serial_port = None
+            return False
+        self.reader = HeadlessReader(self.serial_port, self.index,
+                                     read_size=config['read_size'],
+                                     inter_byte_timeout=config['inter_byte_timeout_ms'] / 1000.0,
+                                     batch_lines=config['batch_lines'],
+                                     flush_interval=config['flush_interval_ms'] / 1000.0,
+                                     encoding=config['encoding'],
+                                     framing=config['framing'],
+                                     terminator=bytes.fromhex(config['line_terminator']),
+                                     idle_flush=config['idle_flush_ms'] / 1000.0)
+        self.reader.metrics = self.metrics
+        self.reader.log_writer = self.log_writer
+        self.reader.start(self.io_loop)
+        log(f"串口{self.index}: 已打开 {config['port']}, {self.baudrate}")
+        return True
+
+    def close_port(self):
+        if self.reader is not None:
+            self.reader.stop()
+            self.reader = None
+        if self.serial_port is not None:
+            try:
+                self.serial_port.close()
+            except Exception:
+                pass
+            self.serial_port = None
+
+    def poll(self, reopen_interval):
+        """主线程定时调用：发现接收已停止时关闭串口，到时间后重新打开"""
+        now = time.monotonic()
+        if self.reader is not None and not self.reader.isRunning():
+            log(f"串口{self.index}: 接收停止: {self.reader.error}")
+            self.close_port()
+            self.reopen_at = now + reopen_interval
+        elif self.reader is None and reopen_interval > 0 and now >= self.reopen_at:
+            if not self.open():
+                self.reopen_at = now + reopen_interval
+
+    def stop(self):
+        """停止接收，写完已接收的数据后关闭日志文件"""
+        self.close_port()
+        self.log_writer.stop()
+
+
+def log(text):
+    print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {text}", file=sys.stderr, flush=True)
+
+
+def format_stats(snap):
+    """一个串口的简短指标文本"""
+    rate = snap['bytes_per_second']
+    rate_text = f'{rate / 1024:.1f}KB/s' if rate >= 1024 else f'{rate}B/s'
+    text = (f"串口{snap['port']}: {rate_text} {snap['lines_per_second']}行/s 共{snap['lines_total']}行 "
+            f"保存延迟{snap['autosave_latency_ms_avg']:.1f}/{snap['autosave_latency_ms_max']:.1f}ms")
+    if snap['decode_errors']:
+        text += f" 解码错{snap['decode_errors']}"
+    return text
+
+
+def build_port_configs(args):
+    """按命令行参数生成各串口的配置，返回(串口配置列表, 保存容量KB, 轮转分钟)"""
+    limit_kb, rotate_minutes = 50 * 1024, 0
+    ports = []
+    if args.config:
+        config, ports = load_config_ports(args.config, args.only)
+        # 与接收窗口相同：auto_save_limit_mb实际按KB计
+        limit_kb = config.get('auto_save_limit_mb', 50)
+        rotate_minutes = config.get('auto_save_rotate_minutes', 0)
+    next_index = max([index for index, _ in ports], default=0) + 1
+    for spec in args.ports:
+        device, baudrate = parse_port_spec(spec)
+        port_config = dict(DEFAULT_PORT_CONFIG, port=device, custom_baudrate=baudrate or args.baudrate)
+        ports.append((next_index, port_config))
+        next_index += 1
+
+    # 命令行给出的参数覆盖配置文件
+    overrides = {
+        'data_bits': args.data_bits, 'stop_bits': args.stop_bits, 'parity': args.parity,
+        'flow_control': args.flow_control, 'encoding': args.encoding, 'read_size': args.read_size,
+        'batch_lines': args.batch_lines, 'flush_interval_ms': args.flush_ms, 'framing': args.framing,
+        'line_terminator': args.terminator, 'idle_flush_ms': args.idle_flush_ms,
+        'filter_text': args.filter, 'show_hex': args.hex or None,
+        'show_timestamp': False if args.no_timestamp else None,
+    }
+    if args.filter is not None:
+        overrides.update(filter_case=not args.ignore_case, filter_regex=args.regex,
+                         filter_whole_word=args.whole_word)
+    for _, port_config in ports:
+        port_config.update({key: value for key, value in overrides.items() if value is not None})
+    if args.limit_kb is not None:
+        limit_kb = args.limit_kb
+    if args.rotate_minutes is not None:
+        rotate_minutes = args.rotate_minutes
+    return ports, limit_kb, rotate_minutes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='无界面串口采集：多个串口同时保存到轮转日志文件')
+    parser.add_argument('ports', nargs='*', help='串口，格式为 设备[:波特率]，如 /dev/ttyUSB0:3000000、COM3、socket://host:1234')
+    parser.add_argument('--config', help='读取接收窗口的配置文件（serial_monitor_config.json）中各串口的设置')
+    parser.add_argument('--only', type=lambda s: [int(i) for i in s.split(',')],
+                        help='只采集配置文件中的这些串口序号，逗号分隔，如 1,3')
+    parser.add_argument('-b', '--baudrate', type=int, default=1500000, help='命令行串口未指定波特率时使用（URL端口建议用它指定波特率）')
+    parser.add_argument('--data-bits', type=int, choices=sorted(BYTESIZES))
+    parser.add_argument('--stop-bits', type=float, choices=sorted(STOPBITS))
+    parser.add_argument('--parity', choices=list(PARITIES))
+    parser.add_argument('--flow-control', choices=['None', 'RTS/CTS', 'XON/XOFF'])
+    parser.add_argument('--encoding', choices=list(ENCODINGS))
+    parser.add_argument('--read-size', type=int, help='单次最多读取的字节数')
+    parser.add_argument('--batch-lines', type=int, help='每批最大行数')
+    parser.add_argument('--flush-ms', type=int, help='批量刷新间隔（毫秒）')
+    parser.add_argument('--framing', help=f'帧格式，"类型;参数=值;..."，类型: {", ".join(FRAMERS)}，见framers.py')
+    parser.add_argument('--terminator', type=str.upper,
+                        help=f'行结束符的HEX，如 {", ".join(TERMINATORS)}，默认0A')
+    parser.add_argument('--idle-flush-ms', type=int, help='串口静默多久后把没有行结束符的残余数据作为一行保存，0表示不超时')
+    parser.add_argument('--filter', help='只保存匹配的行，语法与接收窗口的过滤框相同')
+    parser.add_argument('--ignore-case', action='store_true', help='过滤不区分大小写')
+    parser.add_argument('--regex', action='store_true', help='过滤文本按正则表达式处理')
+    parser.add_argument('--whole-word', action='store_true', help='过滤只匹配完整单词')
+    parser.add_argument('--hex', action='store_true', help='同时保存HEX')
+    parser.add_argument('--no-timestamp', action='store_true', help='不保存时间戳')
+    parser.add_argument('--logs-dir', default=default_logs_dir(), help='日志目录，默认与接收窗口相同')
+    parser.add_argument('--limit-kb', type=int, help='单个日志文件最大KB，默认取配置文件的设置或51200')
+    parser.add_argument('--rotate-minutes', type=int, help='按时间轮转的周期（分钟），0表示不按时间轮转')
+    parser.add_argument('--reopen', type=float, default=5.0, help='串口打开失败或断开后多久重试（秒），0表示不重试')
+    parser.add_argument('--stats', type=float, default=0, help='每隔多少秒在标准错误输出各串口的指标，0表示不输出')
+    parser.add_argument('--metrics-json', help='同时把指标追加到该文件（JSON lines）')
+    args = parser.parse_args()
+    if args.stop_bits is not None and args.stop_bits != 1.5:
+        args.stop_bits = int(args.stop_bits)
+
+    if not args.ports and not args.config:
+        parser.error('请指定串口或--config')
+    try:
+        ports, limit_kb, rotate_minutes = build_port_configs(args)
+    except (OSError, ValueError) as e:
+        parser.error(f'读取配置文件失败: {e}')
+    if not ports:
+        parser.error('没有可采集的串口')
+    for index, port_config in ports:
+        try:
+            make_framer(port_config['framing'], terminator=bytes.fromhex(port_config['line_terminator']))
+        except ValueError as e:
+            parser.error(f'串口{index}帧格式错误: {e}')
+    if args.filter is not None and args.filter.strip():
+        # 表达式错误时立即报错，不等到收到数据
+        try:
+            compile_filter(args.filter.strip(), not args.ignore_case, args.regex, args.whole_word)
+        except Exception as e:
+            parser.error(f'过滤表达式错误: {e}')
+
+    app = QCoreApplication(sys.argv)
+    io_loop = SerialIOLoop()
+    captures = [CapturePort(index, port_config, io_loop, args.logs_dir, limit_kb * 1024, rotate_minutes * 60)
+                for index, port_config in ports]
+    for capture in captures:
+        capture.start()
+
+    # Python只在解释器取得控制权时执行信号处理函数，定时器保证事件循环中能及时响应SIGTERM
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda signum, frame: app.quit())
+    poll_timer = QTimer()
+    poll_timer.timeout.connect(lambda: [capture.poll(args.reopen) for capture in captures])
+    poll_timer.start(200)
+
+    exporter = MetricsExporter(args.metrics_json) if args.metrics_json else None
+    stats_timer = QTimer()
+    if args.stats > 0 or exporter is not None:
+        def report():
+            snapshots = [capture.metrics.snapshot() for capture in captures]
+            if args.stats > 0:
+                log(' | '.join(format_stats(snap) for snap in snapshots))
+            if exporter is not None:
+                exporter.write(snapshots)
+        stats_timer.timeout.connect(report)
+        stats_timer.start(int((args.stats or 1) * 1000))
+
+    app.exec_()
+
+    log('正在停止...')
+    poll_timer.stop()
+    stats_timer.stop()
+    for capture in captures:
+        capture.stop()
+    io_loop.close()
+    if exporter is not None:
+        exporter.close()
+    for capture in captures:
+        snap = capture.metrics.snapshot()
+        log(f"串口{capture.index}: 共{snap['lines_total']}行 {snap['bytes_total']}字节，"
+            f"保存{snap['autosave_bytes']}字节")
+
+
+if __name__ == '__main__':
+    main()
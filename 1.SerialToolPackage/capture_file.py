@@ -0,0 +1,263 @@
+"""原始数据录制文件：按读取块保存(时间戳, 串口, 长度, 原始字节)，用mmap打开回看
+
+文件格式（小端）：
+    文件头   magic b'SCAP', 版本(u16), 保留(u16), 创建时间(i64, ns)
+    记录头   类型(u8), 填充(u8), 串口(u16), 长度(u32), 时间戳(i64, 墙上时间ns)，后跟长度个字节
+    数据记录 类型0，内容为一次读取到的原始字节
+    索引记录 类型1，内容为上一个索引记录的偏移(i64) + 自上个索引以来每条数据记录的
+             (偏移, 时间戳) i64对；每INDEX_INTERVAL条记录或INDEX_BYTES字节写一个
+    文件尾   b'SCAPEND\\0' + 最后一个索引记录的偏移(i64)，正常关闭时写入
+
+正常关闭的文件沿索引链从尾部倒序读取所有记录的位置，无需扫描数据；
+异常中断（没有文件尾）的文件逐条跳读记录头重建索引，末尾不完整的记录被忽略。
+"""
+import mmap
+import os
+import queue
+import struct
+import time
+from array import array
+from bisect import bisect_left
+from datetime import datetime
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from arrival_clock import to_wall_ns
+from line_buffer import LineBuffer
+
+MAGIC = b'SCAP'
+VERSION = 1
+FILE_HEADER = struct.Struct('<4sHHq')
+RECORD_HEADER = struct.Struct('<BxHIq')
+TRAILER = struct.Struct('<8sq')
+TRAILER_MAGIC = b'SCAPEND\0'
+KIND_DATA = 0
+KIND_INDEX = 1
+INDEX_INTERVAL = 4096  # 每多少条数据记录写一个索引
+INDEX_BYTES = 16 * 1024 * 1024  # 或每写入多少字节写一个索引
+FILE_SUFFIX = '.scap'
+
+
+class CaptureFormatError(Exception):
+    """不是有效的录制文件"""
+
+
+class CaptureWriter(QThread):
+    """录制写入线程
+
+    接收线程在读到数据后直接调用write_chunk入队（不经过GUI线程），
+    打包和写盘都在本线程完成。多个串口可以共用同一个录制文件。
+    """
+    write_failed = pyqtSignal(str)  # 错误信息
+
+    def __init__(self, path, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.queue = queue.SimpleQueue()
+        self.file = None
+        self.offset = 0  # 下一条记录的写入位置
+        self.pending = array('q')  # 自上个索引以来的(偏移, 时间戳)对
+        self.pending_bytes = 0
+        self.last_index = -1  # 上一个索引记录的偏移，-1表示没有
+        self.last_stamp = 0
+        self.bytes_written = 0
+
+    def write_chunk(self, port_index, stamp_ns, data):
+        """提交一次读取的原始字节（接收线程调用，只入队）；stamp_ns为到达时间戳"""
+        if data:
+            self.queue.put((port_index, to_wall_ns(stamp_ns), bytes(data)))
+
+    def stop(self):
+        self.queue.put(None)
+        self.wait()
+
+    def run(self):
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self.file = open(self.path, 'wb')
+            self.file.write(FILE_HEADER.pack(MAGIC, VERSION, 0, time.time_ns()))
+            self.offset = FILE_HEADER.size
+        except Exception as e:
+            self.write_failed.emit(str(e))
+            self.file = None
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            if self.file is None:
+                continue
+            try:
+                self.write_record(KIND_DATA, *item)
+                # pending中每条记录占两个元素
+                if len(self.pending) >= INDEX_INTERVAL * 2 or self.pending_bytes >= INDEX_BYTES:
+                    self.write_index()
+                # 队列暂时为空时才刷盘，突发数据时合并多次写入
+                if self.queue.empty():
+                    self.file.flush()
+            except Exception as e:
+                self.close_file()
+                self.write_failed.emit(str(e))
+        self.close_file()
+
+    def write_record(self, kind, port_index, stamp_ns, payload):
+        if kind == KIND_DATA:
+            self.pending.append(self.offset)
+            self.pending.append(stamp_ns)
+            self.pending_bytes += len(payload)
+            self.last_stamp = stamp_ns
+        self.file.write(RECORD_HEADER.pack(kind, port_index, len(payload), stamp_ns))
+        self.file.write(payload)
+        size = RECORD_HEADER.size + len(payload)
+        self.offset += size
+        self.bytes_written += size
+
+    def write_index(self):
+        """写一个索引记录，覆盖自上个索引以来的数据记录"""
+        index_offset = self.offset
+        payload = struct.pack('<q', self.last_index) + self.pending.tobytes()
+        self.pending = array('q')
+        self.pending_bytes = 0
+        self.write_record(KIND_INDEX, 0, self.last_stamp, payload)
+        self.last_index = index_offset
+
+    def close_file(self):
+        if self.file is None:
+            return
+        try:
+            if self.pending:
+                self.write_index()
+            self.file.write(TRAILER.pack(TRAILER_MAGIC, self.last_index))
+            self.file.close()
+        except Exception:
+            pass
+        self.file = None
+
+
+class CaptureReader:
+    """用mmap打开录制文件，按记录号或时间随机访问
+
+    打开时只读取索引，记录内容在访问时才从映射中切出，
+    几个GB的文件也能立即打开。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        try:
+            size = os.fstat(self.file.fileno()).st_size
+            if size < FILE_HEADER.size:
+                raise CaptureFormatError('文件太短')
+            self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self.file.close()
+            raise
+        magic, version, _, self.created_ns = FILE_HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise CaptureFormatError('不是录制文件或版本不支持')
+        self.offsets = array('q')  # 每条数据记录的偏移
+        # 每条数据记录的时间戳（墙上时间ns）；多个串口的打点和入队之间有微小竞争，只是基本递增
+        self.stamps = array('q')
+        if not self._load_index():
+            self._scan(FILE_HEADER.size)
+
+    def _load_index(self):
+        """沿文件尾指向的索引链读取全部记录位置，没有文件尾时返回False"""
+        mm = self.mm
+        if len(mm) < FILE_HEADER.size + TRAILER.size:
+            return False
+        magic, index_offset = TRAILER.unpack_from(mm, len(mm) - TRAILER.size)
+        if magic != TRAILER_MAGIC:
+            return False
+        blocks = []
+        while index_offset >= 0:
+            kind, _, length, _ = RECORD_HEADER.unpack_from(mm, index_offset)
+            if kind != KIND_INDEX:
+                return False
+            start = index_offset + RECORD_HEADER.size
+            index_offset, = struct.unpack_from('<q', mm, start)
+            blocks.append(mm[start + 8:start + length])
+        pairs = array('q')
+        for block in reversed(blocks):
+            pairs.frombytes(block)
+        self.offsets = pairs[0::2]
+        self.stamps = pairs[1::2]
+        return True
+
+    def _scan(self, offset):
+        """逐条跳读记录头重建索引（用于异常中断的文件）"""
+        mm = self.mm
+        end = len(mm)
+        unpack = RECORD_HEADER.unpack_from
+        while offset + RECORD_HEADER.size <= end:
+            kind, _, length, stamp = unpack(mm, offset)
+            next_offset = offset + RECORD_HEADER.size + length
+            if next_offset > end or kind not in (KIND_DATA, KIND_INDEX):
+                break
+            if kind == KIND_DATA:
+                self.offsets.append(offset)
+                self.stamps.append(stamp)
+            offset = next_offset
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def record(self, i):
+        """第i条数据记录：(时间戳ns, 串口, 原始字节)"""
+        offset = self.offsets[i]
+        _, port_index, length, stamp = RECORD_HEADER.unpack_from(self.mm, offset)
+        start = offset + RECORD_HEADER.size
+        return stamp, port_index, self.mm[start:start + length]
+
+    def records(self, start=0, end=None):
+        for i in range(start, len(self) if end is None else end):
+            yield self.record(i)
+
+    def find_time(self, wall_ns):
+        """第一条时间戳不早于wall_ns的记录号"""
+        return bisect_left(self.stamps, wall_ns)
+
+    def time_range(self):
+        """(第一条, 最后一条) 记录的时间戳，空文件返回None"""
+        if not self.stamps:
+            return None
+        return self.stamps[0], self.stamps[-1]
+
+    def ports(self):
+        """文件中出现过的串口序号"""
+        unpack = RECORD_HEADER.unpack_from
+        return sorted({unpack(self.mm, offset)[1] for offset in self.offsets})
+
+    def iter_lines(self, encoding='auto', port_index=None, start=0, end=None, delimiter=b'\n'):
+        """按指定编码重新切行解码，逐行返回(时间戳ns, 串口, 行)
+
+        每个串口一个LineBuffer，与实时接收的切行规则一致；空白行被跳过。
+        """
+        buffers = {}
+        for stamp, port, data in self.records(start, end):
+            if port_index is not None and port != port_index:
+                continue
+            line_buffer = buffers.get(port)
+            if line_buffer is None:
+                line_buffer = buffers[port] = LineBuffer(delimiter=delimiter, encoding=encoding)
+            line_buffer.feed(data)
+            for line in line_buffer.read_lines():
+                line = line.strip()
+                if line:
+                    yield stamp, port, line
+
+    def close(self):
+        try:
+            self.mm.close()
+        finally:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def new_capture_path(logs_dir):
+    """按当前时间生成录制文件路径"""
+    return os.path.join(logs_dir, f"capture_{datetime.now().strftime('%Y%m%d_%H%M%S')}{FILE_SUFFIX}")
@@ -0,0 +1,347 @@
+"""二进制分帧：在接收线程中把原始字节切成帧，代替按换行切行
+
+每种分帧器与LineBuffer接口相同（feed / read_lines_with_raw / read_lines / decode_errors），
+PortReader按串口的"帧格式"设置选用，之后的批量、过滤、自动保存、显示流程不变：
+每帧是一行，正文是按字段布局解析的"名称=值"（没有布局时是载荷的HEX），
+原始字节是解码后的载荷，打开HEX显示时照常显示。
+校验失败、转义错误、长度超限的帧被丢弃，计入解码错误数。
+
+帧格式设置是一个字符串："类型;参数=值;参数=值"，例如
+    newline
+    fixed;size=16;layout=<HhI;names=id,temp,count
+    length_prefix;length_bytes=2;big_endian=1
+    slip
+    cobs;layout=<ff;names=x,y
+    marker;start=AA55;end=0D0A;checksum=sum8
+"""
+import binascii
+import struct
+import zlib
+from functools import reduce
+from operator import xor
+
+from line_buffer import LineBuffer
+
+# 帧格式：类型 -> 显示名称
+FRAMERS = {
+    'newline': '换行文本',
+    'fixed': '定长帧',
+    'length_prefix': '长度前缀',
+    'slip': 'SLIP',
+    'cobs': 'COBS',
+    'marker': '起止标记+校验',
+}
+
+# 起止标记帧的校验方式：名称 -> (校验字节数, 计算函数)，校验只覆盖载荷
+CHECKSUMS = {
+    'none': (0, None),
+    'sum8': (1, lambda data: (sum(data) & 0xFF).to_bytes(1, 'big')),
+    'xor8': (1, lambda data: reduce(xor, data, 0).to_bytes(1, 'big')),
+    'crc16': (2, lambda data: binascii.crc_hqx(data, 0xFFFF).to_bytes(2, 'big')),  # CRC-16/CCITT-FALSE
+    'crc32': (4, lambda data: zlib.crc32(data).to_bytes(4, 'little')),
+}
+
+
+def parse_framing(spec):
+    """帧格式字符串 -> (类型, 参数字典)，格式错误时抛出ValueError"""
+    parts = [part.strip() for part in (spec or 'newline').split(';') if part.strip()]
+    kind = parts[0] if parts else 'newline'
+    if kind not in FRAMERS:
+        raise ValueError(f'未知的帧格式: {kind}')
+    options = {}
+    for part in parts[1:]:
+        key, sep, value = part.partition('=')
+        if not sep:
+            raise ValueError(f'帧参数应为"参数=值": {part}')
+        options[key.strip()] = value.strip()
+    return kind, options
+
+
+def make_framer(spec, encoding='auto', terminator=b'\n'):
+    """按帧格式字符串创建分帧器，换行文本返回以terminator分行的LineBuffer；参数错误时抛出ValueError"""
+    kind, options = parse_framing(spec)
+    if kind == 'newline':
+        if options:
+            raise ValueError(f'换行文本不支持参数: {", ".join(options)}')
+        if not terminator:
+            raise ValueError('行结束符不能为空')
+        return LineBuffer(delimiter=terminator, encoding=encoding)
+    layout = FieldLayout(options.pop('layout', ''), options.pop('names', ''))
+    cls = {'fixed': FixedFramer, 'length_prefix': LengthPrefixFramer, 'slip': SlipFramer,
+           'cobs': CobsFramer, 'marker': MarkerFramer}[kind]
+    try:
+        return cls(layout=layout, **options)
+    except TypeError:
+        raise ValueError(f'{FRAMERS[kind]}不支持的参数: {", ".join(options)}') from None
+
+
+def _int_option(value, name):
+    try:
+        return int(value, 0) if isinstance(value, str) else int(value)
+    except ValueError:
+        raise ValueError(f'参数{name}应为整数: {value}') from None
+
+
+def _hex_option(value, name):
+    if isinstance(value, bytes):
+        return value
+    try:
+        return bytes.fromhex(value)
+    except ValueError:
+        raise ValueError(f'参数{name}应为HEX，如AA55: {value}') from None
+
+
+class FieldLayout:
+    """载荷的字段布局：struct格式 + 逗号分隔的字段名，把一帧显示为"名称=值 ..."
+
+    没有格式时显示载荷的HEX；载荷长度与格式不符时也显示HEX，并标注长度。
+    """
+
+    def __init__(self, fmt='', names=''):
+        self.struct = None
+        self.names = []
+        if fmt:
+            try:
+                self.struct = struct.Struct(fmt)
+            except struct.error as e:
+                raise ValueError(f'字段布局错误: {e}') from None
+            count = len(self.struct.unpack(bytes(self.struct.size)))
+            self.names = [name.strip() for name in names.split(',') if name.strip()] if names else []
+            # 未命名的字段按序号命名
+            self.names += [f'f{i}' for i in range(len(self.names), count)]
+            self.names = self.names[:count]
+
+    def render(self, payload):
+        if self.struct is not None and len(payload) == self.struct.size:
+            values = self.struct.unpack(payload)
+            return ' '.join(f'{name}={value!r}' if isinstance(value, bytes) else f'{name}={value}'
+                            for name, value in zip(self.names, values))
+        text = payload.hex(' ').upper() if payload else '(空帧)'
+        if self.struct is not None:
+            text = f'[长度{len(payload)}] {text}'
+        return text
+
+
+class FrameBuffer:
+    """分帧器基类：字节追加到bytearray尾部，切帧只移动读指针，已消费的部分攒够一半再整体丢弃
+
+    子类实现_split(buf, view, start)：从start开始在缓冲区中查找完整的帧（bytearray的find/rfind
+    带起点参数，不复制），只把完整的部分经memoryview切片取出，返回(载荷列表, 新的读指针)。
+    """
+
+    def __init__(self, layout=None):
+        self._buf = bytearray()
+        self._start = 0  # 未消费数据的起点
+        self.layout = layout or FieldLayout()
+        self.decode_errors = 0  # 被丢弃的坏帧数
+
+    def __len__(self):
+        return len(self._buf) - self._start
+
+    def clear(self):
+        self._buf = bytearray()
+        self._start = 0
+
+    def feed(self, data):
+        """追加原始字节"""
+        if self._start and self._start * 2 >= len(self._buf):
+            del self._buf[:self._start]
+            self._start = 0
+        self._buf += data
+
+    def read_frames(self):
+        """返回所有完整帧的载荷"""
+        with memoryview(self._buf) as view:
+            payloads, self._start = self._split(self._buf, view, self._start)
+        return payloads
+
+    def read_lines_with_raw(self):
+        """返回 (每帧的显示文本, 每帧的载荷)，两个列表一一对应"""
+        payloads = self.read_frames()
+        render = self.layout.render
+        return [render(payload) for payload in payloads], payloads
+
+    def read_lines(self):
+        return self.read_lines_with_raw()[0]
+
+    def read_partial_with_raw(self):
+        """串口空闲超时时调用：丢弃不完整的帧（计入解码错误），从下一个字节重新同步，返回None"""
+        if len(self):
+            self.decode_errors += 1
+            self.clear()
+        return None
+
+    def _split(self, buf, view, start):
+        raise NotImplementedError
+
+
+class FixedFramer(FrameBuffer):
+    """定长帧：每size字节一帧"""
+
+    def __init__(self, size=16, layout=None):
+        super().__init__(layout)
+        self.size = _int_option(size, 'size')
+        if self.size <= 0:
+            raise ValueError('定长帧的size必须大于0')
+
+    def _split(self, buf, view, start):
+        size = self.size
+        stop = start + (len(buf) - start) // size * size
+        return [bytes(view[pos:pos + size]) for pos in range(start, stop, size)], stop
+
+
+class LengthPrefixFramer(FrameBuffer):
+    """长度前缀帧：length_bytes字节的长度字段 + 载荷
+
+    include_header=1表示长度包含长度字段本身；长度超过max_length视为失步，
+    丢弃一个字节后重新查找。
+    """
+
+    def __init__(self, length_bytes=1, big_endian=0, include_header=0, max_length=65536, layout=None):
+        super().__init__(layout)
+        self.length_bytes = _int_option(length_bytes, 'length_bytes')
+        if self.length_bytes not in (1, 2, 4):
+            raise ValueError('length_bytes只能是1、2或4')
+        self.byteorder = 'big' if _int_option(big_endian, 'big_endian') else 'little'
+        self.include_header = bool(_int_option(include_header, 'include_header'))
+        self.max_length = _int_option(max_length, 'max_length')
+
+    def _split(self, buf, view, start):
+        payloads = []
+        pos, end, header = start, len(buf), self.length_bytes
+        while end - pos >= header:
+            length = int.from_bytes(view[pos:pos + header], self.byteorder)
+            if self.include_header:
+                length -= header
+            if length < 0 or length > self.max_length:
+                self.decode_errors += 1
+                pos += 1
+                continue
+            if end - pos - header < length:
+                break
+            payloads.append(bytes(view[pos + header:pos + header + length]))
+            pos += header + length
+        return payloads, pos
+
+
+class SlipFramer(FrameBuffer):
+    """SLIP（RFC 1055）：以0xC0分隔，0xDB 0xDC/0xDB 0xDD转义，连续的0xC0之间的空帧被忽略"""
+    END = b'\xc0'
+    ESC = b'\xdb'
+
+    def _split(self, buf, view, start):
+        last = buf.rfind(self.END, start)
+        if last < 0:
+            return [], start
+        payloads = []
+        for frame in view[start:last].tobytes().split(self.END):
+            if not frame:
+                continue
+            payload = frame.replace(b'\xdb\xdc', b'\xc0').replace(b'\xdb\xdd', b'\xdb')
+            if payload.count(self.ESC) != frame.count(b'\xdb\xdd'):
+                # 0xDB后面跟了0xDC/0xDD以外的字节
+                self.decode_errors += 1
+                continue
+            payloads.append(payload)
+        return payloads, last + 1
+
+
+class CobsFramer(FrameBuffer):
+    """COBS：以0x00分隔，帧内按COBS编码消除0x00"""
+
+    def _split(self, buf, view, start):
+        last = buf.rfind(b'\0', start)
+        if last < 0:
+            return [], start
+        payloads = []
+        for frame in view[start:last].tobytes().split(b'\0'):
+            if not frame:
+                continue
+            payload = cobs_decode(frame)
+            if payload is None:
+                self.decode_errors += 1
+            else:
+                payloads.append(payload)
+        return payloads, last + 1
+
+
+def cobs_decode(frame):
+    """解码一帧COBS数据（不含分隔符0x00），编码错误时返回None"""
+    out = bytearray()
+    pos, end = 0, len(frame)
+    while pos < end:
+        code = frame[pos]
+        if code == 0 or pos + code > end:
+            return None
+        out += frame[pos + 1:pos + code]
+        pos += code
+        if code < 0xFF and pos < end:
+            out.append(0)
+    return bytes(out)
+
+
+class MarkerFramer(FrameBuffer):
+    """起止标记帧：start + 载荷 + 校验 + end，校验方式见CHECKSUMS
+
+    在start之后查找第一个end，载荷中出现end序列时需要协议本身避免（或用长度前缀/SLIP/COBS）。
+    不设end时以下一个start作为本帧结束，最后一帧要等下一帧开始或串口空闲超时才送出。
+    start之前的字节和校验失败的帧被丢弃。
+    """
+
+    def __init__(self, start='AA55', end='', checksum='none', max_length=65536, layout=None):
+        super().__init__(layout)
+        self.start = _hex_option(start, 'start')
+        self.end = _hex_option(end, 'end')
+        if not self.start:
+            raise ValueError('起止标记帧必须指定start')
+        if checksum not in CHECKSUMS:
+            raise ValueError(f'未知的校验方式: {checksum}，可选: {", ".join(CHECKSUMS)}')
+        self.checksum_size, self.checksum = CHECKSUMS[checksum]
+        self.max_length = _int_option(max_length, 'max_length')
+
+    def _split(self, buf, view, pos):
+        payloads = []
+        start, end = self.start, self.end
+        while True:
+            begin = buf.find(start, pos)
+            if begin < 0:
+                # 保留可能是start前半部分的末尾字节
+                return payloads, max(pos, len(buf) - len(start) + 1)
+            if begin > pos:
+                self.decode_errors += 1  # 帧之前有多余字节
+            body = begin + len(start)
+            # 没有结束标记时，下一个start就是本帧的结束
+            stop = buf.find(end or start, body)
+            if stop < 0:
+                if len(buf) - body > self.max_length + self.checksum_size:
+                    self.decode_errors += 1
+                    pos = body
+                    continue
+                return payloads, begin
+            payload = self._check(view[body:stop].tobytes())
+            pos = stop + len(end)
+            if payload is not None:
+                payloads.append(payload)
+
+    def _check(self, content):
+        """校验一帧的内容（载荷 + 校验），返回载荷，校验失败时返回None"""
+        if len(content) < self.checksum_size:
+            self.decode_errors += 1
+            return None
+        if not self.checksum_size:
+            return content
+        payload, check = content[:-self.checksum_size], content[-self.checksum_size:]
+        if self.checksum(payload) != check:
+            self.decode_errors += 1
+            return None
+        return payload
+
+    def read_partial_with_raw(self):
+        """不设end时，空闲超时说明最后一帧已经结束，不必等下一帧开始"""
+        if self.end or not self._buf.startswith(self.start, self._start):
+            return super().read_partial_with_raw()
+        payload = self._check(bytes(self._buf[self._start + len(self.start):]))
+        self.clear()
+        if payload is None:
+            return None
+        return self.layout.render(payload), payload
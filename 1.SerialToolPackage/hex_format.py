@@ -0,0 +1,36 @@
+"""HEX显示：直接对接收到的原始字节整块转换，不再对解码后的字符逐个格式化"""
+
+# 可打印ASCII保留，其余字节显示为"."
+_ASCII_TABLE = bytes(b if 32 <= b < 127 else ord('.') for b in range(256))
+
+
+def format_hex(data):
+    """原始字节 -> "48 65 6C 6C 6F" """
+    return data.hex(' ').upper()
+
+
+def row_hex(row):
+    """一行原始字节的HEX后缀，没有原始字节时为空"""
+    raw = row[2]
+    return f'  [HEX] {format_hex(raw)}' if raw else ''
+
+
+def row_to_text(row, show_hex=False):
+    """一行 (前缀, 正文, 原始字节) 的纯文本（复制、保存用），show_hex时附带原始字节的HEX"""
+    prefix, text, raw = row
+    if show_hex and raw:
+        return f'{prefix}{text}{row_hex(row)}'
+    return prefix + text
+
+
+def hex_dump(data, width=16):
+    """偏移 + HEX + ASCII 的多行转储，如：
+    00000000  48 65 6C 6C 6F 0D                                |Hello.|
+    """
+    lines = []
+    for offset in range(0, len(data), width):
+        chunk = data[offset:offset + width]
+        hex_part = chunk.hex(' ').upper().ljust(width * 3 - 1)
+        ascii_part = chunk.translate(_ASCII_TABLE).decode('ascii')
+        lines.append(f'{offset:08X}  {hex_part}  |{ascii_part}|')
+    return '\n'.join(lines)
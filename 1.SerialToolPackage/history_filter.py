@@ -0,0 +1,38 @@
+"""后台重新过滤历史数据：修改过滤条件后对已接收的全部行重新过滤"""
+from PyQt5.QtCore import QThread, pyqtSignal
+
+
+class HistoryFilterThread(QThread):
+    """在工作线程中用新的过滤器扫描历史行，分块把命中行的全局行号送回GUI
+
+    snapshot是LineStore.snapshot()得到的正文只读副本，只对正文做匹配。
+    每处理chunk_size行检查一次取消标志并报告进度。
+    """
+    rows_matched = pyqtSignal(list)  # 一块命中行的全局行号（升序）
+    progress = pyqtSignal(int, int)  # 已处理行数, 总行数
+
+    def __init__(self, snapshot, line_filter, chunk_size=5000, parent=None):
+        super().__init__(parent)
+        self.snapshot = snapshot
+        self.line_filter = line_filter
+        self.chunk_size = chunk_size
+        self.cancelled = False
+        self.matched_count = 0
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        snapshot = self.snapshot
+        total = len(snapshot)
+        first_seq = snapshot.first_seq
+        match = self.line_filter.match
+        for start in range(0, total, self.chunk_size):
+            if self.cancelled:
+                return
+            texts = snapshot.texts(start, start + self.chunk_size)
+            matched = [first_seq + start + i for i, text in enumerate(texts) if match(text)]
+            if matched:
+                self.matched_count += len(matched)
+                self.rows_matched.emit(matched)
+            self.progress.emit(min(start + self.chunk_size, total), total)
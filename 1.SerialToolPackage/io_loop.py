@@ -0,0 +1,161 @@
+"""所有串口共用的I/O线程：用selectors同时等待多个串口的文件描述符，代替每个串口一个读取线程"""
+import os
+import selectors
+import threading
+import time
+from PyQt5.QtCore import QThread
+from serial_core import selectable
+
+CALL_TIMEOUT = 2.0  # 等待本线程执行加入/移除命令的最长时间（秒）
+
+
+class SerialIOLoop(QThread):
+    """多路复用读取线程
+
+    串口以非阻塞方式打开（pyserial在POSIX上使用O_NONBLOCK），可读时直接os.read，
+    读到的数据交给对应的PortReader切行和批量。select的超时取各串口最早的批量发送时刻，
+    空闲时不占用CPU。加入/移除串口通过命令队列和唤醒管道交给本线程执行，
+    移除返回后本线程不会再访问该串口，调用者可以立即关闭它。
+    Windows的串口句柄不能用于select，回放端口、loop://等没有文件描述符，
+    这些端口由PortReader.start()改用独立的SerialThread。
+    本线程不能因为某一个串口而等待：队列策略为block的串口同样使用独立的SerialThread，
+    界面跟不上时只阻塞它自己的读取线程，其他串口照常接收。
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.selector = selectors.DefaultSelector()
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        os.set_blocking(self._wake_w, False)
+        self.selector.register(self._wake_r, selectors.EVENT_READ, None)
+        self._commands = []  # 待本线程执行的 (函数, PortReader, 完成事件)
+        self._lock = threading.Lock()
+        self.readers = {}  # 文件描述符 -> PortReader
+        self.running = False
+        self._thread_id = None  # 本线程的threading标识，run开始时记录
+        self.closed = False  # close()后唤醒管道已关闭
+
+    @staticmethod
+    def supports(port):
+        """该端口能否加入本线程"""
+        return selectable(port)
+
+    def add(self, reader):
+        """开始服务一个串口，首次加入时启动线程"""
+        if not self.isRunning():
+            self.running = True
+            self.start()
+        self._call(self._add, reader)
+
+    def remove(self, reader):
+        """停止服务一个串口并发送它已切出的行，返回True后不再访问它
+
+        返回False表示本线程超时未响应，此时本线程可能仍在处理该串口的数据，
+        移除和发送留给本线程稍后完成，调用者不能再操作该PortReader的批次。
+        """
+        if self.isRunning():
+            return self._call(self._detach, reader)
+        self._detach(reader)
+        return True
+
+    def close(self):
+        """停止线程并释放唤醒管道，重复调用时不做任何事"""
+        if self.closed:
+            return
+        self.closed = True
+        if self.isRunning():
+            self.running = False
+            self._wake()
+            self.wait()
+        self.selector.close()
+        os.close(self._wake_r)
+        os.close(self._wake_w)
+
+    def _call(self, func, reader):
+        """在本线程中执行func(reader)并等待完成，返回是否已执行
+
+        在本线程中调用（如PortReader出错后在回调里停止）时直接执行；
+        其他线程最多等待CALL_TIMEOUT秒，本线程卡住时调用者（通常是界面）不会跟着卡死，
+        命令仍留在队列中，本线程恢复后按顺序执行。
+        """
+        if threading.get_ident() == self._thread_id:
+            func(reader)
+            return True
+        done = threading.Event()
+        with self._lock:
+            self._commands.append((func, reader, done))
+        self._wake()
+        if not done.wait(CALL_TIMEOUT):
+            print(f'I/O线程{CALL_TIMEOUT}秒内未响应，不再等待')
+            return False
+        return True
+
+    def _wake(self):
+        try:
+            os.write(self._wake_w, b'\0')
+        except BlockingIOError:
+            pass  # 管道已满，本线程一定会被唤醒
+
+    def _run_commands(self):
+        try:
+            while os.read(self._wake_r, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        with self._lock:
+            commands, self._commands = self._commands, []
+        for func, reader, done in commands:
+            try:
+                func(reader)
+            except Exception as e:
+                reader.report_error(e)
+            done.set()
+
+    def _add(self, reader):
+        fd = reader.serial_port.fileno()
+        self.readers[fd] = reader
+        self.selector.register(fd, selectors.EVENT_READ, reader)
+
+    def _remove(self, reader):
+        for fd, item in list(self.readers.items()):
+            if item is reader:
+                del self.readers[fd]
+                self.selector.unregister(fd)
+
+    def _detach(self, reader):
+        self._remove(reader)
+        reader.flush_batch()
+
+    def _read(self, fd, reader):
+        try:
+            data = os.read(fd, reader.read_size)
+            if not data:
+                # 可读却读不到数据：设备已断开（如USB串口被拔出）
+                raise OSError('设备已断开')
+            reader.feed(data)
+        except BlockingIOError:
+            pass
+        except Exception as e:
+            self._remove(reader)
+            reader.report_error(e)
+
+    def _timeout(self):
+        """距离最早一批需要发送的秒数，没有待发送的行时返回None（一直等待）"""
+        deadlines = [d for d in (reader.flush_deadline() for reader in self.readers.values()) if d is not None]
+        if not deadlines:
+            return None
+        return max(0.0, min(deadlines) - time.monotonic())
+
+    def run(self):
+        self._thread_id = threading.get_ident()
+        while self.running:
+            for key, _ in self.selector.select(self._timeout()):
+                if key.data is None:
+                    self._run_commands()
+                elif self.readers.get(key.fd) is key.data:  # 同一轮中可能已被移除
+                    self._read(key.fd, key.data)
+            for reader in list(self.readers.values()):
+                reader.flush_due()
+        # 退出前执行剩余的命令，不让调用者一直等待
+        self._run_commands()
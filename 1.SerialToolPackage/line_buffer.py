@@ -0,0 +1,176 @@
+"""串口接收字节缓冲区：预分配bytearray + 按分隔符零拷贝切行"""
+import codecs
+
+# 接收编码：配置值 -> 显示名称
+ENCODINGS = {
+    'auto': '自动(UTF-8/GBK)',
+    'utf-8': 'UTF-8',
+    'gbk': 'GBK',
+    'latin-1': 'Latin-1',
+    'raw': '原始(\\xNN转义)',
+}
+
+# 常用的行结束符：HEX -> 显示名称，也可以填写任意字节序列的HEX
+TERMINATORS = {
+    '0A': 'LF (\\n)',
+    '0D': 'CR (\\r)',
+    '0D0A': 'CRLF (\\r\\n)',
+}
+
+
+class LineBuffer:
+    """预分配的字节环形缓冲区
+
+    新数据写入尾部，已切出的行只移动读指针；空间不足时把未完成的残余数据
+    搬回缓冲区头部（环形复用），仍不够才扩容。每次只在新到达的字节上用
+    bytearray.rfind查找最后一个分隔符，把之前的所有完整行作为一个
+    memoryview整体解码、再由str.split切开，未完成的行保持为原始字节，
+    因此吞吐与数据量成线性关系，每行只分配一次结果字符串。
+
+    encoding为ENCODINGS中的配置值。跨两次读取的多字节字符所在的行
+    尚未完整，仍以原始字节留在缓冲区，下次与后续字节拼接后才解码。
+    指定编码时每个端口持有一个解码器，每块只解码一次，非法字节替换为
+    U+FFFD；"raw"把非ASCII字节显示为\\xNN；"auto"先按UTF-8解码，
+    失败时整块按GBK解码，两者都失败才逐行回退。
+    分隔符含0x40及以上的字节时（可能出现在多字节字符中，或被解码替换），
+    整块解码后无法按文本切分，改为先按原始字节切行再逐行解码，保证行与原始字节一一对应。
+    """
+
+    def __init__(self, capacity=64 * 1024, delimiter=b'\n', encoding='auto'):
+        self._buf = bytearray(capacity)
+        self._view = memoryview(self._buf)
+        self._start = 0  # 未消费数据的起点
+        self._end = 0  # 已写入数据的终点
+        self._scan = 0  # 下一次查找分隔符的起点，避免重复扫描残余数据
+        self.delimiter = delimiter
+        self.decode_errors = 0  # 累计被替换为U+FFFD的非法字节序列数
+        self.set_encoding(encoding)
+
+    def set_encoding(self, encoding):
+        """切换接收编码，丢弃解码器中未完成的字节序列"""
+        self.encoding = encoding if encoding in ENCODINGS else 'auto'
+        if self.encoding == 'auto':
+            self._decoder = None
+        elif self.encoding == 'raw':
+            self._decoder = codecs.getincrementaldecoder('ascii')(errors='backslashreplace')
+        else:
+            self._decoder = codecs.getincrementaldecoder(self.encoding)(errors='replace')
+        self._sep = self.delimiter.decode('latin-1')
+        # 分隔符的字节都小于0x40时不会是UTF-8/GBK多字节字符的一部分，解码后仍是原样
+        self._split_text = max(self.delimiter) < 0x40
+
+    def __len__(self):
+        return self._end - self._start
+
+    def clear(self):
+        self._start = self._end = self._scan = 0
+        if self._decoder is not None:
+            self._decoder.reset()
+
+    def feed(self, data):
+        """追加原始字节"""
+        n = len(data)
+        if self._end + n > len(self._buf):
+            self._make_room(n)
+        self._buf[self._end:self._end + n] = data
+        self._end += n
+
+    def _make_room(self, n):
+        pending = self._end - self._start
+        if pending + n <= len(self._buf):
+            # 残余数据（通常不足一行）搬回头部，复用已消费的空间；
+            # 源和目标可能重叠，先切片复制一份
+            self._buf[0:pending] = self._buf[self._start:self._end]
+        else:
+            # 容量不足时按倍数扩容
+            capacity = len(self._buf)
+            while capacity < pending + n:
+                capacity *= 2
+            new_buf = bytearray(capacity)
+            new_buf[0:pending] = self._view[self._start:self._end]
+            self._buf = new_buf
+            self._view = memoryview(self._buf)
+        self._scan -= self._start
+        self._start = 0
+        self._end = pending
+
+    def take_complete(self):
+        """取出所有完整行组成的字节块（不含最后一个分隔符），没有完整行时返回None
+
+        返回的memoryview直接指向内部缓冲区，仅在下一次feed之前有效。
+        """
+        pos = self._buf.rfind(self.delimiter, self._scan, self._end)
+        if pos < 0:
+            # 分隔符可能跨越两次feed，下次从可能的起点重新查找
+            self._scan = max(self._start, self._end - len(self.delimiter) + 1)
+            return None
+        block = self._view[self._start:pos]
+        self._start = self._scan = pos + len(self.delimiter)
+        return block
+
+    def read_lines(self):
+        """解码并返回所有完整的行（不含分隔符）"""
+        block = self.take_complete()
+        if block is None:
+            return []
+        return self._decode(block)
+
+    def read_lines_with_raw(self):
+        """返回 (解码后的行, 每行的原始字节)，两个列表一一对应"""
+        block = self.take_complete()
+        if block is None:
+            return [], []
+        raw = bytes(block)
+        return self._decode(raw), raw.split(self.delimiter)
+
+    def read_partial_with_raw(self):
+        """取出还没有等到分隔符的残余数据（串口空闲超时时调用），返回(行, 原始字节)，没有残余时返回None
+
+        残余数据按完整的一行解码，末尾不完整的多字节字符被替换。
+        """
+        if self._end == self._start:
+            return None
+        raw = bytes(self._view[self._start:self._end])
+        self._start = self._scan = self._end
+        return self._decode(raw)[0], raw
+
+    def _decode(self, block):
+        if not self._split_text:
+            return [self._decode_line(raw) for raw in bytes(block).split(self.delimiter)]
+        if self._decoder is not None:
+            # 块以分隔符结尾，行尾残缺的字节序列不能延续到下一行，按final处理
+            text = self._decoder.decode(block, True)
+            if self.encoding != 'raw':
+                self.decode_errors += text.count('\ufffd')
+            return text.split(self._sep)
+        try:
+            return str(block, 'utf-8').split(self._sep)
+        except UnicodeDecodeError:
+            pass
+        try:
+            # GBK数据在第一个非ASCII字符处就不是合法UTF-8，上面的尝试很快失败，整块按GBK解码一次
+            return str(block, 'gbk').split(self._sep)
+        except UnicodeDecodeError:
+            # 整块既不是UTF-8也不是GBK（混有两种编码或有坏字节）时逐行解码，不影响同一块中的其他行
+            lines = [decode_line(raw) for raw in bytes(block).split(self.delimiter)]
+            self.decode_errors += sum(line.count('\ufffd') for line in lines)
+            return lines
+
+    def _decode_line(self, raw):
+        """单独解码一行"""
+        if self._decoder is not None:
+            line = self._decoder.decode(raw, True)
+            if self.encoding != 'raw':
+                self.decode_errors += line.count('\ufffd')
+            return line
+        line = decode_line(raw)
+        self.decode_errors += line.count('\ufffd')
+        return line
+
+
+def decode_line(raw):
+    """按UTF-8解码一行，失败时按GBK解码"""
+    try:
+        return raw.decode('utf-8')
+    except UnicodeDecodeError:
+        return raw.decode('gbk', errors='replace')
@@ -0,0 +1,96 @@
+"""关键字过滤引擎：过滤文本变化时编译一次，接收时每行只做一次正则匹配"""
+import re
+from functools import lru_cache
+
+
+class LineFilter:
+    """编译后的行过滤器
+
+    关键字模式：过滤文本以"|"分隔多个关键字，任意一个出现即命中；
+    以"!"开头的关键字表示排除，出现即不命中。所有关键字按公共前缀合并成
+    一棵字典树再生成一个正则（包含、排除各一个），由re在C层一次扫描完成
+    多关键字匹配。不区分大小写时关键字预先转小写、匹配前把行转小写，
+    比re.IGNORECASE快一个数量级。
+    正则模式：整个过滤文本作为一个正则表达式，以"!"开头表示取反。
+    全词模式：关键字/正则两侧加\\b，只匹配完整单词。
+    """
+
+    def __init__(self, text, case_sensitive=True, regex=False, whole_word=False):
+        self.text = text
+        self.case_sensitive = case_sensitive
+        self.regex = regex
+        self.whole_word = whole_word
+        # 关键字模式下不区分大小写时，匹配前先把行转小写
+        self.fold_case = not case_sensitive and not regex
+
+        if regex:
+            pattern = text.strip()
+            negate = pattern.startswith('!')
+            if negate:
+                pattern = pattern[1:]
+            flags = 0 if case_sensitive else re.IGNORECASE
+            self.include = None if negate else self._compile(pattern, flags)
+            self.exclude = self._compile(pattern, flags) if negate else None
+        else:
+            includes, excludes = [], []
+            for kw in text.split('|'):
+                kw = kw.strip()
+                if self.fold_case:
+                    kw = kw.lower()
+                if kw.startswith('!'):
+                    kw = kw[1:].strip()
+                    if kw:
+                        excludes.append(kw)
+                elif kw:
+                    includes.append(kw)
+            self.include = self._compile(keywords_pattern(includes), 0)
+            self.exclude = self._compile(keywords_pattern(excludes), 0)
+        self.active = bool(self.include or self.exclude)
+
+    def _compile(self, pattern, flags):
+        if not pattern:
+            return None
+        if self.whole_word:
+            pattern = rf'\b(?:{pattern})\b'
+        return re.compile(pattern, flags)
+
+    def match(self, line):
+        """判断一行是否通过过滤"""
+        if self.fold_case:
+            line = line.lower()
+        if self.include is not None and self.include.search(line) is None:
+            return False
+        if self.exclude is not None and self.exclude.search(line) is not None:
+            return False
+        return True
+
+
+def keywords_pattern(keywords):
+    """把多个字面关键字按公共前缀合并成一个正则，如 err|error|warn -> (?:err(?:or)?|warn)"""
+    trie = {}
+    for kw in keywords:
+        node = trie
+        for ch in kw:
+            node = node.setdefault(ch, {})
+        node[''] = None  # 关键字结束标记
+    if not trie:
+        return ''
+    return _trie_pattern(trie)
+
+
+def _trie_pattern(node):
+    end = '' in node
+    branches = [re.escape(ch) + _trie_pattern(child) for ch, child in sorted(node.items()) if ch]
+    if not branches:
+        return ''
+    pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+    if end:
+        # 当前前缀本身也是一个关键字，后续部分可选
+        pattern = f'(?:{pattern})?'
+    return pattern
+
+
+@lru_cache(maxsize=32)
+def compile_filter(text, case_sensitive=True, regex=False, whole_word=False):
+    """编译过滤器，相同设置的多个串口共用同一个实例；表达式错误时抛出re.error"""
+    return LineFilter(text, case_sensitive, regex, whole_word)
@@ -0,0 +1,342 @@
+"""单个串口的紧凑行存储：原始数据区和过滤结果区共用，正文和原始字节连续存放，每行只占几个数组元素"""
+from array import array
+from itertools import accumulate, islice
+
+from arrival_clock import TimestampFormatter
+from scrollback import Scrollback
+
+FLAG_TIMESTAMP = 1  # 该行显示时间戳（接收时时间戳开关是打开的）
+
+
+class LineStore:
+    """一个串口已接收的行
+
+    所有行的正文（UTF-8）依次追加到一个bytearray，原始字节追加到另一个bytearray，
+    每行的元数据按列存放在array中：正文/原始字节在字节区中的结束位置(Q)、
+    到达时间戳(q)、标志(B)，每行约25字节，不再为每行保存元组、字符串和时间戳文本。
+    时间戳前缀和正文字符串只在绘制、复制、查找用到某一行时才生成。
+
+    行号全局递增（淘汰、清空后不回退）。超过行数或字节数上限时从头部淘汰，
+    淘汰只移动头指针，积累到一半时再整体压缩字节区和元数据，均摊O(1)。
+    disk_bytes大于0时，超出上限的旧行不丢弃而是写入磁盘回滚文件（Scrollback），
+    内存占用仍受上述上限约束，磁盘上的行照常显示、过滤和查找；
+    磁盘占用超过disk_bytes后才真正淘汰最旧的行。
+    显示区的LogModel注册在listeners中，行追加、淘汰、清空前后收到通知。
+    只在GUI线程中修改；后台线程通过snapshot()得到的只读副本访问。
+    """
+
+    def __init__(self, max_lines=100000, max_bytes=32 * 1024 * 1024, disk_bytes=0):
+        self.max_lines = max_lines
+        self.max_bytes = max_bytes  # 内存中正文和原始字节合计的上限
+        self.first_seq = 0  # 第一条保留行（含磁盘上的行）的全局行号
+        self.memory_first_seq = 0  # 内存中第一条行的全局行号，之前的行在磁盘上
+        self.timestamp_formatter = TimestampFormatter()
+        self.listeners = []
+        self.scrollback = Scrollback(disk_bytes) if disk_bytes > 0 else None
+        self._reset()
+
+    def _reset(self):
+        self._text = bytearray()
+        self._raw = bytearray()
+        self._text_base = 0  # _text[0]对应的绝对位置
+        self._raw_base = 0
+        # 元数据数组中第i行的正文是_text[_text_pos[i]:_text_pos[i + 1]]（减去_text_base），原始字节同理
+        self._text_pos = array('Q', [0])
+        self._raw_pos = array('Q', [0])
+        self._stamps = array('q')
+        self._flags = array('B')
+        self._head = 0  # 第一条保留行在元数据数组中的位置
+
+    def __len__(self):
+        return self.next_seq - self.first_seq
+
+    def _memory_count(self):
+        return len(self._stamps) - self._head
+
+    @property
+    def next_seq(self):
+        """下一条追加行的全局行号"""
+        return self.memory_first_seq + self._memory_count()
+
+    @property
+    def total_bytes(self):
+        """内存中保留的正文和原始字节数"""
+        head = self._head
+        return (self._text_pos[-1] - self._text_pos[head]) + (self._raw_pos[-1] - self._raw_pos[head])
+
+    @property
+    def nbytes(self):
+        """存储实际占用的内存（字节区 + 元数据）"""
+        return (len(self._text) + len(self._raw) + self._text_pos.itemsize * len(self._text_pos) * 2
+                + self._stamps.itemsize * len(self._stamps) + len(self._flags))
+
+    @property
+    def disk_bytes(self):
+        """磁盘回滚文件的占用"""
+        return self.scrollback.nbytes if self.scrollback is not None else 0
+
+    # ---- 写入（GUI线程）----
+
+    def append(self, lines, stamps, raws, timestamp=True):
+        """追加一批行，返回第一行的全局行号；超出上限的旧行随即淘汰"""
+        first = self.next_seq
+        if not lines:
+            return first
+        for listener in self.listeners:
+            listener.lines_appending(first, len(lines))
+        text = ''.join(lines)
+        data = text.encode('utf-8', 'surrogatepass')
+        if len(data) == len(text):
+            # 全是ASCII时字节数等于字符数，不必逐行编码
+            lengths = map(len, lines)
+        else:
+            lengths = [len(line.encode('utf-8', 'surrogatepass')) for line in lines]
+        self._text += data
+        self._text_pos.extend(islice(accumulate(lengths, initial=self._text_pos[-1]), 1, None))
+        self._raw += b''.join(raws)
+        self._raw_pos.extend(islice(accumulate(map(len, raws), initial=self._raw_pos[-1]), 1, None))
+        self._stamps.extend(stamps)
+        self._flags.frombytes(bytes([FLAG_TIMESTAMP if timestamp else 0]) * len(lines))
+        for listener in self.listeners:
+            listener.lines_appended()
+        self.trim()
+        return first
+
+    def append_system(self, text):
+        """追加一条提示行（不显示时间戳，没有原始字节），返回其行号"""
+        return self.append([text], [0], [b''], timestamp=False)
+
+    def set_limits(self, max_lines, max_bytes):
+        self.max_lines = max_lines
+        self.max_bytes = max_bytes
+        self.trim()
+
+    def set_disk_limit(self, disk_bytes):
+        """设置磁盘回滚上限，0表示不写磁盘（已写入磁盘的行随即淘汰）"""
+        if disk_bytes > 0:
+            if self.scrollback is None:
+                self.scrollback = Scrollback(disk_bytes)
+            self.scrollback.max_bytes = disk_bytes
+            self._trim_disk()
+        elif self.scrollback is not None:
+            self._evict_disk(len(self.scrollback.segments))
+            self.scrollback = None
+
+    def trim(self):
+        """按行数和字节数上限把最旧的行移到磁盘或淘汰，返回移出内存的行数（至少保留一行）"""
+        count = self._memory_count()
+        drop = max(0, count - self.max_lines)
+        text_pos, raw_pos, head = self._text_pos, self._raw_pos, self._head
+        text_end, raw_end = text_pos[-1], raw_pos[-1]
+        if (text_end - text_pos[head + drop]) + (raw_end - raw_pos[head + drop]) > self.max_bytes:
+            # 剩余字节数随drop单调减少，二分查找满足上限的最小drop
+            low, high = drop, count - 1
+            while low < high:
+                mid = (low + high) // 2
+                if (text_end - text_pos[head + mid]) + (raw_end - raw_pos[head + mid]) > self.max_bytes:
+                    low = mid + 1
+                else:
+                    high = mid
+            drop = low
+        if not drop:
+            return 0
+        memory_first_seq = self.memory_first_seq + drop
+        if self.scrollback is not None:
+            # 移到磁盘，行号和显示不变，不必通知显示区
+            self._spill(drop)
+            self._head += drop
+            self.memory_first_seq = memory_first_seq
+            if self._head > len(self._stamps) // 2:
+                self._compact()
+            self._trim_disk()
+            return drop
+        for listener in self.listeners:
+            listener.lines_evicting(memory_first_seq)
+        self._head += drop
+        self.first_seq = self.memory_first_seq = memory_first_seq
+        if self._head > len(self._stamps) // 2:
+            self._compact()
+        for listener in self.listeners:
+            listener.lines_evicted()
+        return drop
+
+    def _spill(self, count):
+        """把内存中最旧的count行写入磁盘回滚文件"""
+        head = self._head
+        text_pos, raw_pos = self._text_pos, self._raw_pos
+        text_start, raw_start = text_pos[head], raw_pos[head]
+        text_end, raw_end = text_pos[head + count], raw_pos[head + count]
+        self.scrollback.write(
+            self.memory_first_seq,
+            self._text[text_start - self._text_base:text_end - self._text_base],
+            self._raw[raw_start - self._raw_base:raw_end - self._raw_base],
+            [pos - text_start for pos in text_pos[head + 1:head + count + 1]],
+            [pos - raw_start for pos in raw_pos[head + 1:head + count + 1]],
+            self._stamps[head:head + count], self._flags[head:head + count])
+
+    def _trim_disk(self):
+        """磁盘占用超过上限时整段淘汰最旧的分段"""
+        drop = self.scrollback.drop_count()
+        if drop:
+            self._evict_disk(drop)
+
+    def _evict_disk(self, segments):
+        """淘汰磁盘上最旧的segments个分段"""
+        scrollback = self.scrollback
+        if segments >= len(scrollback.segments):
+            first_seq = self.memory_first_seq
+        else:
+            first_seq = scrollback.segments[segments].first_seq
+        if first_seq == self.first_seq:
+            scrollback.drop(segments)
+            return
+        for listener in self.listeners:
+            listener.lines_evicting(first_seq)
+        scrollback.drop(segments)
+        self.first_seq = first_seq
+        for listener in self.listeners:
+            listener.lines_evicted()
+
+    def _compact(self):
+        """丢弃头指针之前的字节和元数据"""
+        head = self._head
+        text_start, raw_start = self._text_pos[head], self._raw_pos[head]
+        del self._text[:text_start - self._text_base]
+        del self._raw[:raw_start - self._raw_base]
+        self._text_base, self._raw_base = text_start, raw_start
+        del self._text_pos[:head]
+        del self._raw_pos[:head]
+        del self._stamps[:head]
+        del self._flags[:head]
+        self._head = 0
+
+    def clear(self):
+        """清空所有行，行号继续递增"""
+        for listener in self.listeners:
+            listener.store_resetting()
+        self.first_seq = self.memory_first_seq = self.next_seq
+        self._reset()
+        if self.scrollback is not None:
+            self.scrollback.close()
+        for listener in self.listeners:
+            listener.store_reset()
+
+    def close(self):
+        """释放磁盘回滚文件"""
+        if self.scrollback is not None:
+            self.scrollback.close()
+
+    # ---- 读取 ----
+
+    def _index(self, seq):
+        i = seq - self.memory_first_seq
+        if 0 <= i < self._memory_count():
+            return self._head + i
+        return None
+
+    def _disk(self, seq):
+        """磁盘上的行：(分段视图, 分段内序号)，否则(None, 0)"""
+        if self.first_seq <= seq < self.memory_first_seq:
+            return self.scrollback.view_of(seq)
+        return None, 0
+
+    def text(self, seq):
+        """按全局行号取正文，已淘汰的行返回None"""
+        i = self._index(seq)
+        if i is None:
+            view, offset = self._disk(seq)
+            return view.text(offset) if view is not None else None
+        base = self._text_base
+        return self._text[self._text_pos[i] - base:self._text_pos[i + 1] - base].decode('utf-8', 'surrogatepass')
+
+    def raw(self, seq):
+        i = self._index(seq)
+        if i is None:
+            view, offset = self._disk(seq)
+            return view.raw(offset) if view is not None else None
+        base = self._raw_base
+        return bytes(self._raw[self._raw_pos[i] - base:self._raw_pos[i + 1] - base])
+
+    def stamp(self, seq):
+        """到达时间戳（perf_counter_ns），提示行为0"""
+        i = self._index(seq)
+        if i is None:
+            view, offset = self._disk(seq)
+            return view.stamp(offset) if view is not None else None
+        return self._stamps[i]
+
+    def row(self, seq):
+        """(时间戳前缀, 正文, 原始字节)，与显示区原来的行三元组相同"""
+        i = self._index(seq)
+        if i is None:
+            view, offset = self._disk(seq)
+            if view is None:
+                return None
+            stamp, flags = view.stamp(offset), view.flags(offset)
+            text, raw = view.text(offset), view.raw(offset)
+        else:
+            stamp, flags = self._stamps[i], self._flags[i]
+            text, raw = self.text(seq), self.raw(seq)
+        prefix = f'[{self.timestamp_formatter.format(stamp)}]' if flags & FLAG_TIMESTAMP else ''
+        return prefix, text, raw
+
+    def search_disk(self, needle, start_time=None, end_time=None):
+        """查找磁盘上正文包含needle（不区分大小写）的行，内存中的行由搜索索引负责"""
+        if self.scrollback is None or self.first_seq == self.memory_first_seq:
+            return []
+        return self.scrollback.search(needle, start_time, end_time)
+
+    def snapshot(self):
+        """当前正文的只读副本，供后台线程遍历
+
+        内存中的正文复制一份（原始字节不复制），磁盘上的行只取分段的mmap视图。
+        """
+        head = self._head
+        start = self._text_pos[head]
+        parts = self.scrollback.views() if self.scrollback is not None else []
+        parts.append(MemoryPart(self.memory_first_seq, bytes(self._text[start - self._text_base:]),
+                                self._text_pos[head:], start))
+        return LineSnapshot(self.first_seq, [part for part in parts if len(part)])
+
+
+class MemoryPart:
+    """快照中内存部分的正文，接口与SegmentView相同"""
+
+    def __init__(self, first_seq, data, positions, base):
+        self.first_seq = first_seq
+        self._data = data
+        self._pos = positions  # 每行正文的绝对位置，data[0]对应base
+        self._base = base
+
+    def __len__(self):
+        return len(self._pos) - 1
+
+    def texts(self, start, stop):
+        """第start到stop行（相对first_seq）的正文"""
+        data, pos, base = self._data, self._pos, self._base
+        return [data[pos[i] - base:pos[i + 1] - base].decode('utf-8', 'surrogatepass')
+                for i in range(start, min(stop, len(self)))]
+
+
+class LineSnapshot:
+    """LineStore正文的只读副本，行号从first_seq开始，由磁盘分段和内存部分依次拼接"""
+
+    def __init__(self, first_seq, parts):
+        self.first_seq = first_seq
+        self._parts = parts
+
+    def __len__(self):
+        return sum(len(part) for part in self._parts)
+
+    def texts(self, start, stop):
+        """第start到stop行（相对first_seq）的正文"""
+        start += self.first_seq
+        stop += self.first_seq
+        result = []
+        for part in self._parts:
+            part_start = part.first_seq
+            part_stop = part_start + len(part)
+            if part_stop <= start or part_start >= stop:
+                continue
+            result.extend(part.texts(max(start, part_start) - part_start, min(stop, part_stop) - part_start))
+        return result
@@ -0,0 +1,412 @@
+"""大日志文件查看：mmap只读打开保存的日志，后台分块建行索引，只绘制可见行"""
+import mmap
+import os
+import re
+import threading
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QCheckBox,
+                             QPushButton, QSplitter, QFileDialog, QMessageBox)
+from PyQt5.QtCore import Qt, QThread, QTimer, pyqtSignal
+from PyQt5.QtGui import QFont
+
+from history_filter import HistoryFilterThread
+from line_filter import compile_filter
+from log_view import LogView
+
+BLOCK_SIZE = 64 * 1024  # 行索引的粒度：每块只记录一个累计换行数
+CHUNK_SIZE = 16 * 1024 * 1024  # 索引线程每次读入的字节数
+BLOCK_CACHE = 64  # 缓存换行位置的块数
+# 日志行开头的时间戳，与显示区/自动保存的格式相同：[2025-06-05 20:44:41.202]
+TIMESTAMP_RE = re.compile(rb'\[\d{4}-\d\d-\d\d \d\d:\d\d:\d\d\.\d{3}\]')
+# 换行后紧跟的时间戳；以字面量开头，比多行模式的"^"快一倍
+LINE_TIMESTAMP_RE = re.compile(rb'\n' + TIMESTAMP_RE.pattern)
+
+
+class LogFile:
+    """只读映射的日志文件，接口与LineStore的读取部分相同，可直接交给LogView显示
+
+    行索引是稀疏的：block_lines[b]是文件前b个块（每块BLOCK_SIZE字节）中的换行数，
+    2GB文件只需几百KB。取某一行时二分找到所在的块，块内的换行位置在第一次
+    用到时查找并缓存，因此只有可见行和被过滤的行会被读入内存。
+    行索引由LogIndexThread在后台建立，publish()在GUI线程中公布已建好的行数。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.first_seq = 0
+        self.listeners = []
+        self.show_timestamp = True
+        self._file = open(path, 'rb')
+        self.size = os.fstat(self._file.fileno()).st_size
+        # 空文件不能映射
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b''
+        self.block_lines = array('Q', [0])
+        self.indexed_bytes = 0
+        self._count = 0  # 已公布的行数
+        self._cache = OrderedDict()  # 块号 -> 块内换行的绝对位置
+        self._lock = threading.Lock()  # GUI线程和过滤线程共用块缓存
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def next_seq(self):
+        return self._count
+
+    # ---- 建索引（索引线程）----
+
+    def index_chunk(self):
+        """为下一段CHUNK_SIZE字节建索引，返回是否还有剩余"""
+        start = self.indexed_bytes
+        end = min(start + CHUNK_SIZE, self.size)
+        data = self._map[start:end]
+        total = self.block_lines[-1]
+        counts = array('Q')
+        for offset in range(0, len(data), BLOCK_SIZE):
+            total += data.count(b'\n', offset, offset + BLOCK_SIZE)
+            counts.append(total)
+        self.block_lines.extend(counts)
+        self.indexed_bytes = end
+        return end < self.size
+
+    def indexed_lines(self):
+        """已建好索引的行数，全部建完后包括末尾没有换行符的最后一行"""
+        count = self.block_lines[-1]
+        if self.indexed_bytes == self.size and self.size and self._map[self.size - 1] != 0x0A:
+            count += 1
+        return count
+
+    def publish(self, count):
+        """公布新建好索引的行（GUI线程），显示区随之增加行"""
+        if count <= self._count:
+            return
+        for listener in self.listeners:
+            listener.lines_appending(self._count, count - self._count)
+        self._count = count
+        for listener in self.listeners:
+            listener.lines_appended()
+
+    # ---- 读取 ----
+
+    def _newlines(self, block):
+        """块内换行的绝对位置（带缓存）"""
+        with self._lock:
+            positions = self._cache.get(block)
+            if positions is not None:
+                self._cache.move_to_end(block)
+                return positions
+        start = block * BLOCK_SIZE
+        data = self._map[start:start + BLOCK_SIZE]
+        positions = array('Q')
+        pos = data.find(b'\n')
+        while pos >= 0:
+            positions.append(start + pos)
+            pos = data.find(b'\n', pos + 1)
+        with self._lock:
+            self._cache[block] = positions
+            if len(self._cache) > BLOCK_CACHE:
+                self._cache.popitem(last=False)
+        return positions
+
+    def _newline_pos(self, k):
+        """第k个（从1开始）换行符的位置"""
+        counts = self.block_lines
+        block = bisect_left(counts, k) - 1
+        return self._newlines(block)[k - counts[block] - 1]
+
+    def _span(self, seq):
+        start = self._newline_pos(seq) + 1 if seq else 0
+        end = self._newline_pos(seq + 1) if seq + 1 <= self.block_lines[-1] else self.size
+        return start, end
+
+    def _split(self, line):
+        """一行的字节 -> (时间戳前缀, 正文字节)"""
+        if line.endswith(b'\r'):
+            line = line[:-1]
+        match = TIMESTAMP_RE.match(line)
+        if match is None:
+            return '', line
+        return line[:match.end()].decode('ascii'), line[match.end():]
+
+    def row(self, seq):
+        """(时间戳前缀, 正文, 正文字节)，与LineStore.row()相同；HEX显示正文在文件中的字节"""
+        if not 0 <= seq < self._count:
+            return None
+        start, end = self._span(seq)
+        prefix, data = self._split(self._map[start:end])
+        return (prefix if self.show_timestamp else ''), data.decode('utf-8', 'replace'), data
+
+    def text(self, seq):
+        row = self.row(seq)
+        return row[1] if row is not None else None
+
+    def snapshot(self):
+        """已公布的行的只读视图，供过滤线程遍历"""
+        return LogFileSnapshot(self, self._count)
+
+    def texts(self, start, stop):
+        """第start到stop行的正文（不含时间戳），整段读出后再切分"""
+        if start >= stop:
+            return []
+        begin = self._span(start)[0]
+        end = self._span(stop - 1)[1]
+        # 整段去掉行首时间戳、整段解码，不逐行做正则和解码
+        data = LINE_TIMESTAMP_RE.sub(b'\n', b'\n' + self._map[begin:end])
+        text = data[1:].decode('utf-8', 'replace')
+        return text.replace('\r\n', '\n').split('\n')
+
+    def close(self):
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+
+class LogFileSnapshot:
+    """LogFile前count行的视图，接口与LineSnapshot相同"""
+
+    def __init__(self, log_file, count):
+        self.first_seq = 0
+        self._file = log_file
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def texts(self, start, stop):
+        return self._file.texts(start, min(stop, self._count))
+
+
+class LogIndexThread(QThread):
+    """后台分块建行索引，每块完成后报告已建好的行数，可以边建边翻看"""
+    progress = pyqtSignal('qint64', 'qint64')  # 已建好索引的行数, 已处理字节数（超过2GB）
+
+    def __init__(self, log_file, parent=None):
+        super().__init__(parent)
+        self.log_file = log_file
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        log_file = self.log_file
+        while not self.cancelled:
+            more = log_file.index_chunk()
+            self.progress.emit(log_file.indexed_lines(), log_file.indexed_bytes)
+            if not more:
+                break
+
+
+class LogFileViewer(QWidget):
+    """打开保存的日志文件：上方显示全部行，下方显示过滤结果，过滤和HEX显示与接收模式相同"""
+
+    def __init__(self, path=None, parent=None):
+        super().__init__(parent)
+        self.log_file = None
+        self.indexer = None
+        self.history_filter = None
+        self.line_filter = None
+        self.init_ui()
+        if path:
+            self.open_file(path)
+
+    def init_ui(self):
+        layout = QVBoxLayout(self)
+
+        file_layout = QHBoxLayout()
+        self.open_btn = QPushButton('打开日志')
+        self.open_btn.clicked.connect(self.choose_file)
+        file_layout.addWidget(self.open_btn)
+        self.path_label = QLabel('未打开文件')
+        file_layout.addWidget(self.path_label, 1)
+        self.show_hex_checkbox = QCheckBox('HEX显示')
+        self.show_hex_checkbox.toggled.connect(self.update_show_hex)
+        file_layout.addWidget(self.show_hex_checkbox)
+        self.show_timestamp_checkbox = QCheckBox('显示时间戳')
+        self.show_timestamp_checkbox.setChecked(True)
+        self.show_timestamp_checkbox.toggled.connect(self.update_show_timestamp)
+        file_layout.addWidget(self.show_timestamp_checkbox)
+        layout.addLayout(file_layout)
+
+        filter_layout = QHBoxLayout()
+        filter_layout.addWidget(QLabel('过滤:'))
+        self.filter_edit = QLineEdit()
+        self.filter_edit.setPlaceholderText('关键字,以"|"隔开,"!"开头表示排除')
+        filter_layout.addWidget(self.filter_edit, 4)
+        self.filter_case_checkbox = QCheckBox('区分大小写')
+        self.filter_case_checkbox.setChecked(True)
+        filter_layout.addWidget(self.filter_case_checkbox)
+        self.filter_regex_checkbox = QCheckBox('正则')
+        filter_layout.addWidget(self.filter_regex_checkbox)
+        self.filter_whole_word_checkbox = QCheckBox('全词')
+        filter_layout.addWidget(self.filter_whole_word_checkbox)
+        self.filter_edit.textChanged.connect(self.update_filter)
+        self.filter_case_checkbox.toggled.connect(self.update_filter)
+        self.filter_regex_checkbox.toggled.connect(self.update_filter)
+        self.filter_whole_word_checkbox.toggled.connect(self.update_filter)
+        layout.addLayout(filter_layout)
+
+        self.display_splitter = QSplitter(Qt.Vertical)
+        layout.addWidget(self.display_splitter, 1)
+        self.receive_text = None
+        self.filter_preview_text = None
+
+        status_layout = QHBoxLayout()
+        self.status_label = QLabel('就绪')
+        status_layout.addWidget(self.status_label, 1)
+        self.cancel_refilter_btn = QPushButton('取消过滤')
+        self.cancel_refilter_btn.clicked.connect(self.cancel_history_filter)
+        self.cancel_refilter_btn.hide()
+        status_layout.addWidget(self.cancel_refilter_btn)
+        layout.addLayout(status_layout)
+
+        # 过滤条件停止输入一段时间后再开始过滤
+        self.refilter_timer = QTimer(self)
+        self.refilter_timer.setSingleShot(True)
+        self.refilter_timer.setInterval(300)
+        self.refilter_timer.timeout.connect(self.start_history_filter)
+
+    def choose_file(self):
+        file_path, _ = QFileDialog.getOpenFileName(self, '打开日志', '', '文本文件 (*.txt *.log);;所有文件 (*)')
+        if file_path:
+            self.open_file(file_path)
+
+    def open_file(self, path):
+        """映射文件并开始在后台建行索引，第一块建好后即可翻看"""
+        try:
+            log_file = LogFile(path)
+        except (OSError, ValueError) as e:
+            QMessageBox.critical(self, '错误', f'打开文件失败: {str(e)}')
+            return False
+        self.close_file()
+        self.log_file = log_file
+        log_file.show_timestamp = self.show_timestamp_checkbox.isChecked()
+        self.receive_text = LogView(self, log_file)
+        self.receive_text.setFont(QFont("Consolas", 9))
+        self.filter_preview_text = LogView(self, log_file, filtered=self.line_filter is not None)
+        self.filter_preview_text.setPlaceholderText("过滤结果...")
+        self.filter_preview_text.setFont(QFont("Consolas", 9))
+        # 双击过滤结果跳到上方对应的行
+        self.filter_preview_text.seq_activated.connect(self.receive_text.scroll_to_seq)
+        for view in (self.receive_text, self.filter_preview_text):
+            view.follow_new_rows = False  # 打开时停在文件开头，建索引期间不跟随滚动
+            view.set_show_hex(self.show_hex_checkbox.isChecked())
+            self.display_splitter.addWidget(view)
+        self.display_splitter.setSizes([200, 100])
+        self.path_label.setText(path)
+
+        self.indexer = LogIndexThread(log_file, self)
+        self.indexer.progress.connect(lambda lines, done, w=self.indexer: self.on_index_progress(w, lines, done))
+        self.indexer.start()
+        return True
+
+    def on_index_progress(self, worker, lines, done):
+        if worker is not self.indexer:
+            return
+        self.log_file.publish(lines)
+        size = self.log_file.size
+        if done < size:
+            self.status_label.setText(f'正在建立行索引: {lines}行 ({done * 100 // size}%)')
+            return
+        self.indexer = None
+        self.status_label.setText(f'共{lines}行，{size / 1024 / 1024:.1f}MB')
+        if self.line_filter is not None:
+            self.start_history_filter()
+
+    def update_show_hex(self, show_hex):
+        for view in (self.receive_text, self.filter_preview_text):
+            if view is not None:
+                view.set_show_hex(show_hex)
+
+    def update_show_timestamp(self, show_timestamp):
+        if self.log_file is not None:
+            self.log_file.show_timestamp = show_timestamp
+            self.receive_text.viewport().update()
+            self.filter_preview_text.viewport().update()
+
+    def update_filter(self, *args):
+        """过滤文本或模式变化时编译过滤器"""
+        try:
+            line_filter = compile_filter(self.filter_edit.text().strip(),
+                                         self.filter_case_checkbox.isChecked(),
+                                         self.filter_regex_checkbox.isChecked(),
+                                         self.filter_whole_word_checkbox.isChecked())
+        except re.error as e:
+            self.line_filter = None
+            self.status_label.setText(f'过滤表达式错误: {e}')
+            return
+        self.line_filter = line_filter if line_filter.active else None
+        self.refilter_timer.start()
+
+    def start_history_filter(self):
+        """在后台用当前过滤器扫描整个文件；行索引未建完时等建完再开始"""
+        self.stop_history_filter()
+        if self.log_file is None:
+            return
+        model = self.filter_preview_text.log_model
+        if self.line_filter is None:
+            model.show_all()
+            return
+        model.show_seqs()
+        if self.indexer is not None:
+            return
+        snapshot = self.log_file.snapshot()
+        if not len(snapshot):
+            return
+        worker = HistoryFilterThread(snapshot, self.line_filter, parent=self)
+        worker.rows_matched.connect(lambda seqs, w=worker: self.on_history_rows(w, seqs))
+        worker.progress.connect(lambda done, total, w=worker: self.on_history_progress(w, done, total))
+        worker.finished.connect(lambda w=worker: self.on_history_finished(w))
+        self.history_filter = worker
+        self.cancel_refilter_btn.show()
+        worker.start()
+
+    def on_history_rows(self, worker, seqs):
+        if worker is self.history_filter:
+            self.filter_preview_text.log_model.append_seqs(seqs)
+
+    def on_history_progress(self, worker, done, total):
+        if worker is self.history_filter:
+            self.status_label.setText(f'过滤中: {done}/{total} ({done * 100 // total}%)')
+
+    def on_history_finished(self, worker):
+        if worker is not self.history_filter:
+            return
+        self.status_label.setText(f'过滤完成: {len(worker.snapshot)}行中命中{worker.matched_count}行')
+        self.history_filter = None
+        self.cancel_refilter_btn.hide()
+
+    def cancel_history_filter(self):
+        """取消过滤，保留已得到的结果"""
+        if self.history_filter is not None:
+            self.stop_history_filter()
+            self.status_label.setText('已取消过滤')
+
+    def stop_history_filter(self):
+        if self.history_filter is not None:
+            self.history_filter.cancel()
+            self.history_filter.wait()
+            self.history_filter = None
+            self.cancel_refilter_btn.hide()
+
+    def close_file(self):
+        """停止后台线程并关闭当前文件"""
+        self.stop_history_filter()
+        if self.indexer is not None:
+            self.indexer.cancel()
+            self.indexer.wait()
+            self.indexer = None
+        for view in (self.receive_text, self.filter_preview_text):
+            if view is not None:
+                view.setParent(None)
+                view.deleteLater()
+        self.receive_text = self.filter_preview_text = None
+        if self.log_file is not None:
+            self.log_file.close()
+            self.log_file = None
+
+    def closeEvent(self, event):
+        self.close_file()
+        event.accept()
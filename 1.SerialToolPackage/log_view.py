@@ -0,0 +1,477 @@
+"""有上限的虚拟化日志显示控件（共用的紧凑行存储，只绘制可见行）"""
+from array import array
+from bisect import bisect_left
+from PyQt5.QtWidgets import QAbstractScrollArea, QApplication, QToolTip
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QRect, QEvent, pyqtSignal
+from PyQt5.QtGui import QColor, QKeySequence, QPainter
+
+from hex_format import hex_dump, row_hex, row_to_text
+from line_store import LineStore
+
+TIMESTAMP_COLOR = QColor('#888888')
+HEX_COLOR = QColor('#666666')
+
+
+class LogModel(QAbstractListModel):
+    """日志行模型：LineStore上的一个视图
+
+    seqs为None时显示存储中的全部行（原始数据区，以及没有过滤条件时的过滤结果区）；
+    否则只显示seqs中列出的全局行号（过滤结果区），每个命中行只占8字节，
+    与原始数据区共用同一份行数据。行是 (前缀, 正文, 原始字节) 三元组，
+    由LineStore在绘制/复制时生成，HEX同样只在show_hex打开时由原始字节转换。
+    存储淘汰旧行时，行号列表中已淘汰的部分随之删除。
+    """
+    RowRole = Qt.UserRole + 1
+
+    def __init__(self, store, filtered=False, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.seqs = array('Q') if filtered else None  # 显示的全局行号（升序），None表示全部
+        self.show_hex = False  # 是否在正文后显示原始字节的HEX
+        self._evict_count = 0
+        store.listeners.append(self)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.store) if self.seqs is None else len(self.seqs)
+
+    def seq_at(self, row):
+        """第row行的全局行号"""
+        return self.store.first_seq + row if self.seqs is None else self.seqs[row]
+
+    def row_of_seq(self, seq):
+        """全局行号在本视图中的行，不在视图中时返回-1"""
+        if self.seqs is None:
+            row = seq - self.store.first_seq
+            return row if 0 <= row < len(self.store) else -1
+        row = bisect_left(self.seqs, seq)
+        return row if row < len(self.seqs) and self.seqs[row] == seq else -1
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self.store.row(self.seq_at(index.row()))
+        if row is None:
+            return None
+        if role == self.RowRole:
+            return row
+        if role == Qt.DisplayRole:
+            return row_to_text(row, self.show_hex)
+        if role == Qt.ToolTipRole:
+            # 悬停时才生成偏移/HEX/ASCII转储
+            if self.show_hex and row[2]:
+                return hex_dump(row[2])
+            return row_to_text(row)
+        return None
+
+    def row_text(self, i):
+        return row_to_text(self.store.row(self.seq_at(i)), self.show_hex)
+
+    @property
+    def first_seq(self):
+        return self.store.first_seq
+
+    @property
+    def next_seq(self):
+        """下一条追加行的全局行号"""
+        return self.store.next_seq
+
+    def text_by_seq(self, seq):
+        """按全局行号取正文，已淘汰的行返回None"""
+        return self.store.text(seq)
+
+    def show_all(self):
+        """显示存储中的全部行（没有过滤条件）"""
+        if self.seqs is not None:
+            self.beginResetModel()
+            self.seqs = None
+            self.endResetModel()
+
+    def show_seqs(self):
+        """改为只显示之后append_seqs()加入的行"""
+        self.beginResetModel()
+        self.seqs = array('Q')
+        self.endResetModel()
+
+    def append_seqs(self, seqs):
+        """追加命中的行号（升序，且大于已有的行号），已被淘汰的行号被忽略"""
+        first_seq = self.store.first_seq
+        if seqs and seqs[0] < first_seq:
+            seqs = [seq for seq in seqs if seq >= first_seq]
+        if not seqs:
+            return
+        first = len(self.seqs)
+        self.beginInsertRows(QModelIndex(), first, first + len(seqs) - 1)
+        self.seqs.extend(seqs)
+        self.endInsertRows()
+
+    def clear(self):
+        """清空本视图：全部行视图清空存储（两个显示区同时清空），行号视图只清空行号"""
+        if self.seqs is None:
+            self.store.clear()
+        else:
+            self.show_seqs()
+
+    # ---- LineStore的通知 ----
+
+    def lines_appending(self, first_seq, count):
+        if self.seqs is None:
+            first = first_seq - self.store.first_seq
+            self.beginInsertRows(QModelIndex(), first, first + count - 1)
+
+    def lines_appended(self):
+        if self.seqs is None:
+            self.endInsertRows()
+
+    def lines_evicting(self, first_seq):
+        if self.seqs is None:
+            self._evict_count = first_seq - self.store.first_seq
+        else:
+            self._evict_count = bisect_left(self.seqs, first_seq)
+        if self._evict_count:
+            self.beginRemoveRows(QModelIndex(), 0, self._evict_count - 1)
+
+    def lines_evicted(self):
+        if self._evict_count:
+            if self.seqs is not None:
+                del self.seqs[:self._evict_count]
+            self.endRemoveRows()
+            self._evict_count = 0
+
+    def store_resetting(self):
+        self.beginResetModel()
+
+    def store_reset(self):
+        if self.seqs is not None:
+            self.seqs = array('Q')
+        self.endResetModel()
+
+
+class LogView(QAbstractScrollArea):
+    """日志显示控件，原始数据区和过滤结果区共用一个LineStore
+
+    直接在视口上绘制可见的几十行，滚动条以行为单位，行数再多，
+    追加、淘汰和滚动的开销也只与可见行数有关（QListView每次增删行都要
+    重新布局全部行，几十万行以上明显卡顿）。行不换行：绘制时记录已显示过的最宽行，
+    超出视口宽度时出现横向滚动条（不为测量宽度遍历全部行）。
+    filtered为True时是行号视图（过滤结果区）。新行插入前记录是否在底部，
+    插入后原本在底部时保持跟随滚动（替代原SmartTextEdit.append_smart）。
+    支持单击/Shift/拖动选中连续的行，Ctrl+C复制，双击发出seq_activated。
+    """
+    seq_activated = pyqtSignal(object)  # 双击的行的全局行号
+
+    def __init__(self, parent=None, store=None, filtered=False):
+        super().__init__(parent)
+        self.auto_scroll = True
+        self.follow_new_rows = True  # 新行到达时，原本在底部则跟随滚动
+        self._force_next_scroll = False
+        self._was_at_bottom = True
+        self._placeholder = ""
+        self._current = -1  # 当前行（选中范围的一端）
+        self._anchor = -1  # 选中范围的另一端
+        self._content_width = 0  # 已绘制过的最宽行的像素宽度，决定横向滚动范围
+        self.store = store if store is not None else LineStore()
+        self.log_model = LogModel(self.store, filtered, self)
+        self.setFocusPolicy(Qt.StrongFocus)
+        self.verticalScrollBar().valueChanged.connect(self.on_scroll_changed)
+        self.horizontalScrollBar().valueChanged.connect(self.viewport().update)
+        model = self.log_model
+        model.rowsAboutToBeInserted.connect(self.on_rows_inserting)
+        model.rowsInserted.connect(self.on_rows_inserted)
+        model.rowsRemoved.connect(self.on_rows_removed)
+        model.modelReset.connect(self.on_model_reset)
+
+    # ---- 滚动 ----
+
+    def line_height(self):
+        return self.fontMetrics().height() + 2
+
+    def visible_rows(self):
+        """视口能完整显示的行数"""
+        return max(1, self.viewport().height() // self.line_height())
+
+    def update_scroll_range(self):
+        scrollbar = self.verticalScrollBar()
+        page = self.visible_rows()
+        scrollbar.setPageStep(page)
+        scrollbar.setRange(0, max(0, self.log_model.rowCount() - page))
+        self.update_width_range()
+
+    def update_width_range(self):
+        scrollbar = self.horizontalScrollBar()
+        width = self.viewport().width()
+        scrollbar.setPageStep(width)
+        scrollbar.setSingleStep(self.fontMetrics().averageCharWidth() * 4)
+        scrollbar.setRange(0, max(0, self._content_width - width))
+
+    def reset_content_width(self):
+        """显示内容整体变化（清空、切换HEX、换字体）后重新统计最宽行"""
+        self._content_width = 0
+        self.horizontalScrollBar().setValue(0)
+        self.update_width_range()
+        self.viewport().update()
+
+    def on_scroll_changed(self, value):
+        if self._force_next_scroll:
+            self._force_next_scroll = False
+            self.auto_scroll = True
+        else:
+            scrollbar = self.verticalScrollBar()
+            self.auto_scroll = (value == scrollbar.maximum())
+        self.viewport().update()
+
+    def on_rows_inserting(self, parent, first, last):
+        scrollbar = self.verticalScrollBar()
+        self._was_at_bottom = (scrollbar.value() == scrollbar.maximum())
+
+    def on_rows_inserted(self, parent, first, last):
+        self.update_scroll_range()
+        # 原本在底部时保持跟随滚动
+        if self.follow_new_rows and self._was_at_bottom:
+            self.scrollToBottom()
+            self.auto_scroll = True
+        self.viewport().update()
+
+    def on_rows_removed(self, parent, first, last):
+        # 头部的行被淘汰，继续显示原来的那些行
+        count = last - first + 1
+        for name in ('_current', '_anchor'):
+            row = getattr(self, name)
+            if row > last:
+                setattr(self, name, row - count)
+            elif row >= first:
+                setattr(self, name, -1)
+        scrollbar = self.verticalScrollBar()
+        at_bottom = scrollbar.value() == scrollbar.maximum()
+        value = scrollbar.value()
+        if value > last:
+            value -= count
+        elif value >= first:
+            value = first
+        self.update_scroll_range()
+        if at_bottom:
+            self.scrollToBottom()
+        else:
+            scrollbar.setValue(value)
+        self.viewport().update()
+
+    def on_model_reset(self):
+        self._current = self._anchor = -1
+        self.update_scroll_range()
+        self.verticalScrollBar().setValue(0)
+        self.reset_content_width()
+
+    def scrollToBottom(self):
+        scrollbar = self.verticalScrollBar()
+        scrollbar.setValue(scrollbar.maximum())
+
+    def force_auto_scroll(self):
+        """强制恢复自动滚动并滚动到底部"""
+        self._force_next_scroll = True
+        self.scrollToBottom()
+        self.auto_scroll = True
+
+    def ensure_visible(self, row, center=False):
+        scrollbar = self.verticalScrollBar()
+        page = self.visible_rows()
+        if center:
+            scrollbar.setValue(row - page // 2)
+        elif row < scrollbar.value():
+            scrollbar.setValue(row)
+        elif row >= scrollbar.value() + page:
+            scrollbar.setValue(row - page + 1)
+
+    def set_limits(self, max_lines, max_bytes):
+        """设置最多保留的行数和字节数（作用于共用的存储）"""
+        self.store.set_limits(max_lines, max_bytes)
+
+    def set_show_hex(self, show_hex):
+        """切换HEX显示，对已有的行同样生效"""
+        self.log_model.show_hex = show_hex
+        self.reset_content_width()
+
+    def scroll_to_seq(self, seq):
+        """跳转到全局行号对应的行并选中，行不在本视图中时返回False"""
+        row = self.log_model.row_of_seq(seq)
+        if row < 0:
+            return False
+        self._current = self._anchor = row
+        self.ensure_visible(row, center=True)
+        self.viewport().update()
+        return True
+
+    def current_seq(self):
+        """当前选中行的全局行号，没有选中时取第一条可见行"""
+        row = self._current
+        if row < 0:
+            row = self.verticalScrollBar().value()
+        if row >= self.log_model.rowCount():
+            return self.log_model.first_seq - 1
+        return self.log_model.seq_at(row)
+
+    def line_count(self):
+        return self.log_model.rowCount()
+
+    def text_size(self):
+        """存储中保留的正文和原始字节数（O(1)）"""
+        return self.store.total_bytes
+
+    def clear(self):
+        self.log_model.clear()
+
+    def toPlainText(self):
+        model = self.log_model
+        return '\n'.join(model.row_text(i) for i in range(model.rowCount()))
+
+    def write_text(self, file, chunk_lines=10000):
+        """分块写出全部行的纯文本（保存用），不在内存中拼出整个文本"""
+        model = self.log_model
+        count = model.rowCount()
+        for start in range(0, count, chunk_lines):
+            if start:
+                file.write('\n')
+            file.write('\n'.join(model.row_text(i) for i in range(start, min(start + chunk_lines, count))))
+
+    def setPlaceholderText(self, text):
+        self._placeholder = text
+
+    # ---- 绘制 ----
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        at_bottom = self.auto_scroll
+        self.update_scroll_range()
+        if at_bottom:
+            self.scrollToBottom()
+
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        if event.type() == QEvent.FontChange:
+            self.update_scroll_range()
+            self.reset_content_width()
+
+    def paintEvent(self, event):
+        painter = QPainter(self.viewport())
+        model = self.log_model
+        count = model.rowCount()
+        rect = self.viewport().rect()
+        if not count:
+            if self._placeholder:
+                painter.setPen(self.palette().placeholderText().color())
+                painter.drawText(rect.adjusted(4, 2, -4, -2), Qt.AlignLeft | Qt.AlignTop, self._placeholder)
+            return
+        palette = self.palette()
+        fm = self.fontMetrics()
+        height = self.line_height()
+        first = self.verticalScrollBar().value()
+        last = min(count, first + rect.height() // height + 1)
+        low, high = sorted((self._anchor, self._current))
+        store_row, seq_at = model.store.row, model.seq_at
+        show_hex = model.show_hex
+        right = rect.right()
+        offset = self.horizontalScrollBar().value()
+        widest = self._content_width
+        for i in range(first, last):
+            row = store_row(seq_at(i))
+            if row is None:
+                continue
+            top = (i - first) * height
+            selected = low >= 0 and low <= i <= high
+            if selected:
+                painter.fillRect(QRect(0, top, rect.width(), height), palette.highlight())
+            text_color = palette.highlightedText().color() if selected else palette.text().color()
+            # 时间戳和HEX用灰色，正文用默认颜色；HEX在绘制可见行时才生成
+            suffix = row_hex(row) if show_hex else ''
+            x = 2 - offset
+            for segment, color in ((row[0], TIMESTAMP_COLOR), (row[1], text_color), (suffix, HEX_COLOR)):
+                if not segment:
+                    continue
+                advance = fm.horizontalAdvance(segment)
+                if x < right and x + advance > 0:
+                    painter.setPen(text_color if selected else color)
+                    painter.drawText(QRect(x, top, advance + 1, height),
+                                     Qt.AlignLeft | Qt.AlignVCenter | Qt.TextSingleLine, segment)
+                x += advance
+            widest = max(widest, x + offset + 4)
+        if widest > self._content_width:
+            # 出现更宽的行时扩大横向滚动范围（设置范围不会立即重绘）
+            self._content_width = widest
+            self.update_width_range()
+
+    def viewportEvent(self, event):
+        if event.type() == QEvent.ToolTip:
+            row = self.row_at(event.pos().y())
+            if row >= 0:
+                QToolTip.showText(event.globalPos(),
+                                  self.log_model.data(self.log_model.index(row), Qt.ToolTipRole), self.viewport())
+            else:
+                QToolTip.hideText()
+            return True
+        return super().viewportEvent(event)
+
+    # ---- 选择和键盘 ----
+
+    def row_at(self, y):
+        """视口纵坐标处的行，没有行时返回-1"""
+        row = self.verticalScrollBar().value() + y // self.line_height()
+        return row if 0 <= row < self.log_model.rowCount() else -1
+
+    def set_current(self, row, extend=False):
+        count = self.log_model.rowCount()
+        if not count:
+            return
+        row = min(max(row, 0), count - 1)
+        self._current = row
+        if not extend or self._anchor < 0:
+            self._anchor = row
+        self.ensure_visible(row)
+        self.viewport().update()
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            row = self.row_at(event.pos().y())
+            if row >= 0:
+                self.set_current(row, bool(event.modifiers() & Qt.ShiftModifier))
+        super().mousePressEvent(event)
+
+    def mouseMoveEvent(self, event):
+        if event.buttons() & Qt.LeftButton and self._anchor >= 0:
+            y = event.pos().y()
+            row = self.verticalScrollBar().value() + y // self.line_height()
+            self.set_current(row, extend=True)
+        super().mouseMoveEvent(event)
+
+    def mouseDoubleClickEvent(self, event):
+        row = self.row_at(event.pos().y())
+        if row >= 0:
+            self.seq_activated.emit(self.log_model.seq_at(row))
+        super().mouseDoubleClickEvent(event)
+
+    def keyPressEvent(self, event):
+        # Ctrl+C 复制选中的行
+        if event.matches(QKeySequence.Copy):
+            if self._anchor >= 0:
+                low, high = sorted((self._anchor, self._current))
+                model = self.log_model
+                QApplication.clipboard().setText('\n'.join(model.row_text(i) for i in range(low, high + 1)))
+            return
+        if event.matches(QKeySequence.SelectAll):
+            self._anchor = 0
+            self.set_current(self.log_model.rowCount() - 1, extend=True)
+            return
+        extend = bool(event.modifiers() & Qt.ShiftModifier)
+        current = max(self._current, self.verticalScrollBar().value() - 1)
+        page = self.visible_rows()
+        moves = {
+            Qt.Key_Up: current - 1,
+            Qt.Key_Down: current + 1,
+            Qt.Key_PageUp: current - page,
+            Qt.Key_PageDown: current + page,
+            Qt.Key_Home: 0,
+            Qt.Key_End: self.log_model.rowCount() - 1,
+        }
+        if event.key() in moves:
+            self.set_current(moves[event.key()], extend)
+            return
+        super().keyPressEvent(event)
@@ -0,0 +1,120 @@
+"""后台流式日志写入线程：边接收边追加写文件，按大小或时间轮转"""
+import os
+import queue
+import time
+from datetime import datetime
+from PyQt5.QtCore import QThread, pyqtSignal
+from arrival_clock import TimestampFormatter
+from hex_format import row_to_text
+
+
+class RotatingLogWriter(QThread):
+    """自动保存写入线程
+
+    接收线程把每批行（到达时间戳、原始字节）直接放进队列，在显示队列之前，
+    界面跟不上而丢弃显示时日志仍然完整。格式化、编码、写盘、计数和轮转都在本线程完成。文件大小用累计写入的字节数判断，
+    达到max_bytes或跨过rotate_seconds对齐的时间边界时切换到新文件。
+    """
+    file_rotated = pyqtSignal(str)  # 新文件路径
+    write_failed = pyqtSignal(str)  # 错误信息
+
+    def __init__(self, logs_dir, name_prefix, max_bytes, rotate_seconds=0, parent=None):
+        super().__init__(parent)
+        self.logs_dir = logs_dir
+        self.name_prefix = name_prefix  # 文件名前缀，如"串口1_autosave"
+        self.max_bytes = max_bytes  # 单个文件最大字节数
+        self.rotate_seconds = rotate_seconds  # 按时间轮转的周期（秒），0表示不按时间轮转
+        self.queue = queue.SimpleQueue()
+        self.file = None
+        self.file_index = 1
+        self.bytes_written = 0  # 当前文件已写入的字节数
+        self.rotate_at = 0.0  # 下一个时间轮转边界
+        self.metrics = None  # PortMetrics，记录从入队到写入完成的延迟
+        self.show_timestamp = True  # 与显示区的时间戳/HEX开关保持一致，由界面设置
+        self.show_hex = False
+        self.line_filter = None  # 只保存通过过滤的行（line_filter.LineFilter），None表示全部保存
+        self.timestamp_formatter = TimestampFormatter()
+
+    def write_batch(self, lines, stamps, raws):
+        """提交一批行（接收线程调用，只入队）"""
+        if lines:
+            self.queue.put((lines, stamps, raws, time.perf_counter()))
+
+    def stop(self):
+        self.queue.put(None)
+        self.wait()
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            lines, stamps, raws, queued_at = item
+            line_filter = self.line_filter
+            if line_filter is not None:
+                match = line_filter.match
+                kept = [i for i, line in enumerate(lines) if match(line)]
+                if not kept:
+                    if self.file is not None and self.queue.empty():
+                        self.file.flush()
+                    continue
+                if len(kept) < len(lines):
+                    lines = [lines[i] for i in kept]
+                    stamps = [stamps[i] for i in kept]
+                    raws = [raws[i] for i in kept]
+            try:
+                size = self.write(self.format_lines(lines, stamps, raws))
+                # 队列暂时为空时才刷盘，突发数据时合并多次写入
+                if self.queue.empty():
+                    self.file.flush()
+                if self.metrics is not None:
+                    self.metrics.record_write(time.perf_counter() - queued_at, size)
+            except Exception as e:
+                self.close_file()
+                self.write_failed.emit(str(e))
+        self.close_file()
+
+    def format_lines(self, lines, stamps, raws):
+        """按与显示区相同的格式生成文本行"""
+        show_hex = self.show_hex
+        if self.show_timestamp:
+            format_timestamp = self.timestamp_formatter.format
+            return [row_to_text((f'[{format_timestamp(stamp)}]', line, raw), show_hex)
+                    for line, stamp, raw in zip(lines, stamps, raws)]
+        return [row_to_text(('', line, raw), show_hex) for line, raw in zip(lines, raws)]
+
+    def write(self, lines):
+        data = ('\n'.join(lines) + '\n').encode('utf-8')
+        if self.file is None or self.need_rotate(len(data)):
+            self.open_next_file()
+        self.file.write(data)
+        self.bytes_written += len(data)
+        return len(data)
+
+    def need_rotate(self, incoming):
+        if self.bytes_written and self.bytes_written + incoming > self.max_bytes:
+            return True
+        return bool(self.rotate_seconds) and time.time() >= self.rotate_at
+
+    def open_next_file(self):
+        self.close_file()
+        os.makedirs(self.logs_dir, exist_ok=True)
+        filename = f"{self.name_prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{self.file_index}.txt"
+        file_path = os.path.join(self.logs_dir, filename)
+        self.file = open(file_path, 'wb')
+        self.file_index += 1
+        self.bytes_written = 0
+        if self.rotate_seconds:
+            # 按本地时间对齐到整周期边界，例如每小时轮转就在整点切换
+            now = time.time()
+            local = now + datetime.now().astimezone().utcoffset().total_seconds()
+            self.rotate_at = now - local % self.rotate_seconds + self.rotate_seconds
+        self.file_rotated.emit(file_path)
+
+    def close_file(self):
+        if self.file is not None:
+            try:
+                self.file.close()
+            except Exception:
+                pass
+            self.file = None
@@ -1,7 +1,8 @@
-from PyQt5.QtWidgets import QApplication, QMainWindow, QToolBar, QPushButton
+from PyQt5.QtWidgets import QApplication, QMainWindow, QToolBar, QPushButton, QFileDialog
 from PyQt5.QtGui import QCloseEvent, QIcon
 from serial_tool import DualSerialMonitor
 from serial_send_mode import SerialSendMode
+from log_file_viewer import LogFileViewer
 import sys
 import json
 import os
@@ -37,8 +38,14 @@ class MainWindow(QMainWindow):
         self.switch_btn.clicked.connect(self.toggle_mode)
         self.tool_bar.addWidget(self.switch_btn)
 
+        # 打开保存的日志文件（大文件查看模式）
+        self.open_log_btn = QPushButton("打开日志")
+        self.open_log_btn.clicked.connect(self.open_log)
+        self.tool_bar.addWidget(self.open_log_btn)
+
         self.current_mode = None
         self.current_type = None
+        self.return_type = None  # 日志查看模式返回时切换到的模式
         if load_last_mode() == "send":
             self.load_send_mode()
         else:
@@ -76,9 +83,31 @@ class MainWindow(QMainWindow):
             }
         """)
 
+    def open_log(self):
+        """切换到日志查看模式，再次点击切换按钮返回原来的模式"""
+        file_path, _ = QFileDialog.getOpenFileName(self, "打开日志", "", "文本文件 (*.txt *.log);;所有文件 (*)")
+        if not file_path:
+            return
+        if self.current_type == "view":
+            self.current_mode.open_file(file_path)
+            return
+        viewer = LogFileViewer()
+        if not viewer.open_file(file_path):
+            viewer.deleteLater()
+            return
+        self.return_type = self.current_type
+        self.current_type = "view"
+        self.switch_mode(viewer)
+        self.switch_btn.setText("返回发送模式" if self.return_type == "send" else "返回接收模式")
+
     def toggle_mode(self):
         print("toggle_mode")
-        if self.current_type == "send":
+        if self.current_type == "view":
+            if self.return_type == "send":
+                self.load_send_mode()
+            else:
+                self.load_recv_mode()
+        elif self.current_type == "send":
             self.load_recv_mode()
         else:
             self.load_send_mode()
@@ -88,6 +117,8 @@ class MainWindow(QMainWindow):
             if hasattr(self.current_mode, 'save_config'):
                 print(f"[切换模式] 正在保存：{type(self.current_mode).__name__}")
                 self.current_mode.save_config()
+            if hasattr(self.current_mode, 'close_file'):
+                self.current_mode.close_file()
             self.current_mode.setParent(None)
             self.current_mode.deleteLater()
         self.current_mode = widget
@@ -0,0 +1,148 @@
+"""接收链路性能指标：各串口的计数器和速率，定时汇总显示并可导出为JSON"""
+import json
+import threading
+import time
+from datetime import datetime
+
+
+class PortMetrics:
+    """单个串口的指标
+
+    计数器由各自的线程累加（接收线程：字节/行/解码错误/入队；GUI线程：出队/渲染；
+    自动保存线程：写入延迟），每个计数器只有一个线程写，不需要加锁。
+    snapshot()由GUI定时调用，根据与上次调用的差值计算速率，并重置区间统计。
+    """
+
+    def __init__(self, port_index):
+        self.port_index = port_index
+        # 接收线程
+        self.bytes_in = 0  # 读取的原始字节数
+        self.lines_in = 0  # 切出的非空行数
+        self.decode_errors = 0  # 无法按所选编码解码的字节序列/行
+        self.lines_queued = 0  # 已通过信号送往GUI线程的行数
+        self.dropped_lines = 0  # 显示队列满时丢弃的行数（自动保存不受影响）
+        # GUI线程
+        self.lines_handled = 0  # GUI线程已处理的行数
+        self.batches = 0
+        self._render_total = 0.0  # 区间内handle_data累计耗时（秒）
+        self._render_max = 0.0
+        self._render_batches = 0
+        # 自动保存线程
+        self._write_lock = threading.Lock()
+        self._write_total = 0.0  # 区间内从入队到写入完成的累计延迟（秒）
+        self._write_max = 0.0
+        self._write_count = 0
+        self.autosave_bytes = 0
+        # 上次快照
+        self._last_time = time.perf_counter()
+        self._last_bytes = 0
+        self._last_lines = 0
+
+    @property
+    def queue_depth(self):
+        """已放入显示队列、GUI线程还没处理也没有被丢弃的行数"""
+        return max(0, self.lines_queued - self.lines_handled - self.dropped_lines)
+
+    def record_render(self, seconds, lines):
+        """GUI线程处理完一批数据"""
+        self.lines_handled += lines
+        self.batches += 1
+        self._render_total += seconds
+        self._render_batches += 1
+        if seconds > self._render_max:
+            self._render_max = seconds
+
+    def record_write(self, latency, size):
+        """自动保存线程写完一批数据，latency为从入队到写入完成的秒数"""
+        with self._write_lock:
+            self._write_total += latency
+            self._write_count += 1
+            if latency > self._write_max:
+                self._write_max = latency
+            self.autosave_bytes += size
+
+    def snapshot(self):
+        """返回当前指标（速率为距上次快照的平均值），并开始新的统计区间"""
+        now = time.perf_counter()
+        elapsed = max(now - self._last_time, 1e-6)
+        bytes_in, lines_in = self.bytes_in, self.lines_in
+        with self._write_lock:
+            write_count, write_total, write_max = self._write_count, self._write_total, self._write_max
+            self._write_count, self._write_total, self._write_max = 0, 0.0, 0.0
+        render_batches = self._render_batches
+        result = {
+            'port': self.port_index,
+            'time': datetime.now().isoformat(timespec='milliseconds'),
+            'bytes_total': bytes_in,
+            'lines_total': lines_in,
+            'bytes_per_second': round((bytes_in - self._last_bytes) / elapsed),
+            'lines_per_second': round((lines_in - self._last_lines) / elapsed),
+            'decode_errors': self.decode_errors,
+            'queue_depth': self.queue_depth,
+            'dropped_lines': self.dropped_lines,
+            'batches': self.batches,
+            'render_ms_avg': round(self._render_total / render_batches * 1000, 3) if render_batches else 0.0,
+            'render_ms_max': round(self._render_max * 1000, 3),
+            'autosave_latency_ms_avg': round(write_total / write_count * 1000, 3) if write_count else 0.0,
+            'autosave_latency_ms_max': round(write_max * 1000, 3),
+            'autosave_bytes': self.autosave_bytes,
+        }
+        self._render_total, self._render_max, self._render_batches = 0.0, 0.0, 0
+        self._last_time, self._last_bytes, self._last_lines = now, bytes_in, lines_in
+        return result
+
+
+def format_snapshot(snap):
+    """状态栏用的简短文本"""
+    rate = snap['bytes_per_second']
+    rate_text = f'{rate / 1024:.1f}KB/s' if rate >= 1024 else f'{rate}B/s'
+    text = (f"串口{snap['port']}: {rate_text} {snap['lines_per_second']}行/s "
+            f"队列{snap['queue_depth']} 渲染{snap['render_ms_avg']:.1f}/{snap['render_ms_max']:.1f}ms")
+    if snap['dropped_lines']:
+        text += f" 丢{snap['dropped_lines']}"
+    if snap['decode_errors']:
+        text += f" 解码错{snap['decode_errors']}"
+    if snap['autosave_latency_ms_max']:
+        text += f" 保存{snap['autosave_latency_ms_max']:.0f}ms"
+    return text
+
+
+class MetricsExporter:
+    """把每次的快照追加写入JSON Lines文件（每行一个JSON对象）"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'a', encoding='utf-8')
+
+    def write(self, snapshots):
+        self.file.write(json.dumps({'time': datetime.now().isoformat(timespec='milliseconds'),
+                                    'ports': snapshots}, ensure_ascii=False) + '\n')
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class DebugEcho:
+    """限速的调试输出：每秒最多输出limit行，超出部分只统计数量"""
+
+    def __init__(self, limit=20):
+        self.limit = limit
+        self.window_start = 0.0
+        self.printed = 0
+        self.suppressed = 0
+
+    def echo(self, prefix, lines):
+        now = time.monotonic()
+        if now - self.window_start >= 1.0:
+            if self.suppressed:
+                print(f"{prefix} ...上一秒省略{self.suppressed}行")
+            self.window_start = now
+            self.printed = 0
+            self.suppressed = 0
+        room = self.limit - self.printed
+        for line in lines[:max(room, 0)]:
+            print(f"{prefix} {line}")
+        shown = min(max(room, 0), len(lines))
+        self.printed += shown
+        self.suppressed += len(lines) - shown
@@ -0,0 +1,250 @@
+"""曲线面板：显示从接收行中提取的数值序列，按像素列做min/max抽取后绘制"""
+import re
+from datetime import datetime
+
+import numpy as np
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QCheckBox,
+                             QPushButton, QComboBox)
+from PyQt5.QtCore import Qt, QTimer, QRectF
+from PyQt5.QtGui import QPainter, QPen, QColor, QPolygonF
+
+from arrival_clock import now_ns, to_wall
+
+FRAME_MS = 33  # 刷新间隔，约30帧每秒
+SPANS = [('10秒', 10), ('1分钟', 60), ('10分钟', 600), ('全部', 0)]
+COLORS = ['#1f77b4', '#d62728', '#2ca02c', '#ff7f0e', '#9467bd', '#8c564b', '#e377c2', '#17becf']
+TICKS = 5  # 纵横轴的刻度数
+MARGIN_BOTTOM = 20  # 横轴时间
+MARGIN = 8
+
+
+def to_polygon(x, y):
+    """numpy坐标数组 -> QPolygonF，直接写入多边形的内存，不逐点构造QPointF"""
+    polygon = QPolygonF(len(x))
+    buffer = polygon.data()
+    buffer.setsize(len(x) * 2 * 8)
+    points = np.frombuffer(buffer, np.float64).reshape(-1, 2)
+    points[:, 0] = x
+    points[:, 1] = y
+    return polygon
+
+
+class PlotCanvas(QWidget):
+    """绘制各序列的曲线
+
+    定时从SeriesExtractor取出时间窗口内的点，抽取到每个像素列最多两个点再绘制，
+    绘制开销只与控件宽度有关，与缓冲区中的点数无关。
+    """
+
+    def __init__(self, extractor, parent=None):
+        super().__init__(parent)
+        self.extractor = extractor
+        self.span = 60  # 显示最近多少秒，0表示全部
+        self.paused = False
+        self.curves = []  # [(序列名, 颜色, x像素, y数值, 最新值, 点数), ...]
+        self.time_range = None  # 当前显示的(起, 止)到达时间戳
+        self.value_range = (0.0, 1.0)
+        self.margin_left = 40  # 随纵轴刻度文字的宽度调整
+        self.colors = {}  # 序列名 -> 颜色，序列删除后再出现时颜色不变
+        self._version = None
+        self.setMinimumHeight(120)
+        self.timer = QTimer(self)
+        self.timer.setInterval(FRAME_MS)
+        self.timer.timeout.connect(self.tick)
+        self.timer.start()
+
+    def plot_rect(self):
+        return QRectF(self.rect()).adjusted(self.margin_left, MARGIN, -MARGIN, -MARGIN_BOTTOM)
+
+    def set_span(self, seconds):
+        self.span = seconds
+        self.refresh()
+
+    def set_paused(self, paused):
+        self.paused = paused
+        self.refresh()
+
+    def tick(self):
+        if not self.isVisible():
+            return
+        version = self.extractor.version
+        # 暂停或显示全部时只在有新数据时重绘；显示最近一段时间时窗口随时间滚动
+        if version == self._version and (self.paused or not self.span):
+            return
+        self.refresh()
+
+    def refresh(self):
+        """重新取数据、抽取并重绘"""
+        self._version = self.extractor.version
+        width = max(int(self.plot_rect().width()), 1)
+        if self.paused and self.time_range is not None:
+            start, end = self.time_range
+        else:
+            end = now_ns()
+            start = end - self.span * 1000000000 if self.span else None
+        if start is None:
+            first = self.extractor.first_stamp()
+            start = first if first is not None and first < end else end - 1000000000
+        curves = []
+        lows = []
+        highs = []
+        for name, (x, y, last, count) in self.extractor.decimated(start, end + 1, width).items():
+            color = self.colors.get(name)
+            if color is None:
+                color = self.colors[name] = QColor(COLORS[len(self.colors) % len(COLORS)])
+            curves.append((name, color, x, y, last, count))
+            if len(y):
+                lows.append(y.min())
+                highs.append(y.max())
+        if lows:
+            low, high = min(lows), max(highs)
+            if high == low:
+                low, high = low - 1, high + 1
+            pad = (high - low) * 0.05
+            self.value_range = (low - pad, high + pad)
+            metrics = self.fontMetrics()
+            self.margin_left = max(40, max(metrics.horizontalAdvance(label)
+                                           for label in self.value_labels()) + 8)
+        self.curves = curves
+        self.time_range = (start, end)
+        self.update()
+
+    def value_labels(self):
+        low, high = self.value_range
+        return [f'{low + (high - low) * i / (TICKS - 1):.6g}' for i in range(TICKS)]
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.refresh()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), self.palette().base())
+        rect = self.plot_rect()
+        if rect.width() < 2 or rect.height() < 2:
+            return
+        text_color = self.palette().text().color()
+        grid_pen = QPen(QColor(128, 128, 128, 60))
+        metrics = self.fontMetrics()
+        low, high = self.value_range
+
+        # 纵轴刻度
+        for i, label in enumerate(self.value_labels()):
+            y = rect.bottom() - rect.height() * i / (TICKS - 1)
+            painter.setPen(grid_pen)
+            painter.drawLine(int(rect.left()), int(y), int(rect.right()), int(y))
+            painter.setPen(text_color)
+            painter.drawText(QRectF(0, y - metrics.height() / 2, self.margin_left - 4, metrics.height()),
+                             Qt.AlignRight | Qt.AlignVCenter, label)
+
+        # 横轴：起止及中间时刻
+        if self.time_range is not None:
+            start, end = self.time_range
+            for i in range(TICKS):
+                x = rect.left() + rect.width() * i / (TICKS - 1)
+                painter.setPen(grid_pen)
+                painter.drawLine(int(x), int(rect.top()), int(x), int(rect.bottom()))
+                stamp = start + (end - start) * i // (TICKS - 1)
+                label = datetime.fromtimestamp(to_wall(stamp)).strftime('%H:%M:%S')
+                align = Qt.AlignLeft if i == 0 else Qt.AlignRight if i == TICKS - 1 else Qt.AlignHCenter
+                label_rect = QRectF(x - 60, rect.bottom() + 2, 120, MARGIN_BOTTOM - 2)
+                if i == 0:
+                    label_rect.moveLeft(x)
+                elif i == TICKS - 1:
+                    label_rect.moveRight(x)
+                painter.setPen(text_color)
+                painter.drawText(label_rect, align | Qt.AlignTop, label)
+
+        if not self.curves:
+            painter.setPen(QColor(128, 128, 128))
+            painter.drawText(rect, Qt.AlignCenter, '在上方填写提取规则，接收到匹配的行后显示曲线')
+            return
+
+        # 曲线：数值换算为像素后整条绘制
+        painter.save()
+        painter.setClipRect(rect)
+        scale = rect.height() / (high - low)
+        for name, color, x, y, last, count in self.curves:
+            if not len(x):
+                continue
+            painter.setPen(QPen(color, 1))
+            painter.drawPolyline(to_polygon(x + rect.left(), rect.bottom() - (y - low) * scale))
+        painter.restore()
+
+        # 图例：序列名、最新值、缓冲区中的点数
+        y = rect.top() + 2
+        for name, color, x, values, last, count in self.curves:
+            painter.fillRect(QRectF(rect.left() + 6, y + metrics.height() / 2 - 4, 8, 8), color)
+            painter.setPen(text_color)
+            last_text = '-' if last is None else f'{last:.6g}'
+            painter.drawText(QRectF(rect.left() + 18, y, rect.width() - 20, metrics.height()),
+                             Qt.AlignLeft | Qt.AlignVCenter, f'{name}: {last_text}  ({count}点)')
+            y += metrics.height()
+
+
+class PlotPanel(QWidget):
+    """曲线面板：提取规则、时间范围、暂停/清空，以及下方的曲线"""
+
+    def __init__(self, extractor, parent=None):
+        super().__init__(parent)
+        self.extractor = extractor
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        control_layout = QHBoxLayout()
+        control_layout.addWidget(QLabel('提取:'))
+        self.rules_edit = QLineEdit()
+        self.rules_edit.setPlaceholderText('字段名或含(?P<名称>...)的正则,以";"隔开,如 temp;rpm')
+        self.rules_edit.editingFinished.connect(self.apply_rules)
+        control_layout.addWidget(self.rules_edit, 4)
+        self.span_combo = QComboBox()
+        for label, seconds in SPANS:
+            self.span_combo.addItem(label, seconds)
+        self.span_combo.setCurrentIndex(1)
+        self.span_combo.currentIndexChanged.connect(
+            lambda: self.canvas.set_span(self.span_combo.currentData()))
+        control_layout.addWidget(self.span_combo)
+        self.pause_checkbox = QCheckBox('暂停')
+        self.pause_checkbox.toggled.connect(lambda checked: self.canvas.set_paused(checked))
+        control_layout.addWidget(self.pause_checkbox)
+        self.clear_btn = QPushButton('清空曲线')
+        self.clear_btn.clicked.connect(self.clear)
+        control_layout.addWidget(self.clear_btn)
+        layout.addLayout(control_layout)
+
+        self.error_label = QLabel()
+        self.error_label.setStyleSheet('color: red;')
+        self.error_label.hide()
+        layout.addWidget(self.error_label)
+
+        self.canvas = PlotCanvas(extractor, self)
+        layout.addWidget(self.canvas, 1)
+
+    def apply_rules(self):
+        """应用输入的提取规则，正则有误时提示并保留原规则"""
+        try:
+            self.extractor.set_rules(self.rules_edit.text())
+        except re.error as e:
+            self.error_label.setText(f'提取规则有误: {str(e)}')
+            self.error_label.show()
+            return
+        self.error_label.hide()
+        self.canvas.refresh()
+
+    def rules(self):
+        return self.rules_edit.text()
+
+    def set_rules(self, text):
+        self.rules_edit.setText(text)
+        self.apply_rules()
+
+    def span_index(self):
+        return self.span_combo.currentIndex()
+
+    def set_span_index(self, index):
+        if 0 <= index < self.span_combo.count():
+            self.span_combo.setCurrentIndex(index)
+
+    def clear(self):
+        self.extractor.clear()
+        self.canvas.refresh()
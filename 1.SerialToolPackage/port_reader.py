@@ -0,0 +1,250 @@
+"""单个串口的接收处理：切行、批量、录制、自动保存，经有界队列送往界面
+
+读取由驱动负责：SerialIOLoop（io_loop.py）在一个线程里用selectors同时服务所有
+支持文件描述符的串口；不支持的端口（Windows串口、回放端口、loop://等）和队列策略为
+block的串口由各自的SerialThread阻塞读取。两种驱动读到数据后都调用PortReader.feed()。
+"""
+import time
+from PyQt5.QtCore import QObject, QThread, pyqtSignal
+from framers import make_framer
+from batch_queue import BatchQueue
+from pipeline_metrics import PortMetrics
+from arrival_clock import now_ns
+
+
+class PortReader(QObject):
+    """一个串口的接收状态
+
+    每批 (行, 到达时间戳, 原始字节) 先交给自动保存，再放入queue；
+    队列由空变为非空时发出data_ready，界面收到后从queue取数据。
+    界面跟不上时只有显示会丢行（见batch_queue.POLICIES），保存的日志是完整的。
+    feed/flush_due只在驱动线程中调用，capture/log_writer/series_extractor可由界面随时替换。
+    """
+    data_ready = pyqtSignal(int)  # 串口序号
+
+    def __init__(self, serial_port, port_index, read_size=4096, inter_byte_timeout=0.0,
+                 batch_lines=200, flush_interval=0.05, encoding='auto',
+                 queue_lines=100000, queue_policy='drop_oldest', framing='newline',
+                 terminator=b'\n', idle_flush=0.0):
+        super().__init__()
+        self.serial_port = serial_port
+        self.port_index = port_index
+        self.read_size = read_size  # 单次最多读取的字节数
+        self.inter_byte_timeout = inter_byte_timeout  # 字节间隔超时（秒），只用于SerialThread
+        self.batch_lines = batch_lines  # 攒满多少行发送一次
+        self.flush_interval = flush_interval  # 最长攒多久（秒）发送一次
+        self.running = False
+        # 原始字节缓冲区：按换行切行并按所选编码解码，或按帧格式切出二进制帧（见framers.py）
+        self.line_buffer = make_framer(framing, encoding, terminator)
+        # 空闲超时（秒）：串口静默这么久后，还没等到行结束符的残余数据也作为一行送出，
+        # 使"login:"之类的提示符和没有换行的崩溃输出立即显示；0表示一直等待行结束符
+        self.idle_flush = idle_flush
+        self.last_data = 0.0  # 最近一次收到数据的时间（time.monotonic）
+        self.last_arrived = 0  # 最近一次收到数据的到达时间戳（perf_counter_ns）
+        self.batch = []  # 待发送的行
+        self.batch_stamps = []  # 待发送行的到达时间戳（perf_counter_ns）
+        self.batch_raws = []  # 待发送行的原始字节（解码前，不含换行符），用于HEX显示
+        self.batch_started = 0.0  # 本批第一行的时间
+        self.capture = None  # 原始数据录制（CaptureWriter），None表示不录制
+        self.log_writer = None  # 自动保存（RotatingLogWriter），在进入有界队列之前写入
+        self.series_extractor = None  # 数值提取（SeriesExtractor），在接收线程中写入曲线缓冲区
+        self.queue = BatchQueue(queue_lines, queue_policy)  # 送往界面的有界队列
+        self.metrics = PortMetrics(port_index)  # 接收链路指标，由界面替换为自己的实例
+        self.io_loop = None  # 服务本串口的SerialIOLoop，None表示使用独立线程
+        self.thread = None
+
+    def start(self, io_loop=None):
+        """开始接收：io_loop支持该端口时加入共用的I/O线程，否则启动独立的读取线程
+
+        block策略在队列满时会阻塞读取线程，不能放进所有串口共用的I/O线程。
+        """
+        self.running = True
+        if (io_loop is not None and self.queue.policy != 'block'
+                and io_loop.supports(self.serial_port)):
+            self.io_loop = io_loop
+            io_loop.add(self)
+        else:
+            self.thread = SerialThread(self)
+            self.thread.start()
+
+    def stop(self):
+        """停止接收，返回后驱动不再访问串口，已切出的行都已放入队列
+
+        共用的I/O线程超时未响应时直接返回，剩余的行由I/O线程在移除本串口时发送。
+        """
+        self.running = False
+        # 唤醒等待队列空间的put，使驱动立即退出
+        self.queue.close()
+        if self.io_loop is not None:
+            # 批次由I/O线程在移除时发送，不在这里与它同时修改
+            self.io_loop.remove(self)
+        elif self.thread is not None:
+            self.thread.stop()
+
+    def isRunning(self):
+        if self.thread is not None:
+            return self.thread.isRunning()
+        return self.running
+
+    def feed(self, data):
+        """驱动读到一块数据"""
+        # 读到数据时立即打点，时间戳反映数据到达时刻而不是GUI处理时刻
+        arrived = now_ns()
+        self.last_arrived = arrived
+        if self.idle_flush:
+            self.last_data = time.monotonic()
+        self.metrics.bytes_in += len(data)
+        # 录制解码前的原始字节
+        capture = self.capture
+        if capture is not None:
+            capture.write_chunk(self.port_index, arrived, data)
+        # 将新数据添加到缓冲区
+        self.line_buffer.feed(data)
+
+        # 处理完整的行
+        self.process_buffer(arrived)
+
+    def process_buffer(self, arrived):
+        """处理缓冲区中的数据，只解码完整的行并放入待发送批次
+
+        arrived是本次数据的到达时间戳，在这块数据中结束的行都记为该时刻。
+        """
+        decode_errors = self.line_buffer.decode_errors
+        lines, raws = self.line_buffer.read_lines_with_raw()
+        metrics = self.metrics
+        metrics.decode_errors += self.line_buffer.decode_errors - decode_errors
+        for line, raw in zip(lines, raws):
+            line = line.strip()
+
+            # 只发送非空行
+            if line:
+                if not self.batch:
+                    self.batch_started = time.monotonic()
+                self.batch.append(line)
+                self.batch_stamps.append(arrived)
+                self.batch_raws.append(raw)
+                metrics.lines_in += 1
+                if len(self.batch) >= self.batch_lines:
+                    self.flush_batch()
+
+    def flush_deadline(self):
+        """本批最迟的发送时刻或残余数据的空闲超时时刻（time.monotonic），都没有时返回None"""
+        deadline = self.batch_started + self.flush_interval if self.batch else None
+        if self.idle_flush and len(self.line_buffer):
+            idle_at = self.last_data + self.idle_flush
+            deadline = idle_at if deadline is None else min(deadline, idle_at)
+        return deadline
+
+    def flush_due(self, idle=False):
+        """残余数据空闲超时时作为一行立即发送；串口空闲或本批已攒够时间时发送"""
+        now = time.monotonic()
+        if self.idle_flush and len(self.line_buffer) and now - self.last_data >= self.idle_flush:
+            self.flush_partial()
+        elif self.batch and (idle or now - self.batch_started >= self.flush_interval):
+            self.flush_batch()
+
+    def flush_partial(self):
+        """把缓冲区中没有行结束符的残余数据作为一行，连同已攒的行一起发送"""
+        decode_errors = self.line_buffer.decode_errors
+        item = self.line_buffer.read_partial_with_raw()
+        self.metrics.decode_errors += self.line_buffer.decode_errors - decode_errors
+        if item is not None:
+            line, raw = item
+            line = line.strip()
+            if line:
+                self.batch.append(line)
+                self.batch_stamps.append(self.last_arrived)
+                self.batch_raws.append(raw)
+                self.metrics.lines_in += 1
+        self.flush_batch()
+
+    def flush_batch(self):
+        """把已攒的行放入队列"""
+        if self.batch:
+            self.emit_lines(self.batch, self.batch_stamps, self.batch_raws)
+            self.batch = []
+            self.batch_stamps = []
+            self.batch_raws = []
+
+    def emit_lines(self, lines, stamps, raws):
+        """交给自动保存和数值提取，再放入送往界面的队列"""
+        log_writer = self.log_writer
+        if log_writer is not None:
+            log_writer.write_batch(lines, stamps, raws)
+        series_extractor = self.series_extractor
+        if series_extractor is not None:
+            series_extractor.add_lines(lines, stamps)
+        self.metrics.lines_queued += len(lines)
+        was_empty, dropped = self.queue.put(lines, stamps, raws)
+        self.metrics.dropped_lines += dropped
+        if was_empty:
+            self.data_ready.emit(self.port_index)
+
+    def report_error(self, error):
+        """驱动读取出错，送出已攒的行和错误信息后停止接收"""
+        self.flush_batch()
+        # stop()主动关闭时产生的异常不上报
+        if self.running:
+            self.emit_lines([f"串口错误: {str(error)}"], [now_ns()], [b''])
+        self.running = False
+
+
+class SerialThread(QThread):
+    """单个串口的读取线程（阻塞读取，有数据到达时才唤醒），用于不能加入SerialIOLoop的端口"""
+
+    def __init__(self, reader):
+        super().__init__()
+        self.reader = reader
+        self.serial_port = reader.serial_port
+
+    def read_chunk(self):
+        """阻塞等待数据到达，然后一次性读出已到达的数据"""
+        port = self.serial_port
+        read_size = self.reader.read_size
+        # read(1)内部阻塞在select/WaitForSingleObject上，空闲时不占用CPU；
+        # 串口的timeout只决定空闲时多久醒来检查一次running
+        data = port.read(1)
+        if not data:
+            return data
+        waiting = port.in_waiting
+        if waiting:
+            data += port.read(min(waiting, read_size - 1))
+        # 可选：在字节间隔超时内继续合并数据，减少突发数据时的分块次数
+        inter_byte_timeout = self.reader.inter_byte_timeout
+        if inter_byte_timeout > 0:
+            while len(data) < read_size:
+                time.sleep(inter_byte_timeout)
+                waiting = port.in_waiting
+                if not waiting:
+                    break
+                data += port.read(min(waiting, read_size - len(data)))
+        return data
+
+    def run(self):
+        reader = self.reader
+        # 空闲时read最多阻塞一个发送间隔（或空闲超时），保证攒了一半的批次和残余数据也能按时送出
+        if self.serial_port and self.serial_port.is_open:
+            timeout = reader.flush_interval
+            if reader.idle_flush:
+                timeout = min(timeout, reader.idle_flush)
+            self.serial_port.timeout = timeout
+        while reader.running:
+            try:
+                if not (self.serial_port and self.serial_port.is_open):
+                    break
+                data = self.read_chunk()
+                if data:
+                    reader.feed(data)
+                reader.flush_due(idle=not data)
+            except Exception as e:
+                reader.report_error(e)
+        reader.flush_batch()
+
+    def stop(self):
+        # 唤醒阻塞中的read，使线程立即退出
+        try:
+            if self.serial_port and self.serial_port.is_open:
+                self.serial_port.cancel_read()
+        except Exception:
+            pass
+        self.wait()
@@ -0,0 +1,104 @@
+"""serial_core与Qt界面之间的桥接：在后台线程运行asyncio事件循环，把异步流转换为Qt信号"""
+import asyncio
+import threading
+from PyQt5.QtCore import QObject, QThread, pyqtSignal
+from serial_core import AsyncSerial, open_serial_port
+
+
+class AsyncioThread(QThread):
+    """运行asyncio事件循环的线程，界面线程通过submit()提交协程"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.loop = None
+        self._ready = threading.Event()
+
+    def run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self._ready.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.close()
+
+    def ensure_started(self):
+        if not self.isRunning():
+            self._ready.clear()
+            self.start()
+        self._ready.wait()
+
+    def submit(self, coro):
+        """提交协程，返回concurrent.futures.Future"""
+        self.ensure_started()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def call(self, coro, timeout=None):
+        """提交协程并等待结果（阻塞调用者，只用于很快完成的操作）"""
+        return self.submit(coro).result(timeout)
+
+    def stop(self):
+        if self.isRunning():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.wait()
+
+
+class QtSerialPort(QObject):
+    """在AsyncioThread中运行的AsyncSerial，收到的行和错误以信号送到界面线程"""
+    line_received = pyqtSignal(str, object, bytes)  # 一行数据（含换行符）, 到达时间戳（perf_counter_ns）, 原始字节
+    read_failed = pyqtSignal(str)  # 接收出错，接收已停止
+    write_failed = pyqtSignal(str)  # 发送出错
+
+    def __init__(self, runner, parent=None):
+        super().__init__(parent)
+        self.runner = runner
+        self.stream = None
+        self._pump = None
+
+    @property
+    def is_open(self):
+        return self.stream is not None and self.stream.is_open
+
+    def open(self, port, baudrate, read_size=4096, encoding='auto', inter_byte_timeout=0.0, **settings):
+        """打开串口并开始接收（在界面线程同步打开，失败时直接抛出异常）"""
+        serial_port = open_serial_port(port, baudrate, **settings)
+        self.attach(serial_port, read_size=read_size, encoding=encoding, inter_byte_timeout=inter_byte_timeout)
+        return serial_port
+
+    def attach(self, serial_port, read_size=4096, encoding='auto', inter_byte_timeout=0.0):
+        """接收一个已打开的pyserial兼容端口（真实串口或回放端口）"""
+        self.close()
+
+        async def create():
+            return AsyncSerial(serial_port, read_size=read_size, encoding=encoding,
+                               inter_byte_timeout=inter_byte_timeout)
+        self.stream = self.runner.call(create())
+        self._pump = self.runner.submit(self._pump_lines(self.stream))
+
+    async def _pump_lines(self, stream):
+        try:
+            async for line, stamp, raw in stream.lines():
+                self.line_received.emit(line + '\n', stamp, raw)
+        except Exception as e:
+            self.read_failed.emit(str(e))
+
+    def write(self, data):
+        """放入写队列立即返回，写出失败时发出write_failed"""
+        stream = self.stream
+
+        async def write():
+            try:
+                stream.write(data)
+                await stream.drain()
+            except Exception as e:
+                self.write_failed.emit(str(e))
+        self.runner.submit(write())
+
+    def close(self):
+        """停止接收并关闭串口"""
+        if self.stream is not None:
+            self.runner.call(self.stream.close())
+            self.stream = None
+        if self._pump is not None:
+            self._pump.result()
+            self._pump = None
@@ -0,0 +1,166 @@
+"""录制文件回放：把录制文件伪装成串口，数据经过与实时接收完全相同的处理流程"""
+import threading
+import time
+from PyQt5.QtWidgets import QDialog, QFormLayout, QComboBox, QSpinBox, QDialogButtonBox
+
+# 回放速度：显示名称 -> 倍数，0表示不等待、按接收线程能处理的最大速度回放
+SPEEDS = {
+    '0.5x': 0.5,
+    '1x': 1.0,
+    '2x': 2.0,
+    '5x': 5.0,
+    '10x': 10.0,
+    '100x': 100.0,
+    '最大速度': 0,
+}
+
+
+class ReplayPort:
+    """回放端口，实现接收线程用到的pyserial接口（read/in_waiting/timeout/cancel_read/close）
+
+    按倍速回放时，每块数据在 (录制时间 - 第一块时间) / speed 时刻到达，
+    保持原始的块间间隔；到达时接收缓冲区（模拟串口驱动缓冲）放不下的块被丢弃
+    并计数，相当于真实串口接收溢出。speed为0时不等待，缓冲区有空间就继续
+    装入下一块，接收线程处理多快就回放多快，不会丢弃。
+    """
+
+    def __init__(self, reader, port_index=None, speed=1.0, buffer_size=1024 * 1024):
+        self.reader = reader
+        self.port_index = port_index  # 只回放该串口的数据，None表示全部
+        self.speed = speed
+        self.buffer_size = buffer_size
+        self.name = f'回放:{port_index if port_index is not None else "全部"}'
+        self.timeout = 0.1
+        self.rx = bytearray()  # 已到达、尚未被读走的数据
+        self._next = 0  # 下一条待处理的记录号
+        self._cancel = threading.Event()
+        self._open = True
+        self._origin = reader.stamps[0] if len(reader) else 0  # 回放时间零点对应的录制时间
+        self.started = time.perf_counter()
+        self.finished_at = None  # 全部数据被读走的时刻
+        self.lines = 0  # 上次统计时界面收到的行数
+        self.lines_at = self.started  # 界面收到的行数最后一次增加的时刻
+        self.settled = False  # 数据已读完且界面行数不再增加，回放结束
+        self.chunks = 0
+        self.bytes = 0
+        self.dropped_chunks = 0
+        self.dropped_bytes = 0
+
+    @property
+    def is_open(self):
+        return self._open
+
+    @property
+    def in_waiting(self):
+        self._pump()
+        return len(self.rx)
+
+    @property
+    def finished(self):
+        return self.finished_at is not None
+
+    def progress(self):
+        """已回放的比例（0~1）"""
+        total = len(self.reader)
+        return self._next / total if total else 1.0
+
+    def _pump(self):
+        """把到期的记录装入接收缓冲区"""
+        reader = self.reader
+        total = len(reader)
+        if self.speed:
+            due = self._origin + (time.perf_counter() - self.started) * self.speed * 1e9
+            stamps = reader.stamps
+            while self._next < total and stamps[self._next] <= due:
+                self._deliver(*reader.record(self._next))
+                self._next += 1
+        else:
+            while self._next < total and len(self.rx) < self.buffer_size:
+                self._deliver(*reader.record(self._next))
+                self._next += 1
+        if self._next >= total and not self.rx and self.finished_at is None:
+            self.finished_at = time.perf_counter()
+
+    def _deliver(self, stamp, port_index, data):
+        if self.port_index is not None and port_index != self.port_index:
+            return
+        if self.speed and len(self.rx) + len(data) > self.buffer_size:
+            self.dropped_chunks += 1
+            self.dropped_bytes += len(data)
+            return
+        self.rx += data
+        self.chunks += 1
+        self.bytes += len(data)
+
+    def _wait_time(self):
+        """距离下一块到期的秒数，没有更多数据时返回None"""
+        if not self.speed or self._next >= len(self.reader):
+            return None
+        due = (self.reader.stamps[self._next] - self._origin) / 1e9 / self.speed
+        return max(0.0, due - (time.perf_counter() - self.started))
+
+    def read(self, size=1):
+        """与pyserial一致：至少有1字节或超时后返回，最多返回size字节"""
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        while self._open:
+            self._pump()
+            if self.rx:
+                data = bytes(self.rx[:size])
+                del self.rx[:size]
+                return data
+            wait = None if deadline is None else deadline - time.monotonic()
+            next_due = self._wait_time()
+            if next_due is not None:
+                wait = next_due if wait is None else min(wait, next_due)
+            if (wait is not None and wait <= 0) or self._cancel.wait(wait):
+                break
+        return b''
+
+    def write(self, data):
+        """回放时发送的数据直接丢弃"""
+        return len(data)
+
+    def cancel_read(self):
+        self._cancel.set()
+
+    def close(self):
+        self._open = False
+        self._cancel.set()
+
+    def status_text(self, lines):
+        """回放进度和吞吐统计，lines为界面实际收到的行数，由界面定时调用
+
+        吞吐按界面收到最后一行的时刻计算，包含切行、批量和显示的全部耗时。
+        数据读完后界面行数在两次调用之间不再增加，才认为回放结束。
+        """
+        if lines != self.lines:
+            self.lines = lines
+            self.lines_at = time.perf_counter()
+        elif self.finished:
+            self.settled = True
+        elapsed = max(self.lines_at - self.started, 1e-6)
+        state = '回放完成' if self.settled else f'回放中 {self.progress():.0%}'
+        return (f'{state}: {lines}行, {lines / elapsed:,.0f}行/s, '
+                f'{self.bytes / elapsed / 1024:,.0f}KB/s, 丢弃{self.dropped_chunks}块')
+
+
+def ask_replay_speed(parent):
+    """选择回放速度和模拟接收缓冲区大小，取消时返回None"""
+    dialog = QDialog(parent)
+    dialog.setWindowTitle('回放录制文件')
+    layout = QFormLayout(dialog)
+    speed_combo = QComboBox()
+    speed_combo.addItems(list(SPEEDS))
+    speed_combo.setCurrentText('1x')
+    layout.addRow('回放速度:', speed_combo)
+    buffer_spin = QSpinBox()
+    buffer_spin.setRange(4, 1024 * 1024)
+    buffer_spin.setValue(1024)
+    layout.addRow('接收缓冲区(KB):', buffer_spin)
+    buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+    layout.addRow(buttons)
+    buttons.accepted.connect(dialog.accept)
+    buttons.rejected.connect(dialog.reject)
+    if dialog.exec_() != QDialog.Accepted:
+        return None
+    return SPEEDS[speed_combo.currentText()], buffer_spin.value() * 1024
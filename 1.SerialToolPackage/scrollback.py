@@ -0,0 +1,243 @@
+"""磁盘回滚：行存储超出内存预算的旧行写入临时分段文件，翻看时经mmap按需读入"""
+import mmap
+import re
+import tempfile
+from array import array
+from bisect import bisect_right
+
+from arrival_clock import to_wall_ns
+
+SEGMENT_BYTES = 64 * 1024 * 1024  # 单个分段文件的正文和原始字节上限
+RECORD_FIELDS = 4  # 行索引每行4个int64：正文结束位置, 原始字节结束位置, 到达时间戳, 标志
+
+
+class SegmentView:
+    """分段文件在某一时刻的只读视图（mmap），可交给后台线程使用
+
+    分段文件只追加不修改，视图建立后看到的前count行不会再变化。
+    分段被丢弃后，仍被引用的视图继续有效，直到视图被回收。
+    """
+
+    def __init__(self, first_seq, count, text_map, raw_map, index_map):
+        self.first_seq = first_seq
+        self.count = count
+        self._text = text_map
+        self._raw = raw_map
+        index = memoryview(index_map).cast('q') if count else memoryview(array('q'))
+        self._index = index
+        self._text_ends = index[0::RECORD_FIELDS]
+        self._raw_ends = index[1::RECORD_FIELDS]
+
+    def __len__(self):
+        return self.count
+
+    def text(self, i):
+        start = self._text_ends[i - 1] if i else 0
+        return self._text[start:self._text_ends[i]].decode('utf-8', 'surrogatepass')
+
+    def raw(self, i):
+        start = self._raw_ends[i - 1] if i else 0
+        return bytes(self._raw[start:self._raw_ends[i]])
+
+    def stamp(self, i):
+        return self._index[i * RECORD_FIELDS + 2]
+
+    def flags(self, i):
+        return self._index[i * RECORD_FIELDS + 3]
+
+    def texts(self, start, stop):
+        """第start到stop行（相对first_seq）的正文"""
+        ends = self._text_ends
+        stop = min(stop, self.count)
+        if start >= stop:
+            return []
+        # 整块读出后再按行切分，只访问一次mmap
+        base = ends[start - 1] if start else 0
+        data = self._text[base:ends[stop - 1]]
+        result = []
+        prev = 0
+        for i in range(start, stop):
+            end = ends[i] - base
+            result.append(data[prev:end].decode('utf-8', 'surrogatepass'))
+            prev = end
+        return result
+
+    def find(self, pattern, lo_ns=None, hi_ns=None):
+        """在正文中查找pattern（bytes正则），返回命中行的全局行号
+
+        直接在mmap上做正则匹配，命中位置用行索引二分换算为行号，
+        同一行只记一次；lo_ns/hi_ns是墙上时间范围（纳秒）。
+        """
+        hits = []
+        if not self.count:
+            return hits
+        ends = self._text_ends
+        text = self._text
+        end_pos = ends[self.count - 1]
+        pos = 0
+        search = pattern.search
+        while pos < end_pos:
+            match = search(text, pos, end_pos)
+            if match is None:
+                break
+            i = bisect_right(ends, match.start())
+            if match.end() > ends[i]:
+                # 匹配跨越了行尾，从下一个字节继续
+                pos = match.start() + 1
+                continue
+            pos = ends[i]
+            if lo_ns is not None:
+                wall = to_wall_ns(self.stamp(i))
+                if not lo_ns <= wall <= hi_ns:
+                    continue
+            hits.append(self.first_seq + i)
+        return hits
+
+
+def _map(file, size):
+    """只读映射文件的前size字节，空文件返回空bytes（mmap不能映射0字节）"""
+    if not size:
+        return b''
+    return mmap.mmap(file.fileno(), size, access=mmap.ACCESS_READ)
+
+
+class SpillSegment:
+    """一个分段：正文、原始字节、行索引三个临时文件，只追加
+
+    临时文件在关闭（或程序退出）后由系统删除，不会遗留在磁盘上。
+    """
+
+    def __init__(self, first_seq, directory=None):
+        self.first_seq = first_seq
+        self.count = 0
+        self.text_size = 0
+        self.raw_size = 0
+        self._files = [tempfile.TemporaryFile(prefix='serial_scrollback_', dir=directory)
+                       for _ in range(3)]
+        self._view = None
+
+    @property
+    def nbytes(self):
+        return self.text_size + self.raw_size + self.count * RECORD_FIELDS * 8
+
+    def write(self, text, raw, text_ends, raw_ends, stamps, flags):
+        """追加一批行，text_ends/raw_ends是各行在text/raw中的结束位置"""
+        count = len(stamps)
+        records = array('q', bytes(count * RECORD_FIELDS * 8))
+        records[0::RECORD_FIELDS] = array('q', (self.text_size + end for end in text_ends))
+        records[1::RECORD_FIELDS] = array('q', (self.raw_size + end for end in raw_ends))
+        records[2::RECORD_FIELDS] = array('q', stamps)
+        records[3::RECORD_FIELDS] = array('q', flags)
+        text_file, raw_file, index_file = self._files
+        text_file.write(text)
+        raw_file.write(raw)
+        index_file.write(records)
+        self.text_size += len(text)
+        self.raw_size += len(raw)
+        self.count += count
+
+    def view(self):
+        """当前内容的只读视图，行数变化后重新映射"""
+        view = self._view
+        if view is None or view.count != self.count:
+            for file in self._files:
+                file.flush()
+            text_file, raw_file, index_file = self._files
+            view = self._view = SegmentView(
+                self.first_seq, self.count, _map(text_file, self.text_size),
+                _map(raw_file, self.raw_size), _map(index_file, self.count * RECORD_FIELDS * 8))
+        return view
+
+    def close(self):
+        self._view = None
+        for file in self._files:
+            file.close()
+
+
+class Scrollback:
+    """一个串口溢出到磁盘的历史行，由若干分段文件组成
+
+    行号连续，最新的分段继续追加，写满SEGMENT_BYTES后开始新分段；
+    磁盘占用超过max_bytes时整段丢弃最旧的分段。
+    内存中只保留每个分段的几个计数，行索引本身也在磁盘上。
+    """
+
+    def __init__(self, max_bytes, directory=None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.segments = []
+        self._starts = []  # 各分段的第一条行号，用于二分定位
+
+    def __len__(self):
+        return sum(segment.count for segment in self.segments)
+
+    @property
+    def first_seq(self):
+        return self.segments[0].first_seq if self.segments else None
+
+    @property
+    def nbytes(self):
+        """磁盘占用"""
+        return sum(segment.nbytes for segment in self.segments)
+
+    def segment_bytes(self):
+        # 分段不超过磁盘上限的1/4，丢弃时不会一次失去太多历史
+        return max(1024 * 1024, min(SEGMENT_BYTES, self.max_bytes // 4))
+
+    def write(self, first_seq, text, raw, text_ends, raw_ends, stamps, flags):
+        """追加一批连续的行，first_seq必须紧接已有的最后一行"""
+        segment = self.segments[-1] if self.segments else None
+        if segment is None or segment.nbytes >= self.segment_bytes():
+            segment = SpillSegment(first_seq, self.directory)
+            self.segments.append(segment)
+            self._starts.append(first_seq)
+        segment.write(text, raw, text_ends, raw_ends, stamps, flags)
+
+    def drop_count(self):
+        """为满足磁盘上限需要丢弃的最旧分段数（最新的分段总是保留）"""
+        total = self.nbytes
+        drop = 0
+        while total > self.max_bytes and drop < len(self.segments) - 1:
+            total -= self.segments[drop].nbytes
+            drop += 1
+        return drop
+
+    def drop(self, count):
+        """丢弃最旧的count个分段"""
+        for segment in self.segments[:count]:
+            segment.close()
+        del self.segments[:count]
+        del self._starts[:count]
+
+    def view_of(self, seq):
+        """(分段视图, 分段内序号)，seq不在磁盘上时返回(None, 0)"""
+        i = bisect_right(self._starts, seq) - 1
+        if i < 0:
+            return None, 0
+        segment = self.segments[i]
+        offset = seq - segment.first_seq
+        if offset >= segment.count:
+            return None, 0
+        return segment.view(), offset
+
+    def views(self):
+        return [segment.view() for segment in self.segments]
+
+    def search(self, needle, start_time=None, end_time=None):
+        """不区分大小写查找正文包含needle的行，返回升序行号
+
+        在各分段的mmap上直接做字节正则匹配（大小写折叠只对ASCII字母生效）。
+        """
+        pattern = re.compile(re.escape(needle.encode('utf-8', 'surrogatepass')), re.IGNORECASE)
+        lo_ns = hi_ns = None
+        if start_time is not None or end_time is not None:
+            lo_ns = int(start_time * 1e9) if start_time is not None else -(1 << 63)
+            hi_ns = int(end_time * 1e9) if end_time is not None else (1 << 63) - 1
+        hits = []
+        for view in self.views():
+            hits.extend(view.find(pattern, lo_ns, hi_ns))
+        return hits
+
+    def close(self):
+        self.drop(len(self.segments))
+
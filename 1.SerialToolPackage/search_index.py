@@ -0,0 +1,203 @@
+"""接收数据的增量倒排索引：边接收边建索引，查找不再线性扫描显示区"""
+import queue
+import re
+import threading
+from array import array
+from bisect import bisect_left
+from PyQt5.QtCore import QThread
+
+TOKEN_RE = re.compile(r'\w+')
+GRAM = 3  # 词表n-gram索引的子串长度
+
+
+def word_grams(word):
+    """单词的所有GRAM字子串，不足GRAM个字符的单词以自身为键"""
+    if len(word) < GRAM:
+        return {word}
+    return {word[i:i + GRAM] for i in range(len(word) - GRAM + 1)}
+
+
+class QueryMatcher:
+    """不区分大小写的子串匹配，接口与LineFilter相同，交给HistoryFilterThread逐行扫描"""
+
+    def __init__(self, query):
+        needle = query.lower()
+        if needle == needle.upper():
+            # 纯数字、符号等不区分大小写的查询，不必逐行转小写
+            self.match = lambda text: needle in text
+        else:
+            self.match = lambda text: needle in text.lower()
+
+
+class SearchIndex:
+    """按单词建立的倒排索引
+
+    每行按\\w+切成小写单词，单词 -> 行号数组（全局递增行号，升序）。
+    纯数字单词（计数器、数值）种类极多，不进索引。
+    查询词不是完整单词时，在词表中找包含它的单词并合并倒排表，
+    因此支持单词内的子串查找：词表另有一份n-gram索引（GRAM字子串 -> 单词列表），
+    查询词取其最少见的GRAM字子串，只确认该子串下的单词；不足GRAM字的查询词
+    在n-gram的键（数量有上限，与词表大小无关）中查找，不遍历整个词表。多个查询词取交集，
+    最后逐行确认整个查询串确实出现在行内。每行同时记录接收时间，用于按时间范围筛选。
+    查询里没有可索引的单词（纯数字或符号）时search返回None，由调用者在后台线程逐行扫描。
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.postings = {}  # 单词 -> array('Q') 行号
+        self.grams = {}  # GRAM字子串 -> 包含它的单词列表，已淘汰的单词在查找时跳过
+        self.dead_words = 0  # n-gram索引中已淘汰的单词数，超过词表大小时重建
+        self.times = array('d')  # 每行的接收时间（time.time()），times[i]对应行号base+i
+        self.base = 0  # times[0]对应的行号
+
+    def add_lines(self, first_seq, lines, timestamps):
+        """索引一批连续的行，first_seq为第一行的全局行号"""
+        tokens_per_line = [set(TOKEN_RE.findall(line.lower())) for line in lines]
+        with self.lock:
+            # 行号不连续（显示区清空后残留的旧批次）时重建索引，保证times与行号对齐
+            if self.times and first_seq != self.base + len(self.times):
+                self.clear_locked()
+            if not self.times:
+                self.base = first_seq
+            postings = self.postings
+            self.times.extend(timestamps)
+            for seq, tokens in enumerate(tokens_per_line, first_seq):
+                for token in tokens:
+                    if token.isdigit():
+                        continue
+                    posting = postings.get(token)
+                    if posting is None:
+                        posting = postings[token] = array('Q')
+                        self._add_word(token)
+                    posting.append(seq)
+
+    def prune(self, first_seq):
+        """丢弃已被显示区淘汰的行（first_seq之前），累计到一定量后才整理，均摊O(1)"""
+        with self.lock:
+            drop = first_seq - self.base
+            if drop <= 0 or drop < len(self.times) // 2:
+                return
+            del self.times[:drop]
+            self.base = first_seq
+            for token in list(self.postings):
+                posting = self.postings[token]
+                cut = bisect_left(posting, first_seq)
+                if cut == len(posting):
+                    del self.postings[token]
+                    self.dead_words += 1
+                elif cut:
+                    del posting[:cut]
+            if self.dead_words > len(self.postings):
+                self.grams = {}
+                self.dead_words = 0
+                for word in self.postings:
+                    self._add_word(word)
+
+    def clear(self):
+        with self.lock:
+            self.clear_locked()
+
+    def clear_locked(self):
+        self.postings = {}
+        self.grams = {}
+        self.dead_words = 0
+        self.times = array('d')
+        self.base = 0
+
+    def time_of(self, seq):
+        with self.lock:
+            i = seq - self.base
+            return self.times[i] if 0 <= i < len(self.times) else None
+
+    def search(self, query, get_text, first_seq, start_time=None, end_time=None):
+        """查找包含query（不区分大小写）的行，返回升序行号列表
+
+        get_text(seq)返回该行文本（已淘汰的行返回None），first_seq是仍保留的第一行。
+        查询里没有可索引的单词（纯数字或符号）时返回None，需要逐行扫描。
+        """
+        needle = query.lower()
+        if not needle:
+            return []
+        tokens = [t for t in set(TOKEN_RE.findall(needle)) if not t.isdigit()]
+        if not tokens:
+            return None
+        with self.lock:
+            candidates = None
+            for token in sorted(tokens, key=len, reverse=True):
+                seqs = self._lookup(token)
+                candidates = seqs if candidates is None else candidates & seqs
+                if not candidates:
+                    return []
+            candidates = sorted(s for s in candidates if s >= first_seq)
+            times = self.times
+            base = self.base
+            if start_time is not None or end_time is not None:
+                lo = start_time if start_time is not None else float('-inf')
+                hi = end_time if end_time is not None else float('inf')
+                candidates = [s for s in candidates if lo <= times[s - base] <= hi]
+        hits = []
+        for seq in candidates:
+            text = get_text(seq)
+            if text is not None and needle in text.lower():
+                hits.append(seq)
+        return hits
+
+    def _add_word(self, word):
+        grams = self.grams
+        for gram in word_grams(word):
+            words = grams.get(gram)
+            if words is None:
+                grams[gram] = [word]
+            else:
+                words.append(word)
+
+    def _words_containing(self, token):
+        """词表中包含token的单词"""
+        postings = self.postings
+        grams = self.grams
+        if len(token) >= GRAM:
+            # 只需确认最少见的那个子串下的单词
+            shortest = None
+            for i in range(len(token) - GRAM + 1):
+                words = grams.get(token[i:i + GRAM])
+                if not words:
+                    return set()
+                if shortest is None or len(words) < len(shortest):
+                    shortest = words
+            return {word for word in shortest if token in word and word in postings}
+        result = set()
+        for gram, words in grams.items():
+            if token in gram:
+                result.update(word for word in words if word in postings)
+        return result
+
+    def _lookup(self, token):
+        """包含token的所有单词（例如"rror"命中"error"）的行号集合"""
+        result = set()
+        postings = self.postings
+        for word in self._words_containing(token):
+            result.update(postings[word])
+        return result
+
+
+class SearchIndexThread(QThread):
+    """后台建索引线程：GUI线程只把每批行放进队列"""
+
+    def __init__(self, index, parent=None):
+        super().__init__(parent)
+        self.index = index
+        self.queue = queue.SimpleQueue()
+
+    def add_lines(self, first_seq, lines, timestamps):
+        self.queue.put((first_seq, lines, timestamps))
+
+    def stop(self):
+        self.queue.put(None)
+        self.wait()
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            self.index.add_lines(*item)
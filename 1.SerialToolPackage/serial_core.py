@@ -0,0 +1,308 @@
+"""与界面无关的串口核心：打开/配置串口，以asyncio异步流的方式读取原始数据块和行，带写队列
+
+界面通过qt_bridge在后台线程运行事件循环，脚本可以直接使用：
+
+    async def main():
+        port = await AsyncSerial.open('loop://', 115200)
+        port.write(b'hello\\r\\n')
+        async for line, stamp, raw in port.lines():
+            print(line)
+            break
+        await port.close()
+
+    asyncio.run(main())
+
+使用范围：发送模式（serial_send_mode.py）经qt_bridge使用AsyncSerial收发；
+接收窗口和capture_cli.py的多串口接收仍由PortReader/SerialIOLoop完成
+（共用的selectors线程、有界队列和链路指标），只共用这里的open_serial_port/selectable。
+不接硬件的自检：python serial_core.py [URL]，默认经pyserial的loop://回环。
+"""
+import asyncio
+import os
+import sys
+import time
+import serial
+from line_buffer import LineBuffer
+from arrival_clock import now_ns
+
+BYTESIZES = {5: serial.FIVEBITS, 6: serial.SIXBITS, 7: serial.SEVENBITS, 8: serial.EIGHTBITS}
+STOPBITS = {1: serial.STOPBITS_ONE, 1.5: serial.STOPBITS_ONE_POINT_FIVE, 2: serial.STOPBITS_TWO}
+PARITIES = {'None': serial.PARITY_NONE, 'Even': serial.PARITY_EVEN, 'Odd': serial.PARITY_ODD,
+            'Mark': serial.PARITY_MARK, 'Space': serial.PARITY_SPACE}
+
+
+def open_serial_port(port, baudrate, data_bits=8, stop_bits=1, parity='None', flow_control='None', timeout=0.1):
+    """按界面上的设置打开串口，port也可以是pyserial的URL（如loop://）"""
+    kwargs = dict(
+        baudrate=baudrate,
+        bytesize=BYTESIZES[data_bits],
+        stopbits=STOPBITS[stop_bits],
+        parity=PARITIES.get(parity, serial.PARITY_NONE),
+        timeout=timeout,
+        rtscts=(flow_control == 'RTS/CTS'),
+        xonxoff=(flow_control == 'XON/XOFF'),
+    )
+    if '://' in port:
+        return serial.serial_for_url(port, **kwargs)
+    return serial.Serial(port=port, **kwargs)
+
+
+def selectable(port):
+    """端口能否用select/selectors等待（有可用的文件描述符）
+
+    Windows的串口句柄不能用于select，回放端口、loop://等没有文件描述符。
+    """
+    if os.name == 'nt':
+        return False
+    fileno = getattr(port, 'fileno', None)
+    if fileno is None:
+        return False
+    try:
+        return fileno() >= 0
+    except Exception:
+        return False
+
+
+class AsyncSerial:
+    """异步串口
+
+    读取：可用selectors的端口直接注册到事件循环（add_reader + 非阻塞os.read），
+    其他端口在线程池中阻塞读取。读到的块带到达时间戳放入内部队列，
+    积压超过max_chunks块时暂停读取，由串口驱动缓冲承受积压。
+    写入：write()只放入写队列，后台任务在线程池中依次写出，drain()等待写完，
+    期间写出失败时drain()抛出该错误，读取不受影响。
+    出错或关闭后，read_chunk()抛出错误或返回None，chunks()/lines()随之结束。
+    必须在事件循环中创建和使用。
+    """
+
+    def __init__(self, serial_port, read_size=4096, encoding='auto', inter_byte_timeout=0.0, max_chunks=256):
+        self.serial_port = serial_port
+        self.read_size = read_size  # 单次最多读取的字节数
+        self.encoding = encoding  # lines()使用的编码，取值见line_buffer.ENCODINGS
+        self.inter_byte_timeout = inter_byte_timeout  # 字节间隔超时（秒），只用于线程池读取
+        self.max_chunks = max_chunks
+        self.error = None  # 导致读取结束的异常
+        self._write_error = None  # 尚未由drain()报告的写出错误
+        self._loop = asyncio.get_running_loop()
+        self._chunks = asyncio.Queue()  # (到达时间戳, 数据)，结束时放入None
+        self._writes = asyncio.Queue()
+        self._resume = asyncio.Event()  # 队列有空间时置位
+        self._resume.set()
+        self._closed = False
+        self._fd = None
+        self._paused = False
+        self._reader_task = None
+        if selectable(serial_port):
+            self._fd = serial_port.fileno()
+            self._loop.add_reader(self._fd, self._on_readable)
+        else:
+            self._reader_task = self._loop.create_task(self._read_blocking())
+        self._writer_task = self._loop.create_task(self._write_loop())
+
+    @classmethod
+    async def open(cls, port, baudrate=115200, read_size=4096, encoding='auto', inter_byte_timeout=0.0, **settings):
+        """打开并配置串口（在线程池中执行，不阻塞事件循环），settings见open_serial_port"""
+        loop = asyncio.get_running_loop()
+        serial_port = await loop.run_in_executor(None, lambda: open_serial_port(port, baudrate, **settings))
+        return cls(serial_port, read_size=read_size, encoding=encoding, inter_byte_timeout=inter_byte_timeout)
+
+    @property
+    def is_open(self):
+        return not self._closed and self.serial_port.is_open
+
+    # ---- 读取 ----
+
+    def _on_readable(self):
+        try:
+            data = os.read(self._fd, self.read_size)
+            if not data:
+                # 可读却读不到数据：设备已断开（如USB串口被拔出）
+                raise OSError('设备已断开')
+        except BlockingIOError:
+            return
+        except Exception as e:
+            self._finish(e)
+            return
+        self._chunks.put_nowait((now_ns(), data))
+        if self._chunks.qsize() >= self.max_chunks:
+            self._loop.remove_reader(self._fd)
+            self._paused = True
+
+    def _blocking_read(self):
+        """在线程池中执行：阻塞等待数据到达，然后一次性读出已到达的数据"""
+        port = self.serial_port
+        data = port.read(1)
+        if not data:
+            return data
+        waiting = port.in_waiting
+        if waiting:
+            data += port.read(min(waiting, self.read_size - 1))
+        if self.inter_byte_timeout > 0:
+            while len(data) < self.read_size:
+                time.sleep(self.inter_byte_timeout)
+                waiting = port.in_waiting
+                if not waiting:
+                    break
+                data += port.read(min(waiting, self.read_size - len(data)))
+        return data
+
+    async def _read_blocking(self):
+        try:
+            while not self._closed and self.serial_port.is_open:
+                await self._resume.wait()
+                data = await self._loop.run_in_executor(None, self._blocking_read)
+                if data:
+                    self._chunks.put_nowait((now_ns(), data))
+                    if self._chunks.qsize() >= self.max_chunks:
+                        self._resume.clear()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._finish(e)
+            return
+        self._finish(None)
+
+    def _finish(self, error):
+        """读取结束：记录错误并让读取方退出"""
+        if self._fd is not None and not self._paused:
+            self._loop.remove_reader(self._fd)
+        self._paused = True
+        if self.error is None and not self._closed:
+            self.error = error
+        self._chunks.put_nowait(None)
+
+    async def read_chunk(self):
+        """下一块 (到达时间戳ns, 原始字节)，关闭后返回None，读取出错时抛出该错误"""
+        item = await self._chunks.get()
+        if item is None:
+            self._chunks.put_nowait(None)  # 之后的调用同样立即返回
+            if self.error is not None:
+                raise self.error
+            return None
+        if self._chunks.qsize() < self.max_chunks // 2:
+            if self._fd is not None and self._paused and not self._closed and self.error is None:
+                self._loop.add_reader(self._fd, self._on_readable)
+                self._paused = False
+            self._resume.set()
+        return item
+
+    async def chunks(self):
+        """异步迭代原始数据块 (到达时间戳ns, 原始字节)"""
+        while True:
+            item = await self.read_chunk()
+            if item is None:
+                return
+            yield item
+
+    async def lines(self, line_filter=None):
+        """异步迭代完整的行 (去掉首尾空白的文本, 到达时间戳ns, 原始字节)，跳过空行
+
+        line_filter为line_filter.compile_filter()的结果时只返回匹配的行。
+        """
+        line_buffer = LineBuffer(encoding=self.encoding)
+        async for stamp, data in self.chunks():
+            line_buffer.feed(data)
+            lines, raws = line_buffer.read_lines_with_raw()
+            for line, raw in zip(lines, raws):
+                line = line.strip()
+                if line and (line_filter is None or line_filter.match(line)):
+                    yield line, stamp, raw
+
+    # ---- 写入 ----
+
+    def write(self, data):
+        """放入写队列，立即返回"""
+        if self._closed:
+            raise serial.SerialException('串口已关闭')
+        self._writes.put_nowait(bytes(data))
+
+    async def drain(self):
+        """等待写队列中的数据全部写出"""
+        await self._writes.join()
+        error, self._write_error = self._write_error, None
+        if error is not None:
+            raise error
+
+    async def _write_loop(self):
+        while True:
+            data = await self._writes.get()
+            try:
+                await self._loop.run_in_executor(None, self.serial_port.write, data)
+            except Exception as e:
+                self._write_error = e
+            finally:
+                self._writes.task_done()
+
+    # ---- 生命周期 ----
+
+    async def close(self):
+        """停止读写并关闭串口，写队列中尚未写出的数据被丢弃"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._fd is not None and not self._paused:
+            self._loop.remove_reader(self._fd)
+            self._paused = True
+        self._writer_task.cancel()
+        if self._reader_task is not None:
+            # 唤醒线程池中阻塞的read
+            try:
+                self.serial_port.cancel_read()
+            except Exception:
+                pass
+            self._resume.set()
+            try:
+                await self._reader_task
+            except asyncio.CancelledError:
+                pass
+        await self._loop.run_in_executor(None, self.serial_port.close)
+        self._chunks.put_nowait(None)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+async def check_loopback(url='loop://', count=1000, timeout=10.0):
+    """自检：经回环端口（默认loop://）写入count行再读回，核对内容、顺序、写队列和关闭流程
+
+    不需要硬件，返回读回的行数，结果不一致时抛出AssertionError。
+    """
+    port = await AsyncSerial.open(url, 115200, timeout=0.05)
+    expected = [f'line {i}:' + 'x' * (i % 50) for i in range(count)]
+
+    async def read_back():
+        received = []
+        async for line, stamp, raw in port.lines():
+            assert raw.decode().strip() == line, f'原始字节与行不一致: {raw!r} {line!r}'
+            assert stamp > 0
+            received.append(line)
+            if len(received) == count:
+                break
+        return received
+
+    # 边写边读：loop://的缓冲区有限，先全部写完再读会卡在写入上
+    reading = asyncio.ensure_future(read_back())
+    for line in expected:
+        port.write(line.encode() + b'\r\n')
+    await asyncio.wait_for(port.drain(), timeout)
+    received = await asyncio.wait_for(reading, timeout)
+    assert received == expected, f'读回{len(received)}行，与写入的内容不一致'
+    await port.close()
+    assert not port.is_open
+    assert await port.read_chunk() is None, '关闭后仍读到数据'
+    try:
+        port.write(b'x')
+    except serial.SerialException:
+        pass
+    else:
+        raise AssertionError('关闭后仍可写入')
+    return len(received)
+
+
+if __name__ == '__main__':
+    url = sys.argv[1] if len(sys.argv) > 1 else 'loop://'
+    count = asyncio.run(check_loopback(url))
+    print(f'{url}: 回环{count}行，内容和顺序一致，关闭正常')
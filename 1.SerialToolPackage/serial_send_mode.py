@@ -2,15 +2,19 @@ import os
 import serial
 import serial.tools.list_ports
 import json
-import time
-from datetime import datetime
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QTextEdit, 
                              QCheckBox, QLabel, QLineEdit, QComboBox, QListWidget, QListWidgetItem, 
                              QMessageBox, QFileDialog, QSplitter, QDialog, QFormLayout, QDialogButtonBox, QSpinBox,
                              QInputDialog, QMenu, QAction, QSizePolicy)
-from PyQt5.QtCore import Qt, QThread, pyqtSignal
+from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtGui import QFont, QCloseEvent
 from PyQt5.QtWidgets import QApplication, QAction, QMenuBar
+from line_buffer import ENCODINGS
+from arrival_clock import now_ns, TimestampFormatter
+from hex_format import format_hex
+from capture_file import CaptureReader, FILE_SUFFIX
+from replay import ReplayPort, ask_replay_speed
+from qt_bridge import AsyncioThread, QtSerialPort
 
 
 class ConfigManager:
@@ -65,51 +69,6 @@ class ConfigManager:
         self.save_config()
 
 
-class SerialReaderThread(QThread):
-    data_received = pyqtSignal(str)
-
-    def __init__(self, serial_port):
-        super().__init__()
-        self.serial_port = serial_port
-        self.running = True
-        self.buffer = ""  # 数据缓冲区
-
-    def run(self):
-        self.running = True
-        while self.running:
-            try:
-                if self.serial_port and self.serial_port.is_open:
-                    if self.serial_port.in_waiting:
-                        data = self.serial_port.read(self.serial_port.in_waiting)
-                        try:
-                            data_str = data.decode('utf-8')
-                        except UnicodeDecodeError:
-                            data_str = data.decode('gbk', errors='replace')
-
-                        # 将新数据添加到缓冲区
-                        self.buffer += data_str
-
-                        # 处理完整的行
-                        self.process_buffer()
-                time.sleep(0.002)  # 避免CPU占用过高
-            except Exception as e:
-                self.data_received.emit(f"串口错误{e}\n")
-                self.running = False
-
-    def process_buffer(self):
-        """处理缓冲区中的数据，只发送完整的行"""
-        while '\n' in self.buffer:
-            line, self.buffer = self.buffer.split('\n', 1)
-
-            # 只发送非空行
-            if line.strip():
-                self.data_received.emit(line.strip() + '\n')
-
-    def stop(self):
-        self.running = False
-        self.wait()
-
-
 class RefreshComboBox(QComboBox):
     def showPopup(self):
         if hasattr(self, 'refresh_func'):
@@ -239,12 +198,24 @@ class SerialSendMode(QMainWindow):
         super().__init__()
         self.setWindowTitle("发送模式 - 串口工具")
         self.serial_port = None
-        self.reader_thread = None
+        # 串口读写由serial_core在后台asyncio线程中完成，收到的行以信号送回界面
+        self.runner = AsyncioThread(self)
+        self.port = QtSerialPort(self.runner, self)
+        self.port.line_received.connect(self.display_received)
+        self.port.read_failed.connect(lambda err: self.display_received(f"串口错误{err}\n", now_ns(), b''))
+        self.port.write_failed.connect(lambda err: QMessageBox.critical(self, "发送失败", err))
         self.custom_baudrate = 1500000
         self.data_bits = 8
         self.stop_bits = 1
         self.parity = 'None'
         self.flow_control = 'None'
+        self.read_size = 4096
+        self.inter_byte_timeout_ms = 0
+        self.encoding = 'auto'
+        self.timestamp_formatter = TimestampFormatter('%H:%M:%S')  # 收发记录时间戳，与接收线程共用同一时钟
+        self.rx_lines = 0  # 累计接收行数，用于统计回放吞吐
+        self.replay_reader = None
+        self.replay_first_line = 0
         self.config_manager = ConfigManager()
         self.init_ui()
         self.load_config()
@@ -314,6 +285,17 @@ class SerialSendMode(QMainWindow):
         self.more_button.setStyleSheet(button_style)
         first_column.addWidget(self.more_button)
 
+        self.replay_button = QPushButton("回放录制")
+        self.replay_button.clicked.connect(self.replay_capture)
+        self.replay_button.setMinimumWidth(120)
+        self.replay_button.setMinimumHeight(40)
+        self.replay_button.setStyleSheet(button_style)
+        first_column.addWidget(self.replay_button)
+
+        self.replay_timer = QTimer(self)
+        self.replay_timer.setInterval(250)
+        self.replay_timer.timeout.connect(self.update_replay_status)
+
         # 第二列：勾选选择框
         second_column = QVBoxLayout()
         self.hex_checkbox = QCheckBox("HEX发送")
@@ -464,6 +446,22 @@ class SerialSendMode(QMainWindow):
         flow.setCurrentText(self.flow_control)
         layout.addRow("流控:", flow)
 
+        read_size_spin = QSpinBox()
+        read_size_spin.setRange(64, 1024 * 1024)
+        read_size_spin.setValue(self.read_size)
+        layout.addRow("读取块大小(字节):", read_size_spin)
+
+        inter_byte_spin = QSpinBox()
+        inter_byte_spin.setRange(0, 1000)
+        inter_byte_spin.setValue(self.inter_byte_timeout_ms)
+        layout.addRow("字节间隔超时(ms):", inter_byte_spin)
+
+        encoding_combo = QComboBox()
+        for key, name in ENCODINGS.items():
+            encoding_combo.addItem(name, key)
+        encoding_combo.setCurrentIndex(max(0, encoding_combo.findData(self.encoding)))
+        layout.addRow("接收编码:", encoding_combo)
+
         btns = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
         layout.addRow(btns)
         btns.accepted.connect(dialog.accept)
@@ -475,6 +473,9 @@ class SerialSendMode(QMainWindow):
             self.stop_bits = float(stopbits.currentText())
             self.parity = parity.currentText()
             self.flow_control = flow.currentText()
+            self.read_size = read_size_spin.value()
+            self.inter_byte_timeout_ms = inter_byte_spin.value()
+            self.encoding = encoding_combo.currentData()
             self.baudrate_combo.setCurrentText(str(self.custom_baudrate))
             
             if self.serial_port and self.serial_port.is_open:
@@ -490,11 +491,41 @@ class SerialSendMode(QMainWindow):
 
     def toggle_port(self):
         if self.serial_port and self.serial_port.is_open:
-            if self.reader_thread:
-                self.reader_thread.stop()
-                self.reader_thread = None
-            self.serial_port.close()
+            self.port.close()
             self.serial_port = None
+            self.set_open_button(False)
+        else:
+            try:
+                port = self.port_combo.currentText().split('-')[0].strip()
+                self.serial_port = self.port.open(port, self.custom_baudrate,
+                                                  read_size=self.read_size,
+                                                  encoding=self.encoding,
+                                                  inter_byte_timeout=self.inter_byte_timeout_ms / 1000.0,
+                                                  data_bits=self.data_bits,
+                                                  stop_bits=self.stop_bits,
+                                                  parity=self.parity,
+                                                  flow_control=self.flow_control)
+                
+                self.set_open_button(True)
+            except Exception as e:
+                QMessageBox.critical(self, "串口错误", str(e))
+
+    def set_open_button(self, opened):
+        """按串口是否打开切换按钮的文字和颜色（打开后为红色的"关闭串口"）"""
+        if opened:
+            self.open_button.setText("关闭串口")
+            self.open_button.setStyleSheet("""
+                QPushButton {
+                    font-weight: bold;
+                    background-color: #ff0000;
+                    color: white;
+                    border-radius: 4px;
+                }
+                QPushButton:hover {
+                    background-color: #cc0000;
+                }
+            """)
+        else:
             self.open_button.setText("打开串口")
             self.open_button.setStyleSheet("""
                 QPushButton {
@@ -507,73 +538,76 @@ class SerialSendMode(QMainWindow):
                     background-color: #199bf5;
                 }
             """)
-        else:
-            try:
-                port = self.port_combo.currentText().split('-')[0].strip()
-                baud = self.custom_baudrate
-                bytesize = {5: serial.FIVEBITS, 6: serial.SIXBITS, 7: serial.SEVENBITS, 8: serial.EIGHTBITS}[self.data_bits]
-                stopbits = {1: serial.STOPBITS_ONE, 1.5: serial.STOPBITS_ONE_POINT_FIVE, 2: serial.STOPBITS_TWO}[self.stop_bits]
-                parity_map = {'None': serial.PARITY_NONE, 'Even': serial.PARITY_EVEN, 'Odd': serial.PARITY_ODD, 'Mark': serial.PARITY_MARK, 'Space': serial.PARITY_SPACE}
-                parity_val = parity_map.get(self.parity, serial.PARITY_NONE)
-                
-                self.serial_port = serial.Serial(
-                    port=port,
-                    baudrate=baud,
-                    bytesize=bytesize,
-                    stopbits=stopbits,
-                    parity=parity_val,
-                    timeout=0.1,
-                    rtscts=(self.flow_control == 'RTS/CTS'),
-                    xonxoff=(self.flow_control == 'XON/XOFF')
-                )
-                
-                self.reader_thread = SerialReaderThread(self.serial_port)
-                self.reader_thread.data_received.connect(self.display_received)
-                self.reader_thread.start()
-                
-                self.open_button.setText("关闭串口")
-                self.open_button.setStyleSheet("""
-                    QPushButton {
-                        font-weight: bold;
-                        background-color: #ff0000;
-                        color: white;
-                        border-radius: 4px;
-                    }
-                    QPushButton:hover {
-                        background-color: #cc0000;
-                    }
-                """)
-            except Exception as e:
-                QMessageBox.critical(self, "串口错误", str(e))
-
-    def display_received(self, data):
-        """显示接收到的数据，支持HEX格式"""
-        try:
-            text_data = data.encode().decode('utf-8')
-        except UnicodeDecodeError:
-            text_data = data
 
-        if self.hex_display_checkbox.isChecked():
-            try:
-                hex_data = ' '.join([f'{b:02X}' for b in data.encode('utf-8')])
-                display_data = hex_data
-            except:
-                display_data = data
+    def display_received(self, data, arrived, raw):
+        """显示接收到的数据，支持HEX格式（HEX由接收线程保留的原始字节直接转换）"""
+        self.rx_lines += 1
+        if self.hex_display_checkbox.isChecked() and raw:
+            display_data = format_hex(raw)
         else:
-            display_data = text_data
-
-        # 关键修复：移除对>的转义，仅保留必要的转义（如<）
-        display_data = data.rstrip('\n')
-        # 仅转义<（如果需要），删除对>的转义
-        display_data = display_data.replace('<', '&lt;')  # 保留<的转义（可选）
+            # 关键修复：移除对>的转义，仅保留必要的转义（如<）
+            display_data = data.rstrip('\n')
+            # 仅转义<（如果需要），删除对>的转义
+            display_data = display_data.replace('<', '&lt;')  # 保留<的转义（可选）
 
         if self.timestamp_checkbox.isChecked():
-            ts = datetime.now().strftime('%H:%M:%S.%f')[:-3]
+            ts = self.timestamp_formatter.format(arrived)
             self.receive_text.append(f"<span style='color:#888888;'>[RX {ts}]</span> {display_data.strip()}")
         else:
             self.receive_text.append(f"[RX] {display_data.strip()}")
 
 
+    def replay_capture(self):
+        """把录制文件中某个串口的数据回放到接收区"""
+        path, _ = QFileDialog.getOpenFileName(self, "选择录制文件", "", f"录制文件 (*{FILE_SUFFIX});;所有文件 (*)")
+        if not path:
+            return
+        options = ask_replay_speed(self)
+        if options is None:
+            return
+        speed, buffer_size = options
+        try:
+            reader = CaptureReader(path)
+        except Exception as e:
+            QMessageBox.critical(self, "打开录制文件失败", str(e))
+            return
+        ports = reader.ports()
+        if not ports:
+            reader.close()
+            QMessageBox.warning(self, "回放", "录制文件中没有数据")
+            return
+        port_index = ports[0]
+        if len(ports) > 1:
+            names = [f"串口{p}" for p in ports]
+            name, ok = QInputDialog.getItem(self, "回放", "选择要回放的串口:", names, 0, False)
+            if not ok:
+                reader.close()
+                return
+            port_index = ports[names.index(name)]
+
+        self.close_serial()
+        if self.replay_reader is not None:
+            self.replay_reader.close()
+        self.replay_reader = reader
+        self.serial_port = ReplayPort(reader, port_index, speed, buffer_size)
+        self.replay_first_line = self.rx_lines
+        self.port.attach(self.serial_port,
+                         read_size=self.read_size,
+                         encoding=self.encoding,
+                         inter_byte_timeout=self.inter_byte_timeout_ms / 1000.0)
+        self.set_open_button(True)
+        self.replay_timer.start()
+
+    def update_replay_status(self):
+        """定时在状态栏显示回放进度、实际达到的行/s和丢弃的块数"""
+        port = self.serial_port
+        if not isinstance(port, ReplayPort):
+            self.replay_timer.stop()
+            return
+        self.statusBar().showMessage(port.status_text(self.rx_lines - self.replay_first_line))
+        if port.settled:
+            self.replay_timer.stop()
+
     def send_text_data(self):
         if not self.serial_port or not self.serial_port.is_open:
             QMessageBox.warning(self, "未打开串口", "请先打开串口")
@@ -592,10 +626,10 @@ class SerialSendMode(QMainWindow):
         else:
             data = text.encode('utf-8')
             
-        self.serial_port.write(data)
+        self.port.write(data)
         
         if self.timestamp_checkbox.isChecked():
-            ts = datetime.now().strftime('%H:%M:%S.%f')[:-3]
+            ts = self.timestamp_formatter.format(now_ns())
             self.receive_text.append(f"<span style='color:#888888;'>[TX {ts}]</span> {text.strip()}")
         else:
             self.receive_text.append(f"[TX] {text.strip()}")
@@ -707,10 +741,10 @@ class SerialSendMode(QMainWindow):
             
         try:
             data = bytes.fromhex(text) if is_hex else text.encode('utf-8')
-            self.serial_port.write(data)
+            self.port.write(data)
             
             if self.timestamp_checkbox.isChecked():
-                ts = datetime.now().strftime('%H:%M:%S.%f')[:-3]
+                ts = self.timestamp_formatter.format(now_ns())
                 self.receive_text.append(f"<span style='color:#888888;'>[TX {ts}]</span> {text.strip()}")
             else:
                 self.receive_text.append(f"[TX] {text.strip()}")
@@ -727,7 +761,10 @@ class SerialSendMode(QMainWindow):
                 "data_bits": self.data_bits,
                 "stop_bits": self.stop_bits,
                 "parity": self.parity,
-                "flow_control": self.flow_control
+                "flow_control": self.flow_control,
+                "read_size": self.read_size,
+                "inter_byte_timeout_ms": self.inter_byte_timeout_ms,
+                "encoding": self.encoding
             }
             self.config_manager.set_serial_config(serial_config)
             
@@ -781,6 +818,9 @@ class SerialSendMode(QMainWindow):
                 self.stop_bits = serial_config.get("stop_bits", 1)
                 self.parity = serial_config.get("parity", "None")
                 self.flow_control = serial_config.get("flow_control", "None")
+                self.read_size = serial_config.get("read_size", 4096)
+                self.inter_byte_timeout_ms = serial_config.get("inter_byte_timeout_ms", 0)
+                self.encoding = serial_config.get("encoding", "auto")
             
             # 加载UI配置
             ui_config = self.config_manager.get_ui_config()
@@ -825,16 +865,16 @@ class SerialSendMode(QMainWindow):
     def closeEvent(self, event: QCloseEvent):
         """窗口关闭事件"""
         self.save_config()
-        if self.reader_thread:
-            self.reader_thread.stop()
-        if self.serial_port and self.serial_port.is_open:
-            self.serial_port.close()
+        self.close_serial()
+        self.runner.stop()
+        if self.replay_reader is not None:
+            self.replay_reader.close()
         event.accept()
 
     def close_serial(self):
         """关闭串口"""
-        if self.serial_port and self.serial_port.is_open:
-            self.serial_port.close()
+        self.port.close()
+        self.serial_port = None
 
 
 class SerialTool(QMainWindow):
@@ -1,98 +1,49 @@
 import sys
+import re
+import math
 import time
 import json
 import os
 import serial #pip install pyserial
 import serial.tools.list_ports
+from bisect import bisect_left, bisect_right
 from datetime import datetime
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                             QHBoxLayout, QLabel, QComboBox, QPushButton, 
-                            QTextEdit, QLineEdit, QCheckBox, QMessageBox,
-                            QInputDialog, QSplitter, QFileDialog, QAction, QDialog, QFormLayout, QDialogButtonBox, QSpinBox)
-from PyQt5.QtCore import QThread, pyqtSignal, Qt
-from PyQt5.QtGui import QTextCursor, QFont, QIcon
-
-class SerialThread(QThread):
-    """串口数据接收线程"""
-    data_received = pyqtSignal(str, int)
-    
-    def __init__(self, serial_port, port_index):
-        super().__init__()
-        self.serial_port = serial_port
-        self.port_index = port_index
-        self.running = False
-        self.buffer = ""  # 数据缓冲区
-        
-    def run(self):
-        self.running = True
-        while self.running:
-            try:
-                if self.serial_port and self.serial_port.is_open:
-                    if self.serial_port.in_waiting:
-                        data = self.serial_port.read(self.serial_port.in_waiting)
-                        try:
-                            data_str = data.decode('utf-8')
-                        except UnicodeDecodeError:
-                            data_str = data.decode('gbk', errors='replace')
-                        
-                        # 将新数据添加到缓冲区
-                        self.buffer += data_str
-                        
-                        # 处理完整的行
-                        self.process_buffer()
-                time.sleep(0.002)  # 避免CPU占用过高
-            except Exception as e:
-                self.data_received.emit(f"串口错误: {str(e)}\n", self.port_index)
-                self.running = False
-    
-    def process_buffer(self):
-        """处理缓冲区中的数据，只发送完整的行"""
-        while '\n' in self.buffer:
-            line, self.buffer = self.buffer.split('\n', 1)
-            
-            # 只发送非空行
-            if line.strip():
-                self.data_received.emit(line.strip() + '\n', self.port_index)
-    
-    def stop(self):
-        self.running = False
-        self.wait()
-
-class SmartTextEdit(QTextEdit):
-    """智能文本编辑框，优化滚动行为"""
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.auto_scroll = True
-        self._force_next_scroll = False  # 新增
-        self.setReadOnly(True)
-        self.setUndoRedoEnabled(False)
-        self.verticalScrollBar().valueChanged.connect(self.on_scroll_changed)
-        
-    def on_scroll_changed(self, value):
-        if self._force_next_scroll:
-            self._force_next_scroll = False
-            self.auto_scroll = True
-            return
-        scrollbar = self.verticalScrollBar()
-        self.auto_scroll = (value == scrollbar.maximum())
-    
-    def append_smart(self, text):
-        """智能添加文本，控制滚动行为"""
-        scrollbar = self.verticalScrollBar()
-        was_at_bottom = (scrollbar.value() == scrollbar.maximum())
-        
-        self.append(text)
-        
-        if was_at_bottom or scrollbar.maximum() == 0:
-            self.moveCursor(QTextCursor.End)
-            self.auto_scroll = True
+                            QLineEdit, QCheckBox, QMessageBox,
+                            QInputDialog, QSplitter, QFileDialog, QAction, QDialog, QFormLayout, QDialogButtonBox, QSpinBox,
+                            QDateTimeEdit, QListWidget, QListWidgetItem, QTabWidget, QGridLayout, QActionGroup)
+from PyQt5.QtCore import QTimer, QDateTime, Qt
+from PyQt5.QtGui import QFont, QIcon
+from line_buffer import ENCODINGS, TERMINATORS
+from framers import FRAMERS, parse_framing, make_framer
+from log_view import LogView
+from log_writer import RotatingLogWriter
+from line_filter import compile_filter
+from history_filter import HistoryFilterThread
+from search_index import SearchIndex, SearchIndexThread, QueryMatcher
+from arrival_clock import to_wall, TimestampFormatter
+from line_store import LineStore
+from capture_file import CaptureWriter, CaptureReader, new_capture_path, FILE_SUFFIX
+from replay import ReplayPort, ask_replay_speed
+from batch_queue import POLICIES
+from port_reader import PortReader
+from io_loop import SerialIOLoop
+from serial_core import open_serial_port
+from pipeline_metrics import PortMetrics, MetricsExporter, DebugEcho, format_snapshot
+try:
+    # 曲线面板需要numpy，没有安装时只禁用曲线功能
+    from series_extract import SeriesExtractor
+    from plot_panel import PlotPanel
+except ImportError:
+    SeriesExtractor = PlotPanel = None
 
-    def force_auto_scroll(self):
-        """强制恢复自动滚动并滚动到底部"""
-        self._force_next_scroll = True
-        self.moveCursor(QTextCursor.End)
-        self.verticalScrollBar().setValue(self.verticalScrollBar().maximum())
-        self.auto_scroll = True
+# 多个串口窗口的排列方式：键 -> 菜单显示名称
+PORT_LAYOUTS = {
+    'splitter': '并排',
+    'grid': '网格',
+    'tabs': '标签页',
+}
 
 # 在SerialWidget类定义之前添加以下代码
 class RefreshComboBox(QComboBox):
@@ -130,16 +81,45 @@ class SerialWidget(QWidget):
         self.port_index = port_index
         self.config_manager = config_manager
         self.serial_port = None
-        self.serial_thread = None
+        self.port_reader = None  # 当前串口的接收处理（PortReader）
+        self.io_loop = None  # 主窗口共用的SerialIOLoop，None时每个串口使用独立的读取线程
         self.custom_baudrate = 1500000  # 默认1.5M波特率
         self.auto_save_enabled = False
-        self.auto_save_file_index = 1
+        self.log_writer = None  # 自动保存写入线程，首次收到数据时启动
+        self.line_filter = None  # 编译后的过滤器，None表示不过滤
+        self.history_filter = None  # 正在运行的历史数据重新过滤线程
+        self.pending_filtered = []  # 重新过滤期间新到达的命中行号，完成后再追加
+        self.search_index = SearchIndex()  # 原始数据的增量倒排索引
+        self.search_indexer = None  # 后台建索引线程，首次收到数据时启动
+        self.search_scan = None  # 索引无法回答的查询（纯数字或符号）的后台逐行扫描线程
+        self.search_scan_hits = []  # 后台扫描已得到的命中行号
+        self.search_scan_started = 0.0
+        self.capture_writer = None  # 原始数据录制，由主窗口统一开启/关闭
+        self.replay_first_seq = 0  # 回放开始时显示区的下一个行号，用于统计回放行数
+        self.metrics = PortMetrics(port_index)  # 接收链路指标，主窗口定时汇总显示
+        self.debug_echo = None  # 限速的控制台调试输出（DebugEcho），None表示不输出
+        # 从接收行中提取数值画曲线，在接收线程中写入环形缓冲区，None表示未安装numpy
+        self.series_extractor = SeriesExtractor() if SeriesExtractor is not None else None
         self.data_bits = 8
         self.stop_bits = 1
         self.parity = 'None'
         self.flow_control = 'None'
+        self.read_size = 4096  # 接收线程单次最多读取的字节数
+        self.inter_byte_timeout_ms = 0  # 字节间隔超时（毫秒），0表示数据到达即处理
+        self.encoding = 'auto'  # 接收编码，取值见line_buffer.ENCODINGS
+        self.batch_lines = 200  # 接收线程每批最多发送的行数
+        self.flush_interval_ms = 50  # 接收线程每批最长等待时间（毫秒）
+        self.queue_lines = 100000  # 接收线程到界面的队列最多积压的行数
+        self.queue_policy = 'drop_oldest'  # 队列满时的策略，取值见batch_queue.POLICIES
+        self.framing = 'newline'  # 帧格式，"类型;参数=值;..."，见framers.py
+        self.line_terminator = '0A'  # 换行文本的行结束符（HEX），常用值见line_buffer.TERMINATORS
+        self.idle_flush_ms = 0  # 串口静默多久后把没有行结束符的残余数据作为一行显示（毫秒），0表示不超时
+        self.drain_lines = 5000  # 界面每轮事件循环最多处理的行数，剩余的留到下一轮
+        self.plot_rules = ''  # 曲线提取规则，未安装numpy时原样保留在配置中
+        self.plot_span = 1  # 曲线显示的时间范围（plot_panel.SPANS的序号）
         self.init_ui()
         self.load_config()
+        self.update_filter()
         
     def init_ui(self):
         layout = QVBoxLayout(self)
@@ -214,23 +194,48 @@ class SerialWidget(QWidget):
         filter_layout.addWidget(QLabel('过滤关键字:'), 1)
         
         self.filter_edit = QLineEdit()
-        self.filter_edit.setPlaceholderText('关键字,以"|"隔开')
+        self.filter_edit.setPlaceholderText('关键字,以"|"隔开,"!"开头表示排除')
         filter_layout.addWidget(self.filter_edit, 4)
         
         self.filter_case_checkbox = QCheckBox('区分大小写')
         self.filter_case_checkbox.setChecked(True)
         filter_layout.addWidget(self.filter_case_checkbox, 1)
+
+        # 过滤模式：正则表达式 / 全词匹配
+        self.filter_regex_checkbox = QCheckBox('正则')
+        self.filter_regex_checkbox.setChecked(False)
+        filter_layout.addWidget(self.filter_regex_checkbox, 1)
+
+        self.filter_whole_word_checkbox = QCheckBox('全词')
+        self.filter_whole_word_checkbox.setChecked(False)
+        filter_layout.addWidget(self.filter_whole_word_checkbox, 1)
+
+        # 过滤设置变化时重新编译过滤器
+        self.filter_edit.textChanged.connect(self.update_filter)
+        self.filter_case_checkbox.toggled.connect(self.update_filter)
+        self.filter_regex_checkbox.toggled.connect(self.update_filter)
+        self.filter_whole_word_checkbox.toggled.connect(self.update_filter)
         
         # 是否显示HEX
         self.show_hex_checkbox = QCheckBox('HEX显示')
         self.show_hex_checkbox.setChecked(False)  # 默认不显示HEX
+        self.show_hex_checkbox.toggled.connect(self.set_show_hex)
         filter_layout.addWidget(self.show_hex_checkbox, 1)
         
         # 新增：是否显示时间戳
         self.show_timestamp_checkbox = QCheckBox('时间戳显示')
         self.show_timestamp_checkbox.setChecked(True)  # 默认显示时间戳
+        self.show_timestamp_checkbox.toggled.connect(self.set_show_timestamp)
         filter_layout.addWidget(self.show_timestamp_checkbox, 1)
         
+        # 是否显示曲线面板
+        self.show_plot_checkbox = QCheckBox('曲线')
+        self.show_plot_checkbox.toggled.connect(self.set_show_plot)
+        if PlotPanel is None:
+            self.show_plot_checkbox.setEnabled(False)
+            self.show_plot_checkbox.setToolTip('曲线功能需要安装numpy')
+        filter_layout.addWidget(self.show_plot_checkbox, 1)
+        
         layout.addLayout(filter_layout)
         
         # 操作控制区域 - 按要求分组按钮
@@ -323,59 +328,157 @@ class SerialWidget(QWidget):
         control_layout.addLayout(right_buttons_layout, 1) # 右侧布局占1份
         
         layout.addLayout(control_layout)
+
+        # 搜索区域：基于增量索引查找原始数据
+        search_layout = QHBoxLayout()
+        search_layout.setContentsMargins(0, 0, 0, 0)
+        search_layout.setSpacing(2)
+
+        search_layout.addWidget(QLabel('搜索:'), 0)
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText('查找原始数据，回车查找下一个')
+        self.search_edit.returnPressed.connect(self.find_next)
+        search_layout.addWidget(self.search_edit, 3)
+
+        # 按接收时间限定查找范围
+        self.search_time_checkbox = QCheckBox('时间范围')
+        search_layout.addWidget(self.search_time_checkbox, 0)
+        self.search_start_edit = QDateTimeEdit(QDateTime.currentDateTime())
+        self.search_start_edit.setDisplayFormat('MM-dd HH:mm:ss')
+        search_layout.addWidget(self.search_start_edit, 1)
+        self.search_end_edit = QDateTimeEdit(QDateTime.currentDateTime().addSecs(24 * 3600))
+        self.search_end_edit.setDisplayFormat('MM-dd HH:mm:ss')
+        search_layout.addWidget(self.search_end_edit, 1)
+
+        for text, slot in (('上一个', self.find_prev), ('下一个', self.find_next),
+                           ('全部', self.find_all), ('跳转行', self.jump_to_line)):
+            btn = QPushButton(text)
+            btn.clicked.connect(slot)
+            search_layout.addWidget(btn, 0)
+
+        self.search_hits_label = QLabel('')
+        search_layout.addWidget(self.search_hits_label, 1)
+
+        layout.addLayout(search_layout)
         
         # 显示区域 - 使用QSplitter分割
         display_splitter = QSplitter(Qt.Vertical)
         
-        self.receive_text = SmartTextEdit(self)  # 传递父窗口
-        self.receive_text.setLineWrapMode(QTextEdit.WidgetWidth)
+        # 虚拟化日志视图：只绘制可见行，超出保留上限时淘汰最旧的行
+        # 两个显示区共用一个行存储，过滤结果区只保存命中行的行号
+        # 超出上限的旧行写入磁盘回滚文件，内存占用不随接收时长增长
+        max_lines, max_kb = self.config_manager.get_view_limits()
+        disk_mb = self.config_manager.get_scrollback_mb()
+        self.line_store = LineStore(max_lines, max_kb * 1024, disk_mb * 1024 * 1024)
+        self.receive_text = LogView(self, self.line_store)  # 传递父窗口
         self.receive_text.setFont(QFont("Consolas", 9))
         display_splitter.addWidget(self.receive_text)
         
-        self.filter_preview_text = SmartTextEdit(self)
-        self.filter_preview_text.setLineWrapMode(QTextEdit.WidgetWidth)
+        self.filter_preview_text = LogView(self, self.line_store, filtered=self.line_filter is not None)
         self.filter_preview_text.setPlaceholderText("过滤结果...")
         self.filter_preview_text.setFont(QFont("Consolas", 9))
         display_splitter.addWidget(self.filter_preview_text)
         
+        # 曲线面板：接收线程提取的数值直接画出，不经过文本显示区
+        self.plot_panel = None
+        if PlotPanel is not None:
+            self.plot_panel = PlotPanel(self.series_extractor)
+            self.plot_panel.hide()
+            display_splitter.addWidget(self.plot_panel)
+        
         # 设置分割比例
-        display_splitter.setSizes([200, 100])
+        display_splitter.setSizes([200, 100, 150])
         
         layout.addWidget(display_splitter)
         
         # 状态栏
+        status_layout = QHBoxLayout()
+        status_layout.setContentsMargins(0, 0, 0, 0)
         self.status_label = QLabel('就绪')
-        layout.addWidget(self.status_label)
+        status_layout.addWidget(self.status_label, 1)
+        # 重新过滤历史数据时显示的取消按钮
+        self.cancel_refilter_btn = QPushButton('取消过滤')
+        self.cancel_refilter_btn.clicked.connect(self.cancel_history_filter)
+        self.cancel_refilter_btn.hide()
+        status_layout.addWidget(self.cancel_refilter_btn)
+        layout.addLayout(status_layout)
+
+        # 过滤条件停止输入一段时间后再重新过滤历史数据
+        self.refilter_timer = QTimer(self)
+        self.refilter_timer.setSingleShot(True)
+        self.refilter_timer.setInterval(300)
+        self.refilter_timer.timeout.connect(self.start_history_filter)
+        # 回放进度刷新
+        self.replay_timer = QTimer(self)
+        self.replay_timer.setInterval(250)
+        self.replay_timer.timeout.connect(self.update_replay_status)
         
     def set_auto_save_enabled(self, enabled):
         self.auto_save_enabled = enabled
+        if enabled:
+            self.sync_log_writer()
+        else:
+            if self.port_reader:
+                self.port_reader.log_writer = None
+            self.stop_log_writer()
         
-    def check_auto_save(self):
-        text = self.receive_text.toPlainText()
-        limit_mb = self.config_manager.get_auto_save_limit_mb()
-        if len(text.encode('utf-8')) > limit_mb * 1024: #* 1024:
-            # 自动保存到logs目录 兼容开发环境和打包后环境）
-            if getattr(sys, 'frozen', False):
-                # 打包后：使用exe所在目录
-                base_dir = os.path.dirname(os.path.abspath(sys.executable))
-            else:
-                # 开发环境：使用脚本所在目录
-                base_dir = os.path.dirname(os.path.abspath(__file__))
-
-            logs_dir = os.path.join(base_dir, 'logs')
-            if not os.path.exists(logs_dir):
-                os.makedirs(logs_dir)
-            filename = f"串口{self.port_index}_autosave_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{self.auto_save_file_index}.txt"
-            file_path = os.path.join(logs_dir, filename)
-            try:
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(text)
-                self.auto_save_file_index += 1
-                self.receive_text.clear()
-                self.status_label.setText(f"自动保存到 {file_path}")
-            except Exception as e:
-                self.status_label.setText(f"自动保存失败: {e}")
-        
+    def set_view_limits(self, max_lines, max_kb):
+        """设置显示区最多保留的行数和容量"""
+        self.line_store.set_limits(max_lines, max_kb * 1024)
+
+    def set_scrollback_limit(self, disk_mb):
+        """设置磁盘回滚上限（MB），0表示超出显示上限的行直接淘汰"""
+        self.line_store.set_disk_limit(disk_mb * 1024 * 1024)
+
+    def get_logs_dir(self):
+        """自动保存目录logs（兼容开发环境和打包后环境）"""
+        if getattr(sys, 'frozen', False):
+            # 打包后：使用exe所在目录
+            base_dir = os.path.dirname(os.path.abspath(sys.executable))
+        else:
+            # 开发环境：使用脚本所在目录
+            base_dir = os.path.dirname(os.path.abspath(__file__))
+        return os.path.join(base_dir, 'logs')
+
+    def start_log_writer(self):
+        """启动自动保存写入线程"""
+        self.log_writer = RotatingLogWriter(
+            self.get_logs_dir(), f"串口{self.port_index}_autosave",
+            self.config_manager.get_auto_save_limit_mb() * 1024,
+            self.config_manager.get_auto_save_rotate_minutes() * 60)
+        self.log_writer.metrics = self.metrics
+        self.log_writer.show_hex = self.show_hex_checkbox.isChecked()
+        self.log_writer.show_timestamp = self.show_timestamp_checkbox.isChecked()
+        self.log_writer.file_rotated.connect(lambda path: self.status_label.setText(f"自动保存到 {path}"))
+        self.log_writer.write_failed.connect(lambda err: self.status_label.setText(f"自动保存失败: {err}"))
+        self.log_writer.start()
+
+    def sync_log_writer(self):
+        """自动保存开启且正在接收时启动写入线程，由读取线程在数据进入显示队列前直接写入"""
+        if self.port_reader is None:
+            return
+        if self.auto_save_enabled and self.log_writer is None:
+            self.start_log_writer()
+        self.port_reader.log_writer = self.log_writer if self.auto_save_enabled else None
+
+    def stop_log_writer(self):
+        """停止自动保存写入线程（写完队列中剩余的数据）"""
+        if self.log_writer:
+            self.log_writer.stop()
+            self.log_writer = None
+
+    def set_capture_writer(self, writer):
+        """开始/停止把原始字节录制到writer（None表示停止），正在接收时立即生效"""
+        self.capture_writer = writer
+        if self.port_reader:
+            self.port_reader.capture = writer
+
+    def apply_auto_save_settings(self):
+        """自动保存容量或轮转周期修改后立即生效"""
+        if self.log_writer:
+            self.log_writer.max_bytes = self.config_manager.get_auto_save_limit_mb() * 1024
+            self.log_writer.rotate_seconds = self.config_manager.get_auto_save_rotate_minutes() * 60
+
     def on_baudrate_changed(self, value):
         """波特率选择变化时触发"""
         # 应用波特率更改
@@ -441,13 +544,13 @@ class SerialWidget(QWidget):
                 }
             """)
         else:
-            # 先释放旧资源
+            # 先释放旧资源（先停止接收再关闭串口）
+            if self.port_reader and self.port_reader.isRunning():
+                self.port_reader.stop()
+                self.port_reader = None
             if self.serial_port:
                 self.serial_port.close()
                 self.serial_port = None
-            if self.serial_thread and self.serial_thread.isRunning():
-                self.serial_thread.stop()
-                self.serial_thread = None
                 
             # 在打开串口前，先更新波特率设置
             if self.baudrate_combo.currentText():
@@ -485,17 +588,107 @@ class SerialWidget(QWidget):
         flow_combo.addItems(['None', 'RTS/CTS', 'XON/XOFF'])
         flow_combo.setCurrentText(self.flow_control)
         layout.addRow('流控:', flow_combo)
+        # 接收读取块大小
+        read_size_spin = QSpinBox()
+        read_size_spin.setRange(64, 1024 * 1024)
+        read_size_spin.setValue(self.read_size)
+        layout.addRow('读取块大小(字节):', read_size_spin)
+        # 字节间隔超时
+        inter_byte_spin = QSpinBox()
+        inter_byte_spin.setRange(0, 1000)
+        inter_byte_spin.setValue(self.inter_byte_timeout_ms)
+        layout.addRow('字节间隔超时(ms):', inter_byte_spin)
+        # 接收编码
+        encoding_combo = QComboBox()
+        for key, name in ENCODINGS.items():
+            encoding_combo.addItem(name, key)
+        encoding_combo.setCurrentIndex(max(0, encoding_combo.findData(self.encoding)))
+        layout.addRow('接收编码:', encoding_combo)
+        # 帧格式：换行文本或二进制帧，参数为"参数=值"，以分号分隔
+        framing_kind, framing_options = parse_framing(self.framing)
+        framing_combo = QComboBox()
+        for key, name in FRAMERS.items():
+            framing_combo.addItem(name, key)
+        framing_combo.setCurrentIndex(max(0, framing_combo.findData(framing_kind)))
+        layout.addRow('帧格式:', framing_combo)
+        framing_edit = QLineEdit(';'.join(f'{key}={value}' for key, value in framing_options.items()))
+        framing_edit.setPlaceholderText('如 start=AA55;end=0D0A;checksum=sum8;layout=<Hh;names=id,temp')
+        layout.addRow('帧参数:', framing_edit)
+        # 行结束符：可选常用值，也可以直接输入任意字节序列的HEX
+        terminator_combo = QComboBox()
+        terminator_combo.setEditable(True)
+        for key, name in TERMINATORS.items():
+            terminator_combo.addItem(name, key)
+        terminator_index = terminator_combo.findData(self.line_terminator)
+        if terminator_index >= 0:
+            terminator_combo.setCurrentIndex(terminator_index)
+        else:
+            terminator_combo.setEditText(self.line_terminator)
+        layout.addRow('行结束符(HEX):', terminator_combo)
+        idle_flush_spin = QSpinBox()
+        idle_flush_spin.setRange(0, 60000)
+        idle_flush_spin.setSpecialValueText('不超时')
+        idle_flush_spin.setValue(self.idle_flush_ms)
+        layout.addRow('无结束符时空闲超时(ms):', idle_flush_spin)
+        # 界面队列：显示跟不上时最多积压多少行，超出后的处理方式（自动保存不受影响）
+        queue_lines_spin = QSpinBox()
+        queue_lines_spin.setRange(1000, 10000000)
+        queue_lines_spin.setValue(self.queue_lines)
+        layout.addRow('显示队列上限(行):', queue_lines_spin)
+        queue_policy_combo = QComboBox()
+        for key, name in POLICIES.items():
+            queue_policy_combo.addItem(name, key)
+        queue_policy_combo.setCurrentIndex(max(0, queue_policy_combo.findData(self.queue_policy)))
+        layout.addRow('显示队列满时:', queue_policy_combo)
+        # 批量刷新
+        batch_lines_spin = QSpinBox()
+        batch_lines_spin.setRange(1, 100000)
+        batch_lines_spin.setValue(self.batch_lines)
+        layout.addRow('每批最大行数:', batch_lines_spin)
+        flush_interval_spin = QSpinBox()
+        flush_interval_spin.setRange(1, 5000)
+        flush_interval_spin.setValue(self.flush_interval_ms)
+        layout.addRow('批量刷新间隔(ms):', flush_interval_spin)
         # 按钮
         buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
         layout.addRow(buttons)
-        buttons.accepted.connect(dialog.accept)
         buttons.rejected.connect(dialog.reject)
+
+        def accept():
+            # 帧参数有误时提示并保留对话框
+            framing = ';'.join(part for part in (framing_combo.currentData(), framing_edit.text().strip()) if part)
+            terminator_text = terminator_combo.currentText()
+            terminator_index = terminator_combo.findText(terminator_text)
+            terminator = (terminator_combo.itemData(terminator_index) if terminator_index >= 0
+                          else terminator_text.replace(' ', '').upper())
+            try:
+                terminator_bytes = bytes.fromhex(terminator)
+            except ValueError:
+                QMessageBox.warning(dialog, '行结束符错误', f'行结束符应为HEX，如0D0A: {terminator_text}')
+                return
+            try:
+                make_framer(framing, terminator=terminator_bytes)
+            except ValueError as e:
+                QMessageBox.warning(dialog, '帧格式错误', str(e))
+                return
+            self.framing = framing
+            self.line_terminator = terminator
+            dialog.accept()
+        buttons.accepted.connect(accept)
         if dialog.exec_() == QDialog.Accepted:
             self.custom_baudrate = baudrate_spin.value()
             self.data_bits = int(databits_combo.currentText())
             self.stop_bits = float(stopbits_combo.currentText())
             self.parity = parity_combo.currentText()
             self.flow_control = flow_combo.currentText()
+            self.read_size = read_size_spin.value()
+            self.inter_byte_timeout_ms = inter_byte_spin.value()
+            self.encoding = encoding_combo.currentData()
+            self.batch_lines = batch_lines_spin.value()
+            self.flush_interval_ms = flush_interval_spin.value()
+            self.queue_lines = queue_lines_spin.value()
+            self.queue_policy = queue_policy_combo.currentData()
+            self.idle_flush_ms = idle_flush_spin.value()
             self.baudrate_combo.setCurrentText(str(self.custom_baudrate))
             self.config_manager.set_port_config(self.port_index, self.get_config())
             if self.serial_port and self.serial_port.is_open:
@@ -511,31 +704,17 @@ class SerialWidget(QWidget):
                 QMessageBox.warning(self, '警告', '请先选择一个有效串口')
                 return
             baudrate = self.custom_baudrate if self.custom_baudrate is not None else int(self.baudrate_combo.currentText())
-            data_bits = self.data_bits
-            stop_bits = self.stop_bits
-            parity = self.parity
-            flow_control = self.flow_control
-            # 转换为pyserial参数
-            bytesize = {5: serial.FIVEBITS, 6: serial.SIXBITS, 7: serial.SEVENBITS, 8: serial.EIGHTBITS}[data_bits]
-            stopbits = {1: serial.STOPBITS_ONE, 1.5: serial.STOPBITS_ONE_POINT_FIVE, 2: serial.STOPBITS_TWO}[stop_bits]
-            parity_map = {'None': serial.PARITY_NONE, 'Even': serial.PARITY_EVEN, 'Odd': serial.PARITY_ODD, 'Mark': serial.PARITY_MARK, 'Space': serial.PARITY_SPACE}
-            parity_val = parity_map.get(parity, serial.PARITY_NONE)
             # 打开串口前先关闭可能存在的旧串口连接
             if self.serial_port and self.serial_port.is_open:
                 self.serial_port.close()
-            self.serial_port = serial.Serial(
-                port=port_name,
-                baudrate=baudrate,
-                bytesize=bytesize,
-                stopbits=stopbits,
-                parity=parity_val,
-                timeout=0.1,
-                rtscts=(flow_control == 'RTS/CTS'),
-                xonxoff=(flow_control == 'XON/XOFF')
-            )
+            self.serial_port = open_serial_port(port_name, baudrate,
+                                                data_bits=self.data_bits,
+                                                stop_bits=self.stop_bits,
+                                                parity=self.parity,
+                                                flow_control=self.flow_control)
             
             if self.serial_port.is_open:
-                self.status_label.setText(f'已打开: {port_name}, {baudrate}')
+                self.status_label.setText(f'已打开: {port_name}, {baudrate} | 批量: {self.batch_lines}行/{self.flush_interval_ms}ms')
                 self.open_close_btn.setText('关闭')
                 # 设置打开状态的样式（红色）
                 self.open_close_btn.setStyleSheet("""
@@ -550,11 +729,7 @@ class SerialWidget(QWidget):
                 """)
                 
                 # 启动串口接收线程
-                if self.serial_thread and self.serial_thread.isRunning():
-                    self.serial_thread.stop()
-                self.serial_thread = SerialThread(self.serial_port, self.port_index)
-                self.serial_thread.data_received.connect(self.handle_data)
-                self.serial_thread.start()
+                self.start_port_reader()
             else:
                 # 打开失败时回滚按钮状态
                 self.status_label.setText('打开失败：串口未成功打开')
@@ -604,11 +779,67 @@ class SerialWidget(QWidget):
             QMessageBox.critical(self, '错误', f'打开串口失败: {str(e)}')
 
     
+    def start_port_reader(self):
+        """为当前的serial_port（真实串口或回放端口）开始接收，能加入共用I/O线程时不再单独开线程"""
+        if self.port_reader and self.port_reader.isRunning():
+            self.port_reader.stop()
+        self.port_reader = PortReader(self.serial_port, self.port_index,
+                                      read_size=self.read_size,
+                                      inter_byte_timeout=self.inter_byte_timeout_ms / 1000.0,
+                                      batch_lines=self.batch_lines,
+                                      flush_interval=self.flush_interval_ms / 1000.0,
+                                      encoding=self.encoding,
+                                      queue_lines=self.queue_lines,
+                                      queue_policy=self.queue_policy,
+                                      framing=self.framing,
+                                      terminator=bytes.fromhex(self.line_terminator),
+                                      idle_flush=self.idle_flush_ms / 1000.0)
+        self.port_reader.data_ready.connect(self.on_data_ready)
+        self.port_reader.capture = self.capture_writer
+        self.port_reader.metrics = self.metrics
+        self.port_reader.series_extractor = self.series_extractor
+        self.sync_log_writer()
+        self.port_reader.start(self.io_loop)
+
+    def start_replay(self, replay_port):
+        """用回放端口代替串口，数据经过与实时接收相同的切行、批量、过滤和显示流程"""
+        self.close_serial()
+        self.serial_port = replay_port
+        self.replay_first_seq = self.receive_text.log_model.next_seq
+        self.start_port_reader()
+        self.open_close_btn.setText('关闭')
+        self.open_close_btn.setStyleSheet("""
+            QPushButton {
+                font-weight: bold;
+                background-color: #ff0000;
+                color: white;
+            }
+            QPushButton:hover {
+                background-color: #d32f2f;
+            }
+        """)
+        self.replay_timer.start()
+        self.update_replay_status()
+
+    def update_replay_status(self):
+        """定时显示回放进度、实际达到的行/s和丢弃的块数"""
+        port = self.serial_port
+        if not isinstance(port, ReplayPort):
+            self.replay_timer.stop()
+            return
+        lines = self.receive_text.log_model.next_seq - self.replay_first_seq
+        self.status_label.setText(port.status_text(lines))
+        if port.settled:
+            self.replay_timer.stop()
+
     def close_serial(self):
         """关闭串口"""
-        if self.serial_thread and self.serial_thread.isRunning():
-            self.serial_thread.stop()
-            self.serial_thread = None
+        if self.port_reader and self.port_reader.isRunning():
+            reader = self.port_reader
+            reader.stop()
+            self.port_reader = None
+            # 显示关闭前已收到的数据
+            self.drain_queue(reader.queue, None)
             
         if self.serial_port and self.serial_port.is_open:
             self.serial_port.close()
@@ -626,74 +857,301 @@ class SerialWidget(QWidget):
                 .replace("'", "&#39;")
         )
 
-    def handle_data(self, data, port_index):
-        """处理接收到的数据，修复>字符转义问题"""
-        # 获取过滤设置
-        filter_text = self.filter_edit.text().strip()
-        keywords = [kw.strip() for kw in filter_text.split('|') if kw.strip()]
-        case_sensitive = self.filter_case_checkbox.isChecked()
-        show_hex = self.show_hex_checkbox.isChecked()
-        show_timestamp = self.show_timestamp_checkbox.isChecked()  # 获取时间戳开关状态
-        
-        # 关键修复：移除对>的转义，仅保留必要的转义（如<）
-        line = data.rstrip('\n')
-        # 仅转义<（如果需要），删除对>的转义
-        escaped_line = line.replace('<', '&lt;')  # 保留<的转义（可选）
-        # 或者完全不转义（根据需求选择）
-        # escaped_line = line
-        
-        # 处理时间戳（根据开关状态决定是否添加）
-        timestamp = ""
-        if show_timestamp:
-            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]  # 格式：20250605_204441_202
-            timestamp_html = f'<span style="color:#888888;">[{timestamp}]</span>'
-        else:
-            timestamp_html = ""
-        
-        # 处理数据行（使用原始或仅转义<后的内容）
-        processed_line = f"{timestamp_html}{escaped_line}"
-        
-        # 显示原始数据（添加日志确认）
-        if show_hex:
-            hex_data = ' '.join([f"{ord(c):02X}" for c in line])
-            hex_line = f'<span style="color:#666666;">[HEX] {hex_data}</span>'
-            self.receive_text.append_smart(f"{processed_line}  {hex_line}")
-            print(f"[显示] 原始数据: {processed_line}")
+    def set_show_hex(self, show_hex):
+        """切换HEX显示，已接收的行同样生效"""
+        self.receive_text.set_show_hex(show_hex)
+        self.filter_preview_text.set_show_hex(show_hex)
+        if self.log_writer:
+            self.log_writer.show_hex = show_hex
+
+    def set_show_timestamp(self, show_timestamp):
+        """时间戳开关对之后接收的行和自动保存生效"""
+        if self.log_writer:
+            self.log_writer.show_timestamp = show_timestamp
+
+    def set_show_plot(self, show_plot):
+        """显示/隐藏曲线面板，隐藏时不刷新，数值仍在接收线程中提取"""
+        if self.plot_panel:
+            self.plot_panel.setVisible(show_plot)
+
+    def update_filter(self, *args):
+        """过滤文本或模式变化时编译过滤器"""
+        try:
+            line_filter = compile_filter(self.filter_edit.text().strip(),
+                                         self.filter_case_checkbox.isChecked(),
+                                         self.filter_regex_checkbox.isChecked(),
+                                         self.filter_whole_word_checkbox.isChecked())
+        except re.error as e:
+            self.line_filter = None
+            self.status_label.setText(f'过滤表达式错误: {e}')
+            return
+        self.line_filter = line_filter if line_filter.active else None
+        self.refilter_timer.start()
+
+    def start_history_filter(self):
+        """用当前过滤器在后台重新过滤已接收的全部数据"""
+        self.stop_history_filter()
+        model = self.filter_preview_text.log_model
+        if self.line_filter is None:
+            # 没有过滤条件时直接显示全部行，不需要扫描
+            model.show_all()
+            return
+        model.show_seqs()
+        snapshot = self.line_store.snapshot()
+        if not len(snapshot):
+            return
+        worker = HistoryFilterThread(snapshot, self.line_filter, parent=self)
+        # 通过worker判断信号是否来自当前线程，忽略已取消线程残留在队列里的结果
+        worker.rows_matched.connect(lambda matched, w=worker: self.on_history_rows(w, matched))
+        worker.progress.connect(lambda done, total, w=worker: self.on_history_progress(w, done, total))
+        worker.finished.connect(lambda w=worker: self.on_history_finished(w))
+        self.history_filter = worker
+        self.cancel_refilter_btn.show()
+        worker.start()
+
+    def on_history_rows(self, worker, seqs):
+        if worker is self.history_filter:
+            self.filter_preview_text.log_model.append_seqs(seqs)
+
+    def on_history_progress(self, worker, done, total):
+        if worker is self.history_filter:
+            self.status_label.setText(f'重新过滤中: {done}/{total} ({done * 100 // total}%)')
+
+    def on_history_finished(self, worker):
+        if worker is not self.history_filter:
+            return
+        self.status_label.setText(f'重新过滤完成: {len(worker.snapshot)}行中命中{worker.matched_count}行')
+        self.finish_history_filter()
+
+    def cancel_history_filter(self):
+        """取消重新过滤，保留已得到的结果"""
+        if self.history_filter is not None:
+            self.history_filter.cancel()
+            self.history_filter.wait()
+            self.status_label.setText('已取消重新过滤')
+            self.finish_history_filter()
+
+    def finish_history_filter(self):
+        """重新过滤结束：补上期间新到达的命中行"""
+        self.history_filter = None
+        self.cancel_refilter_btn.hide()
+        if self.pending_filtered:
+            self.filter_preview_text.log_model.append_seqs(self.pending_filtered)
+            self.pending_filtered = []
+
+    def stop_history_filter(self):
+        """丢弃正在进行的重新过滤"""
+        if self.history_filter is not None:
+            self.history_filter.cancel()
+            self.history_filter.wait()
+            self.history_filter = None
+            self.cancel_refilter_btn.hide()
+        self.pending_filtered = []
+
+    def on_data_ready(self, port_index):
+        """接收线程的队列由空变为非空"""
+        if self.port_reader is not None:
+            self.drain_queue(self.port_reader.queue)
+
+    def drain_queue(self, queue, max_lines=-1):
+        """从接收队列取数据显示，每次最多drain_lines行，剩余的留到下一轮事件循环，界面保持响应"""
+        if max_lines == -1:
+            max_lines = self.drain_lines
+        batches, skipped, remaining = queue.take(max_lines)
+        if skipped:
+            self.show_skipped(skipped)
+        if batches:
+            lines, stamps, raws = [], [], []
+            for batch_lines, batch_stamps, batch_raws in batches:
+                lines.extend(batch_lines)
+                stamps.extend(batch_stamps)
+                raws.extend(batch_raws)
+            self.handle_data(lines, stamps, raws, self.port_index)
+        if remaining:
+            QTimer.singleShot(0, lambda: self.drain_queue(queue))
+
+    def show_skipped(self, count):
+        """显示队列满时被丢弃的行数（coalesce策略），自动保存中没有缺失"""
+        seq = self.line_store.append_system(f'...... 显示跟不上，跳过{count}行（自动保存完整） ......')
+        if self.line_filter is None:
+            return
+        if self.history_filter is not None:
+            self.pending_filtered.append(seq)
         else:
-            self.receive_text.append_smart(processed_line)
-            print(f"[显示] 原始数据: {processed_line}")
-        
-        # 过滤数据逻辑（仅用户设置的关键字过滤）
-        if not keywords:
-            if show_hex:
-                self.filter_preview_text.append_smart(f"{processed_line}  {hex_line}")
-            else:
-                self.filter_preview_text.append_smart(processed_line)
-            # 自动保存逻辑
-            if self.auto_save_enabled:
-                self.check_auto_save()
+            self.filter_preview_text.log_model.append_seqs([seq])
+
+    def handle_data(self, lines, stamps, raws, port_index):
+        """处理接收线程送来的一批数据，整批一次追加到共用的行存储
+
+        stamps是接收线程记录的每行到达时间戳（perf_counter_ns），
+        raws是每行解码前的原始字节，HEX显示时才由显示区转换。
+        原始数据区直接显示存储中的行，过滤结果区只追加命中行的行号。
+        """
+        started = time.perf_counter()
+        line_filter = self.line_filter
+        show_timestamp = self.show_timestamp_checkbox.isChecked()  # 获取时间戳开关状态
+
+        if lines:
+            # 时间戳前缀在绘制可见行时才格式化
+            store = self.line_store
+            first_seq = store.append(lines, stamps, raws, show_timestamp)
+            # 交给后台线程建索引，并清理已被显示区淘汰的行
+            if self.search_indexer is None:
+                self.search_indexer = SearchIndexThread(self.search_index)
+                self.search_indexer.start()
+            self.search_indexer.add_lines(first_seq, lines, [to_wall(stamp) for stamp in stamps])
+            # 索引只覆盖内存中的行，磁盘上的行查找时直接扫描
+            self.search_index.prune(store.memory_first_seq)
+
+            # 过滤数据逻辑（只匹配数据内容，不匹配时间戳）
+            if line_filter is not None:
+                match = line_filter.match
+                matched = [first_seq + i for i, line in enumerate(lines) if match(line)]
+                if matched:
+                    if self.history_filter is not None:
+                        # 正在重新过滤历史数据，新数据排在历史结果之后
+                        self.pending_filtered.extend(matched)
+                    else:
+                        self.filter_preview_text.log_model.append_seqs(matched)
+        # 调试输出按每秒行数限速，高速数据下不会拖慢界面
+        if self.debug_echo is not None:
+            self.debug_echo.echo(f"[串口{self.port_index}]", lines)
+        self.metrics.record_render(time.perf_counter() - started, len(lines))
+
+    def run_search(self, on_hits=None):
+        """查找搜索框中的内容，把命中行的全局行号（升序）交给on_hits并返回
+
+        查询里有可索引的单词时在界面线程中用索引直接得到结果；纯数字或符号的查询
+        改由后台线程逐行扫描全部历史（含磁盘回滚），完成后再调用on_hits，此时返回None。
+        """
+        query = self.search_edit.text()
+        if not query:
+            self.search_hits_label.setText('')
+            return []
+        start_time = end_time = None
+        if self.search_time_checkbox.isChecked():
+            start_time = self.search_start_edit.dateTime().toMSecsSinceEpoch() / 1000.0
+            end_time = self.search_end_edit.dateTime().toMSecsSinceEpoch() / 1000.0
+        store = self.line_store
+        self.stop_search_scan()
+        started = time.perf_counter()
+        hits = self.search_index.search(query, store.text, store.memory_first_seq, start_time, end_time)
+        if hits is None:
+            self.start_search_scan(query, start_time, end_time, on_hits)
+            return None
+        hits = store.search_disk(query, start_time, end_time) + hits
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.search_hits_label.setText(f'命中{len(hits)}行 ({elapsed_ms:.0f}ms)')
+        if on_hits is not None:
+            on_hits(hits)
+        return hits
+
+    def start_search_scan(self, query, start_time, end_time, on_hits):
+        """在后台线程逐行扫描全部历史，完成后按时间范围筛选并交给on_hits"""
+        snapshot = self.line_store.snapshot()
+        worker = HistoryFilterThread(snapshot, QueryMatcher(query), parent=self)
+        # 与重新过滤相同，通过worker判断信号是否来自当前扫描
+        worker.rows_matched.connect(lambda matched, w=worker: self.on_search_scan_rows(w, matched))
+        worker.progress.connect(lambda done, total, w=worker: self.on_search_scan_progress(w, done, total))
+        worker.finished.connect(
+            lambda w=worker: self.on_search_scan_finished(w, start_time, end_time, on_hits))
+        self.search_scan = worker
+        self.search_scan_hits = []
+        self.search_scan_started = time.perf_counter()
+        self.search_hits_label.setText('逐行查找中...')
+        worker.start()
+
+    def on_search_scan_rows(self, worker, seqs):
+        if worker is self.search_scan:
+            self.search_scan_hits.extend(seqs)
+
+    def on_search_scan_progress(self, worker, done, total):
+        if worker is self.search_scan:
+            self.search_hits_label.setText(f'逐行查找中: {done * 100 // total}%')
+
+    def on_search_scan_finished(self, worker, start_time, end_time, on_hits):
+        if worker is not self.search_scan:
             return
-            
-        line_to_check = processed_line if case_sensitive else processed_line.lower()
-        
-        if any(kw.lower() if not case_sensitive else kw in line_to_check for kw in keywords):
-            if show_hex:
-                self.filter_preview_text.append_smart(f"{processed_line}  {hex_line}")
-            else:
-                self.filter_preview_text.append_smart(processed_line)
-            print(f"[显示] 过滤数据: {processed_line}")
-        # 自动保存逻辑
-        if self.auto_save_enabled:
-            self.check_auto_save()
-    
+        self.search_scan = None
+        hits = self.search_scan_hits
+        self.search_scan_hits = []
+        if start_time is not None:
+            store = self.line_store
+            in_range = []
+            for seq in hits:
+                stamp = store.stamp(seq)
+                if stamp and start_time <= to_wall(stamp) <= end_time:
+                    in_range.append(seq)
+            hits = in_range
+        elapsed_ms = (time.perf_counter() - self.search_scan_started) * 1000
+        self.search_hits_label.setText(f'命中{len(hits)}行 (逐行查找{len(worker.snapshot)}行, {elapsed_ms:.0f}ms)')
+        if on_hits is not None:
+            on_hits(hits)
+
+    def stop_search_scan(self):
+        """取消正在进行的逐行查找"""
+        if self.search_scan is not None:
+            self.search_scan.cancel()
+            self.search_scan.wait()
+            self.search_scan = None
+
+    def find_next(self):
+        """跳到当前行之后的下一个匹配，到末尾后从头开始"""
+        self.run_search(self.show_next_hit)
+
+    def show_next_hit(self, hits):
+        if hits:
+            i = bisect_right(hits, self.receive_text.current_seq())
+            self.receive_text.scroll_to_seq(hits[i] if i < len(hits) else hits[0])
+
+    def find_prev(self):
+        """跳到当前行之前的上一个匹配，到开头后从末尾开始"""
+        self.run_search(self.show_prev_hit)
+
+    def show_prev_hit(self, hits):
+        if hits:
+            i = bisect_left(hits, self.receive_text.current_seq())
+            self.receive_text.scroll_to_seq(hits[i - 1])
+
+    def find_all(self):
+        """列出所有匹配行，双击跳转"""
+        self.run_search(self.show_all_hits)
+
+    def show_all_hits(self, hits):
+        if hits:
+            dialog = SearchResultsDialog(self, hits, self.receive_text)
+            dialog.show()
+
+    def jump_to_line(self):
+        """按行号跳转（行号从1开始，包含已淘汰的行）"""
+        model = self.receive_text.log_model
+        if not model.rowCount():
+            return
+        first, last = model.first_seq + 1, model.next_seq
+        current = min(max(self.receive_text.current_seq() + 1, first), last)
+        line_no, ok = QInputDialog.getInt(self, '跳转到行', f'行号（{first}-{last}）:', current, first, last, 1)
+        if ok:
+            self.receive_text.scroll_to_seq(line_no - 1)
+
+    def stop_search_index(self):
+        """停止后台建索引线程"""
+        if self.search_indexer is not None:
+            self.search_indexer.stop()
+            self.search_indexer = None
+
     def clear_display(self):
         """清空显示区域"""
-        self.receive_text.clear()
-        self.filter_preview_text.clear()
+        self.stop_history_filter()
+        self.stop_search_scan()
+        self.line_store.clear()  # 两个显示区同时清空
+        self.search_index.clear()
+        self.search_hits_label.setText('')
+        if self.series_extractor is not None:
+            self.series_extractor.clear()
     
     def save_original_data(self):
         """保存原始数据到文件"""
-        if not self.receive_text.toPlainText():
+        if not self.receive_text.line_count():
             QMessageBox.information(self, "提示", "没有数据可保存")
             return
         
@@ -706,16 +1164,15 @@ class SerialWidget(QWidget):
         if file_path:
             try:
                 # 保存纯文本，不包含HTML标签
-                plain_text = self.receive_text.toPlainText()
                 with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(plain_text)
+                    self.receive_text.write_text(f)
                 QMessageBox.information(self, "成功", f"数据已保存到 {file_path}")
             except Exception as e:
                 QMessageBox.critical(self, "错误", f"保存文件失败: {str(e)}")
     
     def save_filtered_data(self):
         """保存过滤数据到文件"""
-        if not self.filter_preview_text.toPlainText():
+        if not self.filter_preview_text.line_count():
             QMessageBox.information(self, "提示", "没有过滤数据可保存")
             return
         
@@ -728,9 +1185,8 @@ class SerialWidget(QWidget):
         if file_path:
             try:
                 # 保存纯文本，不包含HTML标签
-                plain_text = self.filter_preview_text.toPlainText()
                 with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(plain_text)
+                    self.filter_preview_text.write_text(f)
                 QMessageBox.information(self, "成功", f"数据已保存到 {file_path}")
             except Exception as e:
                 QMessageBox.critical(self, "错误", f"保存文件失败: {str(e)}")
@@ -743,12 +1199,27 @@ class SerialWidget(QWidget):
             'custom_baudrate': self.custom_baudrate,
             'filter_text': self.filter_edit.text(),
             'filter_case': self.filter_case_checkbox.isChecked(),
+            'filter_regex': self.filter_regex_checkbox.isChecked(),
+            'filter_whole_word': self.filter_whole_word_checkbox.isChecked(),
             'show_hex': self.show_hex_checkbox.isChecked(),
             'show_timestamp': self.show_timestamp_checkbox.isChecked(),
+            'show_plot': self.show_plot_checkbox.isChecked(),
+            'plot_rules': self.plot_panel.rules() if self.plot_panel else self.plot_rules,
+            'plot_span': self.plot_panel.span_index() if self.plot_panel else self.plot_span,
             'data_bits': self.data_bits,
             'stop_bits': self.stop_bits,
             'parity': self.parity,
             'flow_control': self.flow_control,
+            'read_size': self.read_size,
+            'inter_byte_timeout_ms': self.inter_byte_timeout_ms,
+            'encoding': self.encoding,
+            'batch_lines': self.batch_lines,
+            'flush_interval_ms': self.flush_interval_ms,
+            'queue_lines': self.queue_lines,
+            'queue_policy': self.queue_policy,
+            'framing': self.framing,
+            'line_terminator': self.line_terminator,
+            'idle_flush_ms': self.idle_flush_ms,
         }
         return cfg
     
@@ -774,20 +1245,78 @@ class SerialWidget(QWidget):
                 self.stop_bits = config.get('stop_bits', 1)
                 self.parity = config.get('parity', 'None')
                 self.flow_control = config.get('flow_control', 'None')
+                self.read_size = config.get('read_size', 4096)
+                self.inter_byte_timeout_ms = config.get('inter_byte_timeout_ms', 0)
+                self.encoding = config.get('encoding', 'auto')
+                self.batch_lines = config.get('batch_lines', 200)
+                self.flush_interval_ms = config.get('flush_interval_ms', 50)
+                self.queue_lines = config.get('queue_lines', 100000)
+                self.queue_policy = config.get('queue_policy', 'drop_oldest')
+                self.framing = config.get('framing', 'newline')
+                self.line_terminator = config.get('line_terminator', '0A')
+                self.idle_flush_ms = config.get('idle_flush_ms', 0)
                 
                 # 设置过滤配置
                 self.filter_edit.setText(config.get('filter_text', ''))
                 self.filter_case_checkbox.setChecked(config.get('filter_case', True))
+                self.filter_regex_checkbox.setChecked(config.get('filter_regex', False))
+                self.filter_whole_word_checkbox.setChecked(config.get('filter_whole_word', False))
                 self.show_hex_checkbox.setChecked(config.get('show_hex', False))
                 self.show_timestamp_checkbox.setChecked(config.get('show_timestamp', True))  # 新增
+                
+                # 曲线面板
+                self.plot_rules = config.get('plot_rules', '')
+                self.plot_span = config.get('plot_span', 1)
+                if self.plot_panel:
+                    self.plot_panel.set_rules(self.plot_rules)
+                    self.plot_panel.set_span_index(self.plot_span)
+                    self.show_plot_checkbox.setChecked(config.get('show_plot', False))
             except Exception as e:
                 print(f"加载串口{self.port_index}配置失败: {e}")
 
+    def shutdown(self):
+        """关闭串口并停止所有后台线程（主窗口关闭或重建串口窗口时调用）"""
+        if self.serial_port and self.serial_port.is_open:
+            self.close_serial()
+        self.stop_history_filter()
+        self.stop_search_scan()
+        self.stop_search_index()
+        self.stop_log_writer()
+        self.line_store.close()
+
     def restore_auto_scroll(self):
         """恢复自动滚动"""
         self.receive_text.force_auto_scroll()
         self.filter_preview_text.force_auto_scroll()
 
+class SearchResultsDialog(QDialog):
+    """查找全部的结果列表，双击跳转到对应行"""
+    MAX_ITEMS = 10000
+
+    def __init__(self, parent, hits, log_view):
+        super().__init__(parent)
+        self.log_view = log_view
+        self.setWindowTitle(f'查找结果：{len(hits)}行')
+        self.resize(700, 400)
+        layout = QVBoxLayout(self)
+        self.result_list = QListWidget()
+        self.result_list.setFont(QFont("Consolas", 9))
+        self.result_list.setUniformItemSizes(True)
+        model = log_view.log_model
+        for seq in hits[:self.MAX_ITEMS]:
+            text = model.text_by_seq(seq)
+            if text is None:
+                continue
+            item = QListWidgetItem(f"{seq + 1}: {text}")
+            item.setData(Qt.UserRole, seq)
+            self.result_list.addItem(item)
+        self.result_list.itemDoubleClicked.connect(
+            lambda item: self.log_view.scroll_to_seq(item.data(Qt.UserRole)))
+        layout.addWidget(self.result_list)
+        if len(hits) > self.MAX_ITEMS:
+            layout.addWidget(QLabel(f'只列出前{self.MAX_ITEMS}行'))
+
+
 class ConfigManager:
     """配置管理器"""
     def __init__(self, config_file="serial_monitor_config.json"):
@@ -840,6 +1369,22 @@ class ConfigManager:
         self.config['splitter_sizes'] = sizes
         self.save_config()
         
+    def get_port_count(self):
+        """同时监控的串口数量"""
+        return self.config.get('port_count', 2)
+
+    def set_port_count(self, count):
+        self.config['port_count'] = count
+        self.save_config()
+
+    def get_port_layout(self):
+        """串口窗口排列方式，取值见PORT_LAYOUTS"""
+        return self.config.get('port_layout', 'splitter')
+
+    def set_port_layout(self, layout):
+        self.config['port_layout'] = layout
+        self.save_config()
+
     # 在ConfigManager类中添加
     def get_auto_save_enabled(self):
         return self.config.get('auto_save_enabled', False)
@@ -855,6 +1400,38 @@ class ConfigManager:
         self.config['auto_save_limit_mb'] = mb
         self.save_config()
 
+    def get_auto_save_rotate_minutes(self):
+        return self.config.get('auto_save_rotate_minutes', 0)
+
+    def set_auto_save_rotate_minutes(self, minutes):
+        self.config['auto_save_rotate_minutes'] = minutes
+        self.save_config()
+
+    def get_debug_echo(self):
+        return self.config.get('debug_echo', False)
+
+    def set_debug_echo(self, enabled):
+        self.config['debug_echo'] = enabled
+        self.save_config()
+
+    def get_view_limits(self):
+        """显示区保留上限：(最大行数, 最大容量KB)"""
+        return (self.config.get('view_max_lines', 100000),
+                self.config.get('view_max_kb', 32 * 1024))
+
+    def set_view_limits(self, max_lines, max_kb):
+        self.config['view_max_lines'] = max_lines
+        self.config['view_max_kb'] = max_kb
+        self.save_config()
+
+    def get_scrollback_mb(self):
+        """磁盘回滚上限（MB），0表示不写磁盘"""
+        return self.config.get('scrollback_mb', 1024)
+
+    def set_scrollback_mb(self, mb):
+        self.config['scrollback_mb'] = mb
+        self.save_config()
+
 class DualSerialMonitor(QMainWindow):
     """双串口监控工具主窗口"""
     def __init__(self):
@@ -887,6 +1464,14 @@ class DualSerialMonitor(QMainWindow):
         set_limit_action = QAction('设置自动保存容量', self)
         set_limit_action.triggered.connect(self.set_auto_save_limit)
         file_menu.addAction(set_limit_action)
+        # 添加设置自动保存按时间轮转
+        set_rotate_action = QAction('设置自动保存轮转间隔', self)
+        set_rotate_action.triggered.connect(self.set_auto_save_rotate)
+        file_menu.addAction(set_rotate_action)
+        # 添加设置显示区保留上限
+        view_limit_action = QAction('设置显示保留上限', self)
+        view_limit_action.triggered.connect(self.set_view_limits)
+        file_menu.addAction(view_limit_action)
         
         # 添加保存动作
         save_all_original_action = QAction('保存所有原始数据', self)
@@ -896,30 +1481,126 @@ class DualSerialMonitor(QMainWindow):
         save_all_filtered_action = QAction('保存所有过滤数据', self)
         save_all_filtered_action.triggered.connect(self.save_all_filtered_data)
         file_menu.addAction(save_all_filtered_action)
+
+        # 原始数据录制：保存每次读取的原始字节和到达时间，之后可按不同编码重新解码
+        file_menu.addSeparator()
+        self.capture_action = QAction('录制原始数据', self)
+        self.capture_action.setCheckable(True)
+        self.capture_action.triggered.connect(self.toggle_capture)
+        file_menu.addAction(self.capture_action)
+        export_capture_action = QAction('导出录制文件为文本', self)
+        export_capture_action.triggered.connect(self.export_capture)
+        file_menu.addAction(export_capture_action)
+        replay_action = QAction('回放录制文件', self)
+        replay_action.triggered.connect(self.replay_capture)
+        file_menu.addAction(replay_action)
+        self.capture_writer = None
+        self.replay_reader = None
+
+        # 性能指标：导出为JSON Lines文件，调试输出限速打印接收到的行
+        file_menu.addSeparator()
+        self.metrics_export_action = QAction('导出性能指标', self)
+        self.metrics_export_action.setCheckable(True)
+        self.metrics_export_action.triggered.connect(self.toggle_metrics_export)
+        file_menu.addAction(self.metrics_export_action)
+        self.debug_echo_action = QAction('调试输出(限速)', self)
+        self.debug_echo_action.setCheckable(True)
+        self.debug_echo_action.setChecked(self.config_manager.get_debug_echo())
+        self.debug_echo_action.triggered.connect(self.toggle_debug_echo)
+        file_menu.addAction(self.debug_echo_action)
+        self.metrics_exporter = None
+
+        # 串口数量和排列方式
+        window_menu = menubar.addMenu('窗口')
+        port_count_action = QAction('设置串口数量', self)
+        port_count_action.triggered.connect(self.set_port_count)
+        window_menu.addAction(port_count_action)
+        layout_menu = window_menu.addMenu('排列方式')
+        self.layout_group = QActionGroup(self)
+        for key, name in PORT_LAYOUTS.items():
+            action = QAction(name, self)
+            action.setCheckable(True)
+            action.setData(key)
+            action.setChecked(key == self.config_manager.get_port_layout())
+            self.layout_group.addAction(action)
+            layout_menu.addAction(action)
+        self.layout_group.triggered.connect(self.set_port_layout)
+        
+        # 所有串口共用一个读取线程（selectors多路复用），不支持的端口自动使用独立线程
+        self.io_loop = SerialIOLoop()
+        self.main_layout = main_layout
+        self.serial_widgets = []
+        self.splitter = None
+        self.port_area = None
+        self.build_port_area()
         
-        # 创建水平分割器
-        # 创建水平分割器时设置优化选项
-        self.splitter = QSplitter(Qt.Horizontal)
-        self.splitter.setOpaqueResize(False)  # 禁用实时拖动效果，提升性能
-        #self.splitter.setChildrenCollapsible(False)  # 禁止分割器折叠
-        
-        # 创建两个串口部件
+        # 状态栏
+        self.statusBar().showMessage(f'就绪 - 支持{len(self.serial_widgets)}个串口同时监控')
+        # 性能指标面板：每秒汇总各串口的吞吐、队列深度和渲染耗时
+        self.metrics_label = QLabel()
+        self.statusBar().addPermanentWidget(self.metrics_label)
+        self.metrics_timer = QTimer(self)
+        self.metrics_timer.timeout.connect(self.update_metrics)
+        self.metrics_timer.start(1000)
+
+    def build_port_area(self):
+        """按配置的串口数量和排列方式创建串口窗口"""
+        count = self.config_manager.get_port_count()
+        layout_mode = self.config_manager.get_port_layout()
         self.serial_widgets = []
-        for i in range(2):
+        for i in range(count):
             widget = SerialWidget(i+1, self.config_manager)
-            self.splitter.addWidget(widget)
+            widget.io_loop = self.io_loop
+            widget.set_auto_save_enabled(self.auto_save_action.isChecked())
+            widget.set_capture_writer(self.capture_writer)
+            widget.debug_echo = DebugEcho() if self.debug_echo_action.isChecked() else None
             self.serial_widgets.append(widget)
-        
-        # 设置更紧凑的初始大小比例
-        self.splitter.setSizes([250, 250])
-        
-        main_layout.addWidget(self.splitter)
-        
-        # 状态栏
-        self.statusBar().showMessage('就绪 - 支持2个串口同时监控')
-        
+        self.splitter = None
+        if layout_mode == 'tabs':
+            area = QTabWidget()
+            for widget in self.serial_widgets:
+                area.addTab(widget, f'串口{widget.port_index}')
+        elif layout_mode == 'grid':
+            area = QWidget()
+            grid = QGridLayout(area)
+            grid.setContentsMargins(0, 0, 0, 0)
+            grid.setSpacing(2)
+            columns = math.ceil(math.sqrt(count))
+            for i, widget in enumerate(self.serial_widgets):
+                grid.addWidget(widget, i // columns, i % columns)
+        else:
+            # 创建水平分割器时设置优化选项
+            area = QSplitter(Qt.Horizontal)
+            area.setOpaqueResize(False)  # 禁用实时拖动效果，提升性能
+            for widget in self.serial_widgets:
+                area.addWidget(widget)
+            # 设置更紧凑的初始大小比例
+            area.setSizes([250] * count)
+            self.splitter = area
+        self.port_area = area
+        self.main_layout.addWidget(area)
+
+    def rebuild_port_area(self):
+        """串口数量或排列方式修改后重新创建串口窗口，先保存配置并关闭现有串口"""
         for widget in self.serial_widgets:
-            widget.set_auto_save_enabled(self.auto_save_action.isChecked())
+            self.config_manager.set_port_config(widget.port_index, widget.get_config())
+            widget.shutdown()
+        self.port_area.setParent(None)
+        self.port_area.deleteLater()
+        self.build_port_area()
+        self.statusBar().showMessage(f'就绪 - 支持{len(self.serial_widgets)}个串口同时监控')
+
+    def set_port_count(self):
+        cur = self.config_manager.get_port_count()
+        val, ok = QInputDialog.getInt(self, '设置串口数量', '同时监控的串口数量:', cur, 1, 16, 1)
+        if ok and val != cur:
+            self.config_manager.set_port_count(val)
+            self.rebuild_port_area()
+
+    def set_port_layout(self, action):
+        if action.data() != self.config_manager.get_port_layout():
+            self.config_manager.set_port_layout(action.data())
+            self.rebuild_port_area()
     
     def save_all_original_data(self):
         """保存所有串口的原始数据"""
@@ -930,6 +1611,153 @@ class DualSerialMonitor(QMainWindow):
         """保存所有串口的过滤数据"""
         for i, widget in enumerate(self.serial_widgets):
             widget.save_filtered_data()
+    def toggle_capture(self, checked):
+        """开始/停止录制两个串口的原始数据（共用一个录制文件）"""
+        if checked:
+            path = new_capture_path(self.serial_widgets[0].get_logs_dir())
+            self.capture_writer = CaptureWriter(path)
+            self.capture_writer.write_failed.connect(
+                lambda err: self.statusBar().showMessage(f'录制失败: {err}'))
+            self.capture_writer.start()
+            for widget in self.serial_widgets:
+                widget.set_capture_writer(self.capture_writer)
+            self.statusBar().showMessage(f'正在录制到 {path}')
+        else:
+            self.stop_capture()
+
+    def stop_capture(self):
+        """停止录制，写完队列中剩余的数据并写入索引"""
+        if self.capture_writer is None:
+            return
+        for widget in self.serial_widgets:
+            widget.set_capture_writer(None)
+        writer = self.capture_writer
+        self.capture_writer = None
+        writer.stop()
+        self.capture_action.setChecked(False)
+        self.statusBar().showMessage(f'录制已保存: {writer.path} ({writer.bytes_written / 1024 / 1024:.1f}MB)')
+
+    def export_capture(self):
+        """按选择的编码重新解码录制文件，每个串口导出为一个文本文件
+
+        各串口按对应窗口当前设置的行结束符切行；使用二进制帧格式的串口没有文本行，不导出。
+        """
+        path, _ = QFileDialog.getOpenFileName(self, '选择录制文件', self.serial_widgets[0].get_logs_dir(),
+                                              f'录制文件 (*{FILE_SUFFIX});;所有文件 (*)')
+        if not path:
+            return
+        names = list(ENCODINGS.values())
+        name, ok = QInputDialog.getItem(self, '导出录制文件', '解码编码:', names, 0, False)
+        if not ok:
+            return
+        encoding = list(ENCODINGS)[names.index(name)]
+        skipped = []
+        try:
+            with CaptureReader(path) as reader:
+                delimiters = {}
+                for port_index in reader.ports():
+                    if not 1 <= port_index <= len(self.serial_widgets):
+                        delimiters[port_index] = b'\n'
+                        continue
+                    widget = self.serial_widgets[port_index - 1]
+                    if parse_framing(widget.framing)[0] != 'newline':
+                        skipped.append(port_index)
+                        continue
+                    delimiters[port_index] = bytes.fromhex(widget.line_terminator)
+                if not delimiters:
+                    QMessageBox.warning(self, '导出录制文件',
+                                        f'串口{", ".join(map(str, skipped))}使用二进制帧格式，没有可导出的文本行')
+                    return
+                formatter = TimestampFormatter()
+                outputs = {}
+                try:
+                    for port_index, delimiter in delimiters.items():
+                        lines = reader.iter_lines(encoding, port_index, delimiter=delimiter)
+                        for stamp, _, line in lines:
+                            out = outputs.get(port_index)
+                            if out is None:
+                                out_path = f'{os.path.splitext(path)[0]}_串口{port_index}.txt'
+                                out = outputs[port_index] = open(out_path, 'w', encoding='utf-8')
+                            out.write(f'[{formatter.format_wall(stamp)}]{line}\n')
+                finally:
+                    for out in outputs.values():
+                        out.close()
+        except Exception as e:
+            QMessageBox.critical(self, '导出失败', str(e))
+            return
+        message = f'已导出{len(outputs)}个串口的数据到\n{os.path.dirname(path)}'
+        if skipped:
+            message += f'\n串口{", ".join(map(str, skipped))}使用二进制帧格式，未导出'
+        QMessageBox.information(self, '导出完成', message)
+
+    def replay_capture(self):
+        """把录制文件中每个串口的数据回放到对应的串口窗口"""
+        path, _ = QFileDialog.getOpenFileName(self, '选择录制文件', self.serial_widgets[0].get_logs_dir(),
+                                              f'录制文件 (*{FILE_SUFFIX});;所有文件 (*)')
+        if not path:
+            return
+        options = ask_replay_speed(self)
+        if options is None:
+            return
+        speed, buffer_size = options
+        try:
+            reader = CaptureReader(path)
+        except Exception as e:
+            QMessageBox.critical(self, '打开录制文件失败', str(e))
+            return
+        ports = [p for p in reader.ports() if 1 <= p <= len(self.serial_widgets)]
+        if not ports:
+            reader.close()
+            QMessageBox.warning(self, '回放', '录制文件中没有可回放的串口数据')
+            return
+        for widget in self.serial_widgets:
+            widget.close_serial()
+        if self.replay_reader is not None:
+            self.replay_reader.close()
+        self.replay_reader = reader
+        for port_index in ports:
+            self.serial_widgets[port_index - 1].start_replay(
+                ReplayPort(reader, port_index, speed, buffer_size))
+        self.statusBar().showMessage(f'正在回放 {path}')
+
+    def update_metrics(self):
+        """定时汇总各串口的指标，显示在状态栏，正在导出时同时写入文件"""
+        snapshots = [widget.metrics.snapshot() for widget in self.serial_widgets]
+        # 串口较多时只显示收到过数据的串口，导出的文件包含全部串口
+        self.metrics_label.setText(' | '.join(format_snapshot(snap) for snap in snapshots if snap['bytes_total']))
+        if self.metrics_exporter is not None:
+            try:
+                self.metrics_exporter.write(snapshots)
+            except Exception as e:
+                self.stop_metrics_export()
+                self.statusBar().showMessage(f'导出性能指标失败: {e}')
+
+    def toggle_metrics_export(self, checked):
+        if checked:
+            logs_dir = self.serial_widgets[0].get_logs_dir()
+            os.makedirs(logs_dir, exist_ok=True)
+            path = os.path.join(logs_dir, f"metrics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl")
+            try:
+                self.metrics_exporter = MetricsExporter(path)
+            except Exception as e:
+                self.metrics_export_action.setChecked(False)
+                QMessageBox.critical(self, '错误', f'无法创建指标文件: {e}')
+                return
+            self.statusBar().showMessage(f'性能指标导出到 {path}')
+        else:
+            self.stop_metrics_export()
+
+    def stop_metrics_export(self):
+        self.metrics_export_action.setChecked(False)
+        if self.metrics_exporter is not None:
+            self.metrics_exporter.close()
+            self.metrics_exporter = None
+
+    def toggle_debug_echo(self, checked):
+        self.config_manager.set_debug_echo(checked)
+        for widget in self.serial_widgets:
+            widget.debug_echo = DebugEcho() if checked else None
+
     def toggle_auto_save(self, checked):
         self.config_manager.set_auto_save_enabled(checked)
         # 通知所有串口窗口
@@ -948,7 +1776,7 @@ class DualSerialMonitor(QMainWindow):
         
         # 加载分割器大小
         splitter_sizes = self.config_manager.get_splitter_sizes()
-        if splitter_sizes:
+        if splitter_sizes and self.splitter is not None and len(splitter_sizes) == len(self.serial_widgets):
             try:
                 self.splitter.setSizes(splitter_sizes)
             except:
@@ -966,7 +1794,49 @@ class DualSerialMonitor(QMainWindow):
         val, ok = QInputDialog.getInt(self, '设置触发自动保存容量阈值', '请输入自动保存容量阈值（KB）:', cur, 1, 1024 * 1024, 1)
         if ok:
             self.config_manager.set_auto_save_limit_mb(val)
+            for widget in self.serial_widgets:
+                widget.apply_auto_save_settings()
             QMessageBox.information(self, '设置成功', f'自动保存容量已设为{val}KB')
+
+    def set_auto_save_rotate(self):
+        cur = self.config_manager.get_auto_save_rotate_minutes()
+        val, ok = QInputDialog.getInt(self, '设置自动保存轮转间隔', '每隔多少分钟切换新文件（0表示只按容量切换）:', cur, 0, 7 * 24 * 60, 1)
+        if ok:
+            self.config_manager.set_auto_save_rotate_minutes(val)
+            for widget in self.serial_widgets:
+                widget.apply_auto_save_settings()
+
+    def set_view_limits(self):
+        """设置显示区在内存中保留的行数和容量，超出后写入磁盘回滚或淘汰最旧的行"""
+        max_lines, max_kb = self.config_manager.get_view_limits()
+        disk_mb = self.config_manager.get_scrollback_mb()
+        dialog = QDialog(self)
+        dialog.setWindowTitle('设置显示保留上限')
+        layout = QFormLayout(dialog)
+        lines_spin = QSpinBox()
+        lines_spin.setRange(1000, 100000000)
+        lines_spin.setValue(max_lines)
+        layout.addRow('最大保留行数:', lines_spin)
+        kb_spin = QSpinBox()
+        kb_spin.setRange(64, 16 * 1024 * 1024)
+        kb_spin.setValue(max_kb)
+        layout.addRow('最大保留容量(KB):', kb_spin)
+        disk_spin = QSpinBox()
+        disk_spin.setRange(0, 1024 * 1024)
+        disk_spin.setSpecialValueText('不写磁盘')
+        disk_spin.setValue(disk_mb)
+        disk_spin.setToolTip('超出上面上限的旧行写入临时文件，仍可滚动查看、过滤和查找')
+        layout.addRow('磁盘回滚上限(MB):', disk_spin)
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        layout.addRow(buttons)
+        buttons.accepted.connect(dialog.accept)
+        buttons.rejected.connect(dialog.reject)
+        if dialog.exec_() == QDialog.Accepted:
+            self.config_manager.set_view_limits(lines_spin.value(), kb_spin.value())
+            self.config_manager.set_scrollback_mb(disk_spin.value())
+            for widget in self.serial_widgets:
+                widget.set_view_limits(lines_spin.value(), kb_spin.value())
+                widget.set_scrollback_limit(disk_spin.value())
             
     def save_config(self):
         # 保存串口配置
@@ -977,12 +1847,18 @@ class DualSerialMonitor(QMainWindow):
         self.config_manager.set_window_geometry(self.saveGeometry().data().hex())
         
         # 保存分割器大小
-        self.config_manager.set_splitter_sizes(self.splitter.sizes())
+        if self.splitter is not None:
+            self.config_manager.set_splitter_sizes(self.splitter.sizes())
         
         # 关闭所有串口
         for widget in self.serial_widgets:
-            if widget.serial_port and widget.serial_port.is_open:
-                widget.close_serial()
+            widget.shutdown()
+        self.io_loop.close()
+        self.stop_capture()
+        self.stop_metrics_export()
+        if self.replay_reader is not None:
+            self.replay_reader.close()
+            self.replay_reader = None
 
 
 def get_icon_path():
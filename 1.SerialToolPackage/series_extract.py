@@ -0,0 +1,197 @@
+"""数值提取：在接收线程中按规则从行里取出数值，存入每个序列的NumPy环形缓冲区"""
+import math
+import re
+import threading
+
+import numpy as np
+
+NUMBER = r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?'
+KEY_RE = re.compile(r'[A-Za-z_]\w*')
+
+
+def parse_rules(text):
+    """规则文本 -> [(编译后的正则, [(序列名, 分组), ...]), ...]
+
+    多条规则用";"隔开，每条规则可以是：
+    - 字段名，如"temp"，匹配"temp=23.4"、"temp: 23.4"中的数值，序列名就是字段名；
+    - 正则，每个命名分组(?P<名称>...)是一个序列；没有命名分组时以规则本身为序列名，
+      取第1个分组（没有分组时取整个匹配）。
+    正则有误时抛出re.error。
+    """
+    rules = []
+    for rule in text.split(';'):
+        rule = rule.strip()
+        if not rule:
+            continue
+        if KEY_RE.fullmatch(rule):
+            pattern = re.compile(rf'\b{rule}\s*[=:]\s*(?P<{rule}>{NUMBER})')
+        else:
+            pattern = re.compile(rule)
+        if pattern.groupindex:
+            fields = [(name, group) for name, group in pattern.groupindex.items()]
+        else:
+            fields = [(rule, 1 if pattern.groups else 0)]
+        rules.append((pattern, fields))
+    return rules
+
+
+class SeriesBuffer:
+    """一个序列的环形缓冲区：到达时间戳(int64, perf_counter_ns)和数值(float64)
+
+    两个数组预先分配，写满后覆盖最旧的点，写入和读取都是整块数组操作。
+    时间戳按到达顺序单调递增，可以二分查找时间窗口。
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.stamps = np.zeros(capacity, np.int64)
+        self.values = np.zeros(capacity, np.float64)
+        self.total = 0  # 累计写入的点数，total % capacity是下一个写入位置
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def extend(self, stamps, values):
+        count = len(values)
+        if count > self.capacity:
+            stamps = stamps[-self.capacity:]
+            values = values[-self.capacity:]
+            self.total += count - self.capacity
+            count = self.capacity
+        start = self.total % self.capacity
+        first = min(count, self.capacity - start)
+        self.stamps[start:start + first] = stamps[:first]
+        self.values[start:start + first] = values[:first]
+        if first < count:
+            # 绕回数组开头
+            self.stamps[:count - first] = stamps[first:]
+            self.values[:count - first] = values[first:]
+        self.total += count
+
+    def last(self):
+        return self.values[(self.total - 1) % self.capacity] if self.total else None
+
+    def first(self):
+        """最旧的点的时间戳"""
+        return self.stamps[self.total % self.capacity if self.total > self.capacity else 0]
+
+    def parts(self):
+        """按时间顺序的一或两段 (时间戳, 数值) 视图，绕回后分为两段，不复制"""
+        if self.total <= self.capacity:
+            return [(self.stamps[:self.total], self.values[:self.total])]
+        start = self.total % self.capacity
+        return [(self.stamps[start:], self.values[start:]), (self.stamps[:start], self.values[:start])]
+
+
+class SeriesExtractor:
+    """按规则提取数值的各个序列，add_lines在接收线程中调用，绘图在GUI线程中读取
+
+    规则随时可由界面替换；规则里不再出现的序列随即删除。
+    """
+
+    def __init__(self, capacity=1000000):
+        self.capacity = capacity  # 每个序列最多保留的点数
+        self.lock = threading.Lock()
+        self.rules = []
+        self.series = {}  # 序列名 -> SeriesBuffer，按首次出现的顺序
+        self.version = 0  # 每次写入加一，绘图据此判断是否有新数据
+
+    def set_rules(self, text):
+        """更新提取规则，正则有误时抛出re.error，原规则不变"""
+        rules = parse_rules(text)
+        names = {name for _, fields in rules for name, _ in fields}
+        with self.lock:
+            self.rules = rules
+            for name in list(self.series):
+                if name not in names:
+                    del self.series[name]
+            self.version += 1
+
+    def add_lines(self, lines, stamps):
+        """从一批行中提取数值（接收线程）"""
+        rules = self.rules
+        if not rules:
+            return
+        collected = {}
+        for pattern, fields in rules:
+            search = pattern.search
+            for line, stamp in zip(lines, stamps):
+                match = search(line)
+                if match is None:
+                    continue
+                for name, group in fields:
+                    text = match.group(group)
+                    if text is None:
+                        continue
+                    try:
+                        value = float(text)
+                    except ValueError:
+                        continue
+                    if not math.isfinite(value):
+                        continue
+                    points = collected.get(name)
+                    if points is None:
+                        points = collected[name] = ([], [])
+                    points[0].append(stamp)
+                    points[1].append(value)
+        if not collected:
+            return
+        with self.lock:
+            for name, (point_stamps, values) in collected.items():
+                series = self.series.get(name)
+                if series is None:
+                    series = self.series[name] = SeriesBuffer(self.capacity)
+                series.extend(np.array(point_stamps, np.int64), np.array(values, np.float64))
+            self.version += 1
+
+    def first_stamp(self):
+        """所有序列中最旧的点的时间戳，没有数据时返回None"""
+        with self.lock:
+            firsts = [series.first() for series in self.series.values() if series.total]
+        return min(firsts) if firsts else None
+
+    def decimated(self, start, end, width):
+        """{序列名: (x像素, y数值, 最新值, 点数)}，[start, end)时间窗口按width个像素列抽取
+
+        直接在环形缓冲区上抽取，不复制整个缓冲区；返回的数组是新分配的。
+        """
+        result = {}
+        with self.lock:
+            for name, series in self.series.items():
+                xs = []
+                ys = []
+                for stamps, values in series.parts():
+                    x, y = decimate(stamps, values, start, end, width)
+                    xs.append(x)
+                    ys.append(y)
+                result[name] = (np.concatenate(xs), np.concatenate(ys), series.last(), len(series))
+        return result
+
+    def clear(self):
+        with self.lock:
+            self.series = {}
+            self.version += 1
+
+
+def decimate(stamps, values, start, end, width):
+    """把[start, end)时间窗口内的点按像素列做min/max抽取
+
+    返回 (x像素, y数值) 两个数组：点数不超过2*width时原样返回，
+    否则每个像素列取最小值和最大值两个点，峰值和毛刺不会因抽取丢失。
+    stamps必须单调递增。
+    """
+    lo, hi = np.searchsorted(stamps, (start, end))
+    stamps, values = stamps[lo:hi], values[lo:hi]
+    scale = width / max(end - start, 1)
+    if len(values) <= 2 * width:
+        return (stamps - start) * scale, values
+    # 各像素列的起始下标由列边界时刻二分得到，不必逐点换算列号
+    edges = np.searchsorted(stamps, start + (np.arange(width) * ((end - start) / width)).astype(np.int64))
+    counts = np.diff(edges, append=len(stamps))
+    columns = np.flatnonzero(counts)  # 跳过没有点的列
+    starts = edges[columns]
+    px = np.repeat(columns.astype(np.float64), 2)
+    py = np.empty(len(px))
+    py[0::2] = np.minimum.reduceat(values, starts)
+    py[1::2] = np.maximum.reduceat(values, starts)
+    return px, py
@@ -0,0 +1,27 @@
+"""测试公共设置：模块都在上一级目录平铺存放，Qt使用不需要显示器的offscreen平台"""
+import os
+import sys
+import time
+
+import pytest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def qapp():
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication.instance() or QApplication([])
+    yield app
+
+
+def wait_until(app, predicate, timeout=5.0):
+    """处理Qt事件直到predicate()为真，超时返回False"""
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        app.processEvents()
+        time.sleep(0.005)
+    return True
@@ -0,0 +1,82 @@
+"""batch_queue.BatchQueue：三种队列满时的策略"""
+import threading
+import time
+
+from batch_queue import BatchQueue
+
+
+def batch(n, tag='x'):
+    lines = [f'{tag}{i}' for i in range(n)]
+    return lines, list(range(n)), [line.encode() for line in lines]
+
+
+def test_put_reports_empty_queue_and_take_respects_limit():
+    queue = BatchQueue(100, 'drop_oldest')
+    assert queue.put(*batch(3)) == (True, 0)
+    assert queue.put(*batch(3)) == (False, 0)
+    assert queue.put(*batch(3)) == (False, 0)
+    taken, skipped, remaining = queue.take(max_lines=4)
+    # 至少取一批，达到上限后停止
+    assert [len(b[0]) for b in taken] == [3, 3]
+    assert (skipped, remaining, len(queue)) == (0, 3, 3)
+    taken, _, remaining = queue.take()
+    assert len(taken) == 1 and remaining == 0
+
+
+def test_drop_oldest_discards_whole_batches():
+    queue = BatchQueue(10, 'drop_oldest')
+    queue.put(*batch(4, 'a'))
+    queue.put(*batch(4, 'b'))
+    assert queue.put(*batch(4, 'c')) == (False, 4)
+    taken, skipped, _ = queue.take()
+    assert [b[0][0] for b in taken] == ['b0', 'c0']
+    assert skipped == 0
+    assert queue.dropped_lines == 4
+
+
+def test_oversized_batch_is_still_queued():
+    queue = BatchQueue(5, 'drop_oldest')
+    queue.put(*batch(2))
+    assert queue.put(*batch(8)) == (False, 2)
+    assert len(queue) == 8
+
+
+def test_coalesce_reports_skipped_lines_once():
+    queue = BatchQueue(5, 'coalesce')
+    queue.put(*batch(3))
+    queue.put(*batch(3))
+    queue.put(*batch(3))
+    taken, skipped, _ = queue.take()
+    assert len(taken) == 1 and skipped == 6
+    assert queue.take()[1] == 0
+    assert queue.dropped_lines == 6
+
+
+def test_block_waits_for_consumer():
+    queue = BatchQueue(5, 'block')
+    queue.put(*batch(4))
+    done = threading.Event()
+
+    def producer():
+        queue.put(*batch(4))
+        done.set()
+    thread = threading.Thread(target=producer)
+    thread.start()
+    assert not done.wait(0.2)
+    taken, _, _ = queue.take()
+    assert len(taken) == 1
+    assert done.wait(2)
+    thread.join()
+    assert len(queue) == 4 and queue.dropped_lines == 0
+
+
+def test_block_close_releases_producer():
+    queue = BatchQueue(5, 'block')
+    queue.put(*batch(5))
+    thread = threading.Thread(target=queue.put, args=batch(1))
+    thread.start()
+    time.sleep(0.05)
+    assert thread.is_alive()
+    queue.close()
+    thread.join(2)
+    assert not thread.is_alive()
@@ -0,0 +1,79 @@
+"""capture_file：录制后读回，包括没有文件尾（异常中断）的文件"""
+import pytest
+
+import capture_file
+from arrival_clock import now_ns, to_wall_ns
+from capture_file import CaptureFormatError, CaptureReader, CaptureWriter, RECORD_HEADER
+
+
+def write_capture(path, chunks):
+    writer = CaptureWriter(path)
+    errors = []
+    writer.write_failed.connect(errors.append)
+    writer.start()
+    for port, stamp, data in chunks:
+        writer.write_chunk(port, stamp, data)
+    writer.stop()
+    assert not errors
+
+
+def make_chunks(count):
+    start = now_ns()
+    return [(1 + i % 2, start + i * 1000, b'line %d\n' % i) for i in range(count)]
+
+
+@pytest.fixture
+def small_index(monkeypatch):
+    # 每7条记录一个索引，使索引链有多个节点
+    monkeypatch.setattr(capture_file, 'INDEX_INTERVAL', 7)
+
+
+def check_reader(reader, chunks):
+    assert len(reader) == len(chunks)
+    for i, (port, stamp, data) in enumerate(chunks):
+        got_stamp, got_port, got_data = reader.record(i)
+        assert (got_port, bytes(got_data)) == (port, data)
+        assert got_stamp == to_wall_ns(stamp)
+    assert reader.ports() == sorted({port for port, _, _ in chunks})
+
+
+def test_round_trip_with_index(tmp_path, qapp, small_index):
+    path = str(tmp_path / 'a.scap')
+    chunks = make_chunks(50)
+    write_capture(path, chunks)
+    with CaptureReader(path) as reader:
+        check_reader(reader, chunks)
+        assert reader.find_time(reader.stamps[10]) == 10
+        lines = [line for _, port, line in reader.iter_lines(port_index=2)]
+        assert lines == [f'line {i}' for i in range(1, 50, 2)]
+
+
+def test_read_back_without_trailer(tmp_path, qapp, small_index):
+    path = str(tmp_path / 'b.scap')
+    chunks = make_chunks(30)
+    write_capture(path, chunks)
+    with CaptureReader(path) as reader:
+        last = reader.offsets[-1]
+    # 去掉文件尾和最后的索引，并截掉最后一条数据记录的一部分，模拟写入中途断电
+    with open(path, 'r+b') as f:
+        f.truncate(last + RECORD_HEADER.size + 2)
+    with CaptureReader(path) as reader:
+        check_reader(reader, chunks[:-1])
+
+
+def test_iter_lines_with_other_delimiter_across_records(tmp_path, qapp):
+    path = str(tmp_path / 'c.scap')
+    stamp = now_ns()
+    write_capture(path, [(1, stamp, b'ab\rc'), (1, stamp, b'd\r'), (1, stamp, '温'.encode('gbk') + b'\r')])
+    with CaptureReader(path) as reader:
+        assert [line for _, _, line in reader.iter_lines(delimiter=b'\r')] == ['ab', 'cd', '温']
+
+
+def test_not_a_capture_file(tmp_path):
+    path = tmp_path / 'x.scap'
+    path.write_bytes(b'hello world, definitely not a capture')
+    with pytest.raises(CaptureFormatError):
+        CaptureReader(str(path))
+    path.write_bytes(b'abc')
+    with pytest.raises(CaptureFormatError):
+        CaptureReader(str(path))
@@ -0,0 +1,162 @@
+"""framers：各分帧器的往返、跨读取的半帧、坏帧计数"""
+import struct
+
+import pytest
+
+from framers import (CHECKSUMS, CobsFramer, FieldLayout, FixedFramer, LengthPrefixFramer, MarkerFramer,
+                     SlipFramer, cobs_decode, make_framer, parse_framing)
+from line_buffer import LineBuffer
+
+PAYLOADS = [b'\x01\x02\x03', b'\x00', b'\xc0\xdb\x00\xc0', b'', b'x' * 300, bytes(range(256))]
+
+
+def slip_encode(payload):
+    return b'\xc0' + payload.replace(b'\xdb', b'\xdb\xdd').replace(b'\xc0', b'\xdb\xdc') + b'\xc0'
+
+
+def cobs_encode(payload):
+    out = bytearray()
+    block = bytearray()
+    for byte in payload:
+        if byte == 0:
+            out += bytes([len(block) + 1]) + block
+            block = bytearray()
+        else:
+            block.append(byte)
+            if len(block) == 254:
+                out += b'\xff' + block
+                block = bytearray()
+    out += bytes([len(block) + 1]) + block
+    return bytes(out) + b'\0'
+
+
+def feed_bytewise(framer, stream):
+    """每次只喂一个字节，模拟帧跨越多次读取"""
+    frames = []
+    for i in range(len(stream)):
+        framer.feed(stream[i:i + 1])
+        frames += framer.read_frames()
+    return frames
+
+
+def test_slip_round_trip():
+    framer = SlipFramer()
+    stream = b''.join(slip_encode(p) for p in PAYLOADS)
+    framer.feed(stream)
+    # 空帧（连续的0xC0）被忽略
+    assert framer.read_frames() == [p for p in PAYLOADS if p]
+    assert framer.decode_errors == 0
+
+
+def test_slip_partial_frames():
+    framer = SlipFramer()
+    stream = b''.join(slip_encode(p) for p in PAYLOADS)
+    assert feed_bytewise(framer, stream) == [p for p in PAYLOADS if p]
+    framer.feed(b'\xc0\x01\x02')
+    assert framer.read_frames() == []
+    assert len(framer) == 2
+
+
+def test_slip_bad_escape_is_dropped():
+    framer = SlipFramer()
+    framer.feed(b'\xc0\x01\xdb\x02\xc0' + slip_encode(b'ok'))
+    assert framer.read_frames() == [b'ok']
+    assert framer.decode_errors == 1
+
+
+def test_cobs_round_trip():
+    framer = CobsFramer()
+    stream = b''.join(cobs_encode(p) for p in PAYLOADS)
+    framer.feed(stream)
+    assert framer.read_frames() == PAYLOADS
+    assert feed_bytewise(CobsFramer(), stream) == PAYLOADS
+
+
+def test_cobs_bad_frame():
+    assert cobs_decode(b'\x05\x01') is None
+    framer = CobsFramer()
+    framer.feed(b'\x05\x01\x00' + cobs_encode(b'ok'))
+    assert framer.read_frames() == [b'ok']
+    assert framer.decode_errors == 1
+
+
+@pytest.mark.parametrize('length_bytes, big_endian, include_header', [
+    (1, 0, 0), (2, 0, 0), (2, 1, 0), (4, 1, 1)])
+def test_length_prefix_round_trip(length_bytes, big_endian, include_header):
+    framer = LengthPrefixFramer(length_bytes=length_bytes, big_endian=big_endian, include_header=include_header)
+    byteorder = 'big' if big_endian else 'little'
+    payloads = [p for p in PAYLOADS if len(p) + length_bytes < 256 ** length_bytes]
+    stream = b''.join((len(p) + (length_bytes if include_header else 0)).to_bytes(length_bytes, byteorder) + p
+                      for p in payloads)
+    assert feed_bytewise(framer, stream) == payloads
+    assert len(framer) == 0
+
+
+def test_length_prefix_resyncs_after_oversized_length():
+    framer = LengthPrefixFramer(length_bytes=1, max_length=4)
+    framer.feed(b'\x09\x02ab\x01c')
+    assert framer.read_frames() == [b'ab', b'c']
+    assert framer.decode_errors == 1
+
+
+@pytest.mark.parametrize('checksum', list(CHECKSUMS))
+def test_marker_round_trip(checksum):
+    size, func = CHECKSUMS[checksum]
+    framer = MarkerFramer(start='AA55', end='0D0A', checksum=checksum)
+    payloads = [b'\x01\x02', b'hello', b'']
+    stream = b''.join(b'\xaa\x55' + p + (func(p) if size else b'') + b'\r\n' for p in payloads)
+    assert feed_bytewise(framer, stream) == payloads
+    assert framer.decode_errors == 0
+
+
+def test_marker_bad_checksum_and_garbage():
+    framer = MarkerFramer(start='AA55', end='0D0A', checksum='sum8')
+    framer.feed(b'junk\xaa\x55\x01\x02\x00\r\n\xaa\x55\x01\x02\x03\r\n')
+    assert framer.read_frames() == [b'\x01\x02']
+    # 帧前的多余字节和校验失败各计一次
+    assert framer.decode_errors == 2
+
+
+def test_marker_without_end_flushes_last_frame_on_idle():
+    framer = MarkerFramer(start='AA55')
+    framer.feed(b'\xaa\x55\x01\xaa\x55\x02\x03')
+    assert framer.read_frames() == [b'\x01']
+    assert framer.read_partial_with_raw() == ('02 03', b'\x02\x03')
+    assert len(framer) == 0
+
+
+def test_fixed_framer_keeps_remainder():
+    framer = FixedFramer(size=4)
+    framer.feed(b'abcdefghij')
+    assert framer.read_frames() == [b'abcd', b'efgh']
+    framer.feed(b'kl')
+    assert framer.read_frames() == [b'ijkl']
+
+
+def test_idle_flush_discards_incomplete_binary_frame():
+    framer = FixedFramer(size=4)
+    framer.feed(b'ab')
+    assert framer.read_partial_with_raw() is None
+    assert framer.decode_errors == 1
+    assert len(framer) == 0
+
+
+def test_field_layout_render():
+    layout = FieldLayout('<hB', 'temp')
+    assert layout.render(struct.pack('<hB', -5, 7)) == 'temp=-5 f1=7'
+    assert layout.render(b'\x01') == '[长度1] 01'
+    assert FieldLayout().render(b'') == '(空帧)'
+    framer = make_framer('fixed;size=3;layout=<hB;names=temp')
+    framer.feed(struct.pack('<hB', 300, 1))
+    assert framer.read_lines_with_raw() == (['temp=300 f1=1'], [struct.pack('<hB', 300, 1)])
+
+
+def test_make_framer_and_errors():
+    assert isinstance(make_framer('newline', terminator=b'\r'), LineBuffer)
+    assert parse_framing('marker; start=AA ;end=55') == ('marker', {'start': 'AA', 'end': '55'})
+    for spec in ('bogus', 'fixed;size', 'fixed;size=0', 'fixed;width=3', 'length_prefix;length_bytes=3',
+                 'marker;checksum=md5', 'marker;start=XY', 'fixed;layout=<Q!', 'newline;x=1'):
+        with pytest.raises(ValueError):
+            make_framer(spec)
+    with pytest.raises(ValueError):
+        make_framer('newline', terminator=b'')
@@ -0,0 +1,100 @@
+"""line_buffer.LineBuffer：跨读取的分隔符和多字节字符、各种编码与行结束符"""
+import pytest
+
+from line_buffer import LineBuffer, decode_line
+
+
+def feed_chunks(buffer, data, size):
+    lines, raws = [], []
+    for i in range(0, len(data), size):
+        buffer.feed(data[i:i + size])
+        more_lines, more_raws = buffer.read_lines_with_raw()
+        lines += more_lines
+        raws += more_raws
+    return lines, raws
+
+
+TEXT = ['温度=23.5', 'hello', '', 'ERROR 错误', 'x' * 200]
+
+
+@pytest.mark.parametrize('delimiter', [b'\n', b'\r', b'\r\n', b'\xaa\x55', b'END'])
+@pytest.mark.parametrize('encoding, codec', [('auto', 'utf-8'), ('auto', 'gbk'), ('utf-8', 'utf-8'),
+                                             ('gbk', 'gbk')])
+@pytest.mark.parametrize('size', [1, 2, 3, 7, 4096])
+def test_split_across_reads(delimiter, encoding, codec, size):
+    """分隔符和多字节字符被拆在两次读取之间时，行和原始字节仍一一对应"""
+    raws = [line.encode(codec) for line in TEXT]
+    data = b''.join(raw + delimiter for raw in raws)
+    lines, got_raws = feed_chunks(LineBuffer(capacity=16, delimiter=delimiter, encoding=encoding), data, size)
+    assert lines == TEXT
+    assert got_raws == raws
+
+
+def test_incomplete_line_stays_in_buffer():
+    buffer = LineBuffer()
+    buffer.feed('温'.encode('utf-8')[:2])
+    assert buffer.read_lines() == []
+    buffer.feed('温'.encode('utf-8')[2:] + b'\n')
+    assert buffer.read_lines() == ['温']
+    assert buffer.decode_errors == 0
+
+
+def test_non_ascii_terminator_inside_multibyte_character():
+    # GBK的"猎"是C1 D4：按原始字节在D4处切行，整块解码后再切会与原始字节错位
+    buffer = LineBuffer(delimiter=b'\xd4', encoding='gbk')
+    buffer.feed('猎人'.encode('gbk') + b'\xd4abc\xd4')
+    lines, raws = buffer.read_lines_with_raw()
+    assert raws == [b'\xc1', '人'.encode('gbk'), b'abc']
+    assert lines == ['\ufffd', '人', 'abc']
+    assert buffer.decode_errors == 1
+
+
+def test_auto_falls_back_to_gbk_per_block_and_back_to_utf8():
+    buffer = LineBuffer()
+    buffer.feed('温度1\n温度2\n'.encode('gbk'))
+    assert buffer.read_lines() == ['温度1', '温度2']
+    buffer.feed('温度3\n'.encode('utf-8'))
+    assert buffer.read_lines() == ['温度3']
+    buffer.feed(b'\xff\xfe ok\n' + 'é\n'.encode('utf-8'))
+    assert buffer.read_lines()[1] == 'é'
+    assert buffer.decode_errors >= 1
+
+
+def test_decode_errors_and_raw_encoding():
+    buffer = LineBuffer(encoding='utf-8')
+    buffer.feed(b'a\xffb\n')
+    assert buffer.read_lines() == ['a�b']
+    assert buffer.decode_errors == 1
+    raw = LineBuffer(encoding='raw')
+    raw.feed(b'a\xffb\n')
+    assert raw.read_lines() == ['a\\xffb']
+    assert raw.decode_errors == 0
+
+
+def test_partial_flush_on_idle():
+    buffer = LineBuffer()
+    buffer.feed(b'done\nlogin: ')
+    assert buffer.read_lines_with_raw() == (['done'], [b'done'])
+    assert buffer.read_partial_with_raw() == ('login: ', b'login: ')
+    assert buffer.read_partial_with_raw() is None
+    assert len(buffer) == 0
+
+
+def test_buffer_grows_and_reuses_space():
+    buffer = LineBuffer(capacity=8)
+    long_line = b'y' * 100
+    buffer.feed(long_line)
+    assert buffer.read_lines() == []
+    buffer.feed(b'\n' + b'z\n' * 50)
+    assert buffer.read_lines() == ['y' * 100] + ['z'] * 50
+    capacity = len(buffer._buf)
+    for _ in range(1000):
+        buffer.feed(b'abc\n')
+        assert buffer.read_lines() == ['abc']
+    # 已消费的空间被复用，不再扩容
+    assert len(buffer._buf) == capacity
+
+
+def test_decode_line():
+    assert decode_line('温度'.encode('utf-8')) == '温度'
+    assert decode_line('温度'.encode('gbk')) == '温度'
@@ -0,0 +1,62 @@
+"""line_filter：关键字/排除/正则/全词/大小写"""
+import re
+
+import pytest
+
+from line_filter import LineFilter, compile_filter, keywords_pattern
+
+LINES = ['ERROR: disk full', 'warning: low battery', 'errors=0', 'info ok', 'Error handled', '']
+
+
+def matched(text, **options):
+    line_filter = LineFilter(text, **options)
+    return [line for line in LINES if line_filter.match(line)]
+
+
+def test_keywords_any_of():
+    assert matched('ERROR|warning') == ['ERROR: disk full', 'warning: low battery']
+
+
+def test_keywords_ignore_case():
+    assert matched('error', case_sensitive=False) == ['ERROR: disk full', 'errors=0', 'Error handled']
+
+
+def test_exclude_only_and_combined():
+    assert matched('!error', case_sensitive=False) == ['warning: low battery', 'info ok', '']
+    assert matched('error|!handled', case_sensitive=False) == ['ERROR: disk full', 'errors=0']
+
+
+def test_whole_word():
+    assert matched('error', case_sensitive=False, whole_word=True) == ['ERROR: disk full', 'Error handled']
+
+
+def test_regex_and_negated_regex():
+    assert matched(r'\w+=\d+', regex=True) == ['errors=0']
+    assert matched(r'!^\w+:', regex=True) == ['errors=0', 'info ok', 'Error handled', '']
+    assert matched('^error', regex=True, case_sensitive=False) == ['ERROR: disk full', 'errors=0',
+                                                                     'Error handled']
+
+
+def test_keywords_are_literal():
+    assert LineFilter('a.b|(x').match('a.b')
+    assert not LineFilter('a.b').match('axb')
+
+
+def test_empty_filter_is_inactive():
+    for text in ('', ' | ', '!'):
+        line_filter = LineFilter(text)
+        assert not line_filter.active
+        assert line_filter.match('anything')
+
+
+def test_keywords_pattern_merges_prefixes():
+    pattern = keywords_pattern(['err', 'error', 'warn'])
+    assert pattern == '(?:err(?:or)?|warn)'
+    regex = re.compile(pattern)
+    assert [regex.search(s) is not None for s in ('err', 'error', 'warn', 'wa')] == [True, True, True, False]
+
+
+def test_compile_filter_is_shared_and_reports_errors():
+    assert compile_filter('a|b', False) is compile_filter('a|b', False)
+    with pytest.raises(re.error):
+        compile_filter('(', regex=True)
@@ -0,0 +1,76 @@
+"""qt_bridge.QtSerialPort：后台事件循环中的AsyncSerial，经Qt信号送回界面线程"""
+import pytest
+import serial
+
+from conftest import wait_until
+from qt_bridge import AsyncioThread, QtSerialPort
+
+
+@pytest.fixture
+def runner(qapp):
+    runner = AsyncioThread()
+    yield runner
+    runner.stop()
+
+
+@pytest.fixture
+def port(runner):
+    port = QtSerialPort(runner)
+    yield port
+    port.close()
+
+
+def test_open_write_receive_close(qapp, port):
+    received = []
+    port.line_received.connect(lambda line, stamp, raw: received.append((line, raw)))
+    port.open('loop://', 115200, timeout=0.05)
+    assert port.is_open
+    port.write(b'hello\r\nworld\n')
+    assert wait_until(qapp, lambda: len(received) == 2)
+    assert received == [('hello\n', b'hello\r'), ('world\n', b'world')]
+    port.close()
+    assert not port.is_open
+    assert port.stream is None
+
+
+def test_open_missing_device_raises(port):
+    with pytest.raises(serial.SerialException):
+        port.open('/dev/does-not-exist-serial', 115200)
+    assert not port.is_open
+
+
+def test_read_error_emits_read_failed(qapp, port):
+    errors = []
+    port.read_failed.connect(errors.append)
+    port.open('loop://', 115200, timeout=0.05)
+
+    def broken(size=1):
+        raise serial.SerialException('读取失败')
+    port.stream.serial_port.read = broken
+    assert wait_until(qapp, lambda: errors)
+    assert errors == ['读取失败']
+
+
+def test_write_error_emits_write_failed(qapp, port):
+    errors = []
+    port.write_failed.connect(errors.append)
+    port.open('loop://', 115200, timeout=0.05)
+
+    def broken(data):
+        raise serial.SerialTimeoutException('写入超时')
+    port.stream.serial_port.write = broken
+    port.write(b'x\n')
+    assert wait_until(qapp, lambda: errors)
+    assert errors == ['写入超时']
+    assert port.is_open
+
+
+def test_reopen_replaces_stream(qapp, port):
+    received = []
+    port.line_received.connect(lambda line, stamp, raw: received.append(line))
+    port.open('loop://', 115200, timeout=0.05)
+    first = port.stream
+    port.open('loop://', 115200, timeout=0.05)
+    assert port.stream is not first and not first.is_open
+    port.write(b'again\n')
+    assert wait_until(qapp, lambda: received == ['again\n'])
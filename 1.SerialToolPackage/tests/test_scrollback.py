@@ -0,0 +1,95 @@
+"""scrollback：行存储溢出到磁盘、整段丢弃、在磁盘上查找"""
+import pytest
+
+import scrollback
+from arrival_clock import now_ns, to_wall
+from line_store import LineStore
+from scrollback import Scrollback
+
+
+@pytest.fixture
+def small_segments(monkeypatch):
+    monkeypatch.setattr(Scrollback, 'segment_bytes', lambda self: 2000)
+
+
+def fill(store, count, batch=10):
+    """分批追加count行，相邻两行的到达时间相差1ms"""
+    stamp = now_ns()
+    lines = [f'line {i} {"ERROR" if i % 10 == 0 else "ok"}' for i in range(count)]
+    for start in range(0, count, batch):
+        part = lines[start:start + batch]
+        store.append(part, [stamp + i * 1000000 for i in range(start, start + len(part))],
+                     [line.encode() for line in part])
+    return lines
+
+
+def test_spill_keeps_lines_readable(small_segments):
+    store = LineStore(max_lines=50, max_bytes=1 << 20, disk_bytes=1 << 20)
+    lines = fill(store, 500)
+    assert len(store) == 500
+    assert store.memory_first_seq == 450 and store.first_seq == 0
+    assert len(store.scrollback.segments) > 1
+    for seq in (0, 1, 199, 449, 450, 499):
+        assert store.text(seq) == lines[seq]
+        assert store.raw(seq) == lines[seq].encode()
+        assert store.row(seq)[1] == lines[seq]
+    assert store.stamp(0) + 449 * 1000000 == store.stamp(449)
+    store.close()
+
+
+def test_drop_oldest_segments_over_disk_limit(small_segments):
+    store = LineStore(max_lines=20, max_bytes=1 << 20, disk_bytes=6000)
+    lines = fill(store, 1000)
+    scroll = store.scrollback
+    assert scroll.nbytes <= 6000 + 2000
+    assert store.first_seq == scroll.first_seq > 0
+    assert store.text(store.first_seq - 1) is None
+    assert store.text(store.first_seq) == lines[store.first_seq]
+    assert len(scroll) + store._memory_count() == len(store)
+    store.close()
+
+
+def test_search_on_disk_and_time_range(small_segments):
+    store = LineStore(max_lines=50, max_bytes=1 << 20, disk_bytes=1 << 20)
+    fill(store, 300)
+    hits = store.search_disk('error')
+    assert hits == list(range(0, 250, 10))
+    # 只在磁盘上的行中查找，内存中的行由搜索索引负责
+    assert all(seq < store.memory_first_seq for seq in hits)
+    lo = to_wall(store.stamp(100)) - 0.0005
+    hi = to_wall(store.stamp(150)) + 0.0005
+    assert store.search_disk('ERROR', lo, hi) == list(range(100, 151, 10))
+    store.close()
+
+
+def test_match_does_not_span_lines(tmp_path):
+    scroll = Scrollback(1 << 20, directory=str(tmp_path))
+    text = 'abc' + 'def'
+    scroll.write(0, text.encode(), b'', [3, 6], [0, 0], [now_ns(), now_ns()], [0, 0])
+    assert scroll.search('cd') == []
+    assert scroll.search('DE') == [1]
+    scroll.close()
+
+
+def test_snapshot_covers_disk_and_memory(small_segments):
+    store = LineStore(max_lines=30, max_bytes=1 << 20, disk_bytes=1 << 20)
+    lines = fill(store, 200)
+    snapshot = store.snapshot()
+    assert snapshot.first_seq == 0 and len(snapshot) == 200
+    assert snapshot.texts(0, 200) == lines
+    assert snapshot.texts(165, 175) == lines[165:175]
+    store.close()
+
+
+def test_disable_disk_evicts_spilled_lines(small_segments):
+    store = LineStore(max_lines=30, max_bytes=1 << 20, disk_bytes=1 << 20)
+    fill(store, 100)
+    store.set_disk_limit(0)
+    assert store.scrollback is None
+    assert store.first_seq == store.memory_first_seq == 70
+    assert len(store) == 30
+
+
+def test_segment_bytes_bounds():
+    assert Scrollback(1 << 40).segment_bytes() == scrollback.SEGMENT_BYTES
+    assert Scrollback(1).segment_bytes() == 1024 * 1024
@@ -0,0 +1,121 @@
+"""serial_core.AsyncSerial：经loop://和伪终端收发，不需要硬件"""
+import asyncio
+import os
+
+import pytest
+import serial
+
+from serial_core import AsyncSerial, check_loopback, selectable
+
+
+def run(coro, timeout=10.0):
+    return asyncio.run(asyncio.wait_for(coro, timeout))
+
+
+def test_loopback_self_check():
+    assert run(check_loopback(count=300)) == 300
+
+
+def test_open_write_read_close():
+    async def main():
+        port = await AsyncSerial.open('loop://', 115200, timeout=0.05)
+        assert port.is_open
+        port.write(b'abc\r\ndef')
+        port.write(b'\n')
+        await port.drain()
+        lines = []
+        async for line, stamp, raw in port.lines():
+            assert stamp > 0
+            lines.append((line, raw))
+            if len(lines) == 2:
+                break
+        await port.close()
+        await port.close()  # 重复关闭不报错
+        return lines, port
+    lines, port = run(main())
+    assert lines == [('abc', b'abc\r'), ('def', b'def')]
+    assert not port.is_open
+
+
+def test_read_after_close_returns_none_and_write_raises():
+    async def main():
+        port = await AsyncSerial.open('loop://', 115200, timeout=0.05)
+        await port.close()
+        assert await port.read_chunk() is None
+        assert await port.read_chunk() is None
+        with pytest.raises(serial.SerialException):
+            port.write(b'x')
+    run(main())
+
+
+def test_open_missing_device_raises():
+    async def main():
+        await AsyncSerial.open('/dev/does-not-exist-serial', 115200)
+    with pytest.raises(serial.SerialException):
+        run(main())
+
+
+def test_read_error_ends_stream():
+    async def main():
+        port = await AsyncSerial.open('loop://', 115200, timeout=0.05)
+
+        def broken(size=1):
+            raise serial.SerialException('读取失败')
+        port.serial_port.read = broken
+        with pytest.raises(serial.SerialException, match='读取失败'):
+            async for _ in port.chunks():
+                pass
+        assert isinstance(port.error, serial.SerialException)
+        # 出错后再次读取同样报告该错误
+        with pytest.raises(serial.SerialException):
+            await port.read_chunk()
+        await port.close()
+    run(main())
+
+
+def test_write_error_reported_by_drain_and_reading_continues():
+    async def main():
+        port = await AsyncSerial.open('loop://', 115200, timeout=0.05)
+        write = port.serial_port.write
+
+        def broken(data):
+            raise serial.SerialTimeoutException('写入超时')
+        port.serial_port.write = broken
+        port.write(b'lost\n')
+        with pytest.raises(serial.SerialTimeoutException):
+            await port.drain()
+        await port.drain()  # 错误只报告一次
+        port.serial_port.write = write
+        port.write(b'kept\n')
+        await port.drain()
+        async for line, _, _ in port.lines():
+            break
+        await port.close()
+        return line
+    assert run(main()) == 'kept'
+
+
+@pytest.mark.skipif(os.name == 'nt', reason='伪终端只在POSIX上可用')
+def test_selectable_port_reads_through_event_loop_and_reports_disconnect():
+    import pty
+    import tty
+    master, slave = pty.openpty()
+    tty.setraw(master)
+
+    async def main():
+        port = await AsyncSerial.open(os.ttyname(slave), 115200, timeout=0)
+        assert selectable(port.serial_port)
+        assert port._fd is not None
+        os.write(master, '温度=23.5\n'.encode('utf-8'))
+        async for line, _, raw in port.lines():
+            break
+        assert line == '温度=23.5'
+        assert raw == '温度=23.5'.encode('utf-8')
+        # 另一端关闭：读到EOF/EIO，视为设备断开
+        os.close(slave)
+        os.close(master)
+        with pytest.raises(OSError):
+            while await port.read_chunk() is not None:
+                pass
+        await port.close()
+    run(main())